@@ -0,0 +1,286 @@
+"""Runs EntryPoint, Mix and ExitPoint instances on an asyncio event loop,
+instead of their own blocking main loops. Datagrams are received through
+DatagramProtocol transports, deadlines like the flush deadlines of a Mix are
+handled with timers of the loop, as are the channel timeouts. Since all nodes only react to callbacks,
+several of them can share one loop and therefore one process."""
+import asyncio
+import logging
+from time import time
+
+from util import seconds_until
+
+log = logging.getLogger("AsyncRuntime")
+
+
+class ExpiryTimer:
+    """Removes the timed out channels of a registry at the next deadline of
+    its expiry heap, so they time out, even if no datagrams arrive. Without
+    channels no timer is pending, start() is therefore called after every
+    datagram, that may have created one."""
+
+    def __init__(self, channels, on_sweep=None):
+        self.channels = channels
+        self.on_sweep = on_sweep
+        self.loop = asyncio.get_event_loop()
+
+        self.timer = None
+
+    def start(self):
+        if self.timer is not None:
+            return
+
+        timeout = seconds_until([self.channels.next_deadline()])
+
+        if timeout is not None:
+            self.timer = self.loop.call_later(timeout, self._sweep)
+
+    def _sweep(self):
+        self.timer = None
+
+        self.channels.remove_timed_out(time())
+
+        if self.on_sweep is not None:
+            self.on_sweep()
+
+        self.start()
+
+
+class EntryPointProtocol(asyncio.DatagramProtocol):
+    """Sends a burst of fragments after every datagram. Fragments left after
+    that are sent in further bursts from callbacks of the loop, so the
+    datagrams arriving in the meantime are handled in between."""
+
+    def __init__(self, entry_point):
+        self.entry_point = entry_point
+        self.loop = asyncio.get_event_loop()
+
+        self.send_scheduled = False
+        self.prefetch_scheduled = False
+
+        self.expiry_timer = ExpiryTimer(entry_point.channels)
+
+    def connection_made(self, transport):
+        # the transport has the same sendto as a socket, so it takes over
+        self.entry_point.listener_socket = transport
+
+        log.info("%s Listening on %s:%d.", self.entry_point, *self.entry_point.own_addr)
+
+    def datagram_received(self, data, addr):
+        self.entry_point.handle_packet(data, addr)
+
+        self._send_burst()
+
+        self.expiry_timer.start()
+
+    def _scheduled_send(self):
+        self.send_scheduled = False
+
+        self._send_burst()
+
+    def _send_burst(self):
+        self.entry_point.send_messages_to_mix(self.entry_point.send_burst)
+
+        if self.entry_point.scheduler:
+            if not self.send_scheduled:
+                self.send_scheduled = True
+
+                self.loop.call_soon(self._scheduled_send)
+
+        # prepare the next key streams after the datagrams, that are ready
+        elif not self.prefetch_scheduled:
+            self.prefetch_scheduled = True
+
+            self.loop.call_soon(self._prefetch_pads)
+
+    def _prefetch_pads(self):
+        self.prefetch_scheduled = False
+
+        # a few channels at a time, datagrams are handled in between
+        if self.entry_point.prefetch_pads() and not self.entry_point.scheduler:
+            self.prefetch_scheduled = True
+
+            self.loop.call_soon(self._prefetch_pads)
+
+
+class MixProtocol(asyncio.DatagramProtocol):
+    """Collects the datagrams, that arrive during one iteration of the loop,
+    and lets the Mix handle them as one batch. Flushes are done after every
+    batch and at the deadlines of the flush strategies."""
+
+    def __init__(self, mix):
+        self.mix = mix
+        self.loop = asyncio.get_event_loop()
+
+        self.batch = []
+        self.flush_timer = None
+
+        self.expiry_timer = ExpiryTimer(mix.channels)
+
+    def connection_made(self, transport):
+        # the transport has the same sendto as a socket, so it takes over
+        self.mix.incoming = transport
+
+        if self.mix.init_pool is not None:
+            self.loop.add_reader(self.mix.init_pool.fileno(), self._finish_channel_inits)
+
+        self._schedule_flush()
+
+    def datagram_received(self, data, addr):
+        if not self.batch:
+            self.loop.call_soon(self._handle_batch)
+
+        self.batch.append((data, addr))
+
+    def _handle_batch(self):
+        batch, self.batch = self.batch, []
+
+        self.mix.handle_batch(batch)
+
+        self._flush()
+
+        self.expiry_timer.start()
+
+    def _finish_channel_inits(self):
+        self.mix.finish_channel_inits()
+
+        self._flush()
+
+    def _flush(self):
+        self.mix.send_requests()
+        self.mix.send_responses()
+
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self.flush_timer is not None:
+            self.flush_timer.cancel()
+            self.flush_timer = None
+
+        timeout = self.mix.flush_timeout()
+
+        if timeout is not None:
+            self.flush_timer = self.loop.call_later(timeout, self._flush)
+
+
+class ExitPointProtocol(asyncio.DatagramProtocol):
+    """Receives the packets coming from the mix. Every channel, that is
+    created because of them, gets a ChannelProtocol for its own socket."""
+
+    def __init__(self, exit_point):
+        self.exit_point = exit_point
+        self.loop = asyncio.get_event_loop()
+
+        # sockets of channels, that already have a transport
+        self.channel_socks = set()
+
+        self.expiry_timer = ExpiryTimer(exit_point.channels, self._forget_removed_channels)
+
+    def connection_made(self, transport):
+        # the transport has the same sendto as a socket, so it takes over
+        self.exit_point.sock_to_mix = transport
+
+    def datagram_received(self, data, addr):
+        # we assume the first received message will be from the mix
+        if self.exit_point.mix_addr is None:
+            self.exit_point.mix_addr = addr
+        elif addr != self.exit_point.mix_addr:
+            return
+
+        try:
+            channel = self.exit_point.handle_mix_packet(data)
+        except Exception as error:
+            self.exit_point.drop_packet(error)
+            return
+
+        self._watch_channel(channel)
+
+        self.exit_point.send_to_mix()
+
+        self.expiry_timer.start()
+
+    def _watch_channel(self, channel):
+        out_sock = channel.out_sock
+
+        # the socket is closed, if the destination was unreachable
+        if out_sock in self.channel_socks or out_sock.fileno() == -1:
+            return
+
+        self.channel_socks.add(out_sock)
+
+        self.loop.create_task(
+            self.loop.create_datagram_endpoint(lambda: ChannelProtocol(self.exit_point, channel), sock=out_sock))
+
+    def _forget_removed_channels(self):
+        # the removed channels closed their sockets
+        self.channel_socks = {channel.out_sock for channel in self.exit_point.channels.table.values()
+                              if channel.out_sock in self.channel_socks}
+
+
+class ChannelProtocol(asyncio.DatagramProtocol):
+    """Receives the responses of the destination of one ExitPoint channel."""
+
+    def __init__(self, exit_point, channel):
+        self.exit_point = exit_point
+        self.channel = channel
+
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+        # the channel closes its socket through it
+        self.channel.transport = transport
+
+    def datagram_received(self, data, addr):
+        if not self.exit_point.handle_response(self.channel, data):
+            # the channel was removed
+            self.transport.close()
+            return
+
+        self.exit_point.send_to_mix()
+
+    def error_received(self, exc):
+        log.warning("%s %s", self.channel, exc)
+
+
+async def start_entry_point(entry_point):
+    """Binds the listening address of the EntryPoint and lets its protocol
+    handle the datagrams."""
+    loop = asyncio.get_event_loop()
+
+    await loop.create_datagram_endpoint(lambda: EntryPointProtocol(entry_point), local_addr=entry_point.own_addr)
+
+
+async def start_mix(mix):
+    """Lets a protocol handle the datagrams arriving at the Mix socket."""
+    loop = asyncio.get_event_loop()
+
+    await loop.create_datagram_endpoint(lambda: MixProtocol(mix), sock=mix.incoming)
+
+
+async def start_exit_point(exit_point):
+    """Lets a protocol handle the datagrams arriving from the mix. The
+    channels of the ExitPoint get their own protocols, once they exist."""
+    loop = asyncio.get_event_loop()
+
+    await loop.create_datagram_endpoint(lambda: ExitPointProtocol(exit_point), sock=exit_point.sock_to_mix)
+
+
+def run(starts, use_uvloop=False):
+    """Runs the given start coroutines on a new event loop and keeps it
+    running forever. Every node keeps its channels in its own registry, so
+    any number of them can run in a process. With use_uvloop the event loop
+    is provided by the uvloop package, which needs to be installed."""
+    if use_uvloop:
+        import uvloop
+
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    for start in starts:
+        loop.run_until_complete(start)
+
+    # the protocols do all the work from here on
+    loop.run_forever()
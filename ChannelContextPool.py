@@ -0,0 +1,61 @@
+"""Contains a pool of ChannelContexts, that an EntryPoint takes its new
+channels from. A background thread makes new contexts, whenever the pool has
+room for them, so the point multiplications for the channel setup are done
+before a client asks for a channel."""
+from queue import Queue, Empty
+from threading import Thread
+
+
+class ChannelContextPool:
+    def __init__(self, channels, pub_comps, size):
+        """Makes contexts for channels of the given EntryChannels."""
+        if size < 1:
+            raise ValueError("Pool size has to be at least 1.")
+
+        self.channels = channels
+        self.pub_comps = pub_comps
+
+        self.contexts = Queue(size)
+
+        self.stopped = False
+
+        self.producer = Thread(target=self._produce, daemon=True)
+        self.producer.start()
+
+    def _produce(self):
+        while not self.stopped:
+            context = self.channels.create_context(self.pub_comps)
+
+            # blocks, until there is room in the pool
+            self.contexts.put(context)
+
+    def get(self):
+        """Returns a ready context from the pool. If there is none, one is
+        made right away."""
+        try:
+            return self.contexts.get_nowait()
+        except Empty:
+            return self.channels.create_context(self.pub_comps)
+
+    def stop(self):
+        """Stops the producer thread. The contexts still in the pool are
+        dropped and their channel ids given back."""
+        self.stopped = True
+
+        # make room, in case the producer waits for it
+        self._drop_contexts()
+
+        self.producer.join()
+
+        # the one the producer was waiting with
+        self._drop_contexts()
+
+    def _drop_contexts(self):
+        try:
+            while True:
+                self.channels.release_channel(self.contexts.get_nowait().chan_id)
+        except Empty:
+            pass
+
+    def __len__(self):
+        return self.contexts.qsize()
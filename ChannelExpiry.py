@@ -0,0 +1,70 @@
+"""Contains an index of the channels of a channel table by the time they time
+out, so the timed out channels can be found without looking at every channel.
+Channels only update their last_interaction, when they are used, the index
+keeps one entry per channel with the time it would have timed out, when the
+entry was made. Once that time has passed, the channel has either timed out or
+it gets a new entry for its current last_interaction. Until then, looking for
+timed out channels only compares the earliest of these times."""
+import heapq
+import logging
+from itertools import count
+
+from constants import CHANNEL_TIMEOUT_SEC
+
+log = logging.getLogger("ChannelExpiry")
+
+
+class ChannelExpiry:
+    def __init__(self, table, timeout=CHANNEL_TIMEOUT_SEC):
+        self.table = table
+        self.timeout = timeout
+
+        # (deadline, entry number, channel id, channel), the entry number
+        # keeps channels from being compared for equal deadlines
+        self.deadlines = []
+        self.entry_numbers = count()
+
+    def add(self, channel_id, channel):
+        """Adds a channel, that was put into the table under the given id."""
+        deadline = channel.last_interaction + self.timeout
+
+        heapq.heappush(self.deadlines, (deadline, next(self.entry_numbers), channel_id, channel))
+
+    def timed_out(self, now):
+        """Returns the ids of the channels in the table, that were not used for
+        longer than the timeout. They are no longer in the index, but still
+        have to be removed from the table."""
+        timed_out = []
+
+        while self.deadlines and self.deadlines[0][0] < now:
+            _, _, channel_id, channel = heapq.heappop(self.deadlines)
+
+            if self.table.get(channel_id) is not channel:
+                # removed from the table already
+                continue
+
+            if self.expired(channel, now):
+                log.info("Timeout for channel %d", channel_id)
+
+                timed_out.append(channel_id)
+            else:
+                self.add(channel_id, channel)
+
+        return timed_out
+
+    def next_deadline(self):
+        """Returns the time, at which the next channel may time out, or None,
+        if there are no channels. Looking for timed out channels at that
+        time removes them, even if no packets arrive."""
+        if not self.deadlines:
+            return None
+
+        return self.deadlines[0][0]
+
+    def expired(self, channel, now):
+        """Tells, whether the channel was not used for longer than the timeout,
+        even if it was not found by timed_out yet."""
+        return now - channel.last_interaction > self.timeout
+
+    def __len__(self):
+        return len(self.deadlines)
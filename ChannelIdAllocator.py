@@ -0,0 +1,113 @@
+"""Contains an allocator, that hands out random channel ids, that are not in
+use, and takes them back, once their channels are gone. Whether an id is in
+use is kept in a bitmap with one bit for every id, so an allocator takes only
+a few kilobytes and is created at once. Random ids are tried a few times,
+before a scan from a random position looks for a free one, so taking an id
+stays fast, until almost all ids are in use. Ids, that were given back, are
+held back for a while, before they are free again, since the next hop only
+notices, that a channel timed out, some time after we did."""
+from collections import deque
+from itertools import chain
+from time import time
+
+from Cryptodome.Random.random import randrange
+
+from constants import MIN_CHAN_ID, MAX_CHAN_ID, CHANNEL_ID_REUSE_DELAY
+
+# random ids tried, before the bitmap is scanned for a free one
+RANDOM_PROBES = 8
+
+
+class ChannelIdsExhaustedError(IndexError):
+    pass
+
+
+class ChannelIdAllocator:
+    """Allocates the channel ids between MIN_CHAN_ID and MAX_CHAN_ID. When the
+    channels are split into shards, only the ids with id % shard_count ==
+    shard_index are handed out."""
+
+    def __init__(self, shard_index=0, shard_count=1, min_id=MIN_CHAN_ID, max_id=MAX_CHAN_ID,
+                 reuse_delay=CHANNEL_ID_REUSE_DELAY):
+        # the first id of the shard, the bits are the ids of the shard in order
+        self.first_id = min_id + (shard_index - min_id) % shard_count
+        self.shard_count = shard_count
+
+        self.id_count = len(range(self.first_id, max_id + 1, self.shard_count))
+
+        # a set bit is an id, that is in use or held back
+        self.bitmap = bytearray((self.id_count + 7) // 8)
+
+        # the bits after the last id are never free
+        if self.id_count % 8:
+            self.bitmap[-1] = 0xFF << (self.id_count % 8) & 0xFF
+
+        self.free_count = self.id_count
+
+        self.reuse_delay = reuse_delay
+
+        # (time from which on it is free, id) of the released ids, oldest
+        # first, and the same ids as a set
+        self.held = deque()
+        self.held_ids = set()
+
+    def allocate(self, now=None):
+        """Returns a random free id, which is in use from now on."""
+        self._free_held(time() if now is None else now)
+
+        if not self.free_count:
+            raise ChannelIdsExhaustedError("No free channel ids left.")
+
+        for _ in range(RANDOM_PROBES):
+            bit = randrange(self.id_count)
+
+            if not self.bitmap[bit >> 3] & 1 << (bit & 7):
+                break
+        else:
+            bit = self._scan(randrange(len(self.bitmap)))
+
+        self.bitmap[bit >> 3] |= 1 << (bit & 7)
+        self.free_count -= 1
+
+        return self.first_id + bit * self.shard_count
+
+    def _scan(self, start):
+        """Returns the first free bit in the bitmap from the byte at start on,
+        wrapping around at its end."""
+        bitmap = self.bitmap
+
+        index = next(index for index in chain(range(start, len(bitmap)), range(start))
+                     if bitmap[index] != 0xFF)
+
+        byte = bitmap[index]
+
+        # the lowest bit, that is not set
+        return index * 8 + (~byte & (byte + 1)).bit_length() - 1
+
+    def release(self, chan_id, now=None):
+        """Makes an allocated id free again, once the reuse delay has passed.
+        """
+        bit, remainder = divmod(chan_id - self.first_id, self.shard_count)
+
+        if remainder or not 0 <= bit < self.id_count or not self.bitmap[bit >> 3] & 1 << (bit & 7) \
+                or chan_id in self.held_ids:
+            raise ValueError("Channel id {} is not in use.".format(chan_id))
+
+        self.held.append(((time() if now is None else now) + self.reuse_delay, chan_id))
+        self.held_ids.add(chan_id)
+
+    def _free_held(self, now):
+        while self.held and self.held[0][0] <= now:
+            _, chan_id = self.held.popleft()
+
+            self.held_ids.remove(chan_id)
+
+            bit = (chan_id - self.first_id) // self.shard_count
+
+            self.bitmap[bit >> 3] &= ~(1 << (bit & 7)) & 0xFF
+            self.free_count += 1
+
+    def __len__(self):
+        self._free_held(time())
+
+        return self.free_count
@@ -0,0 +1,109 @@
+"""Contains a pool of worker processes, that do the public key processing of
+channel init messages for a Mix. While a channel init is processed, the Mix
+can keep forwarding the messages of other channels. Finished channel inits
+are signalled over a socket, so they can be waited for together with the
+socket of the Mix."""
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from socket import socketpair
+from threading import Thread
+from time import sleep
+
+from petlib.bn import Bn
+
+from MsgV3 import process, ElementCache
+from util import b2i
+
+# the private key of the mix, set in every worker process
+_priv_comp = None
+
+# every worker caches the group elements of the inits it processed
+_element_cache = ElementCache()
+
+
+def _init_worker(secret, mix_pid):
+    global _priv_comp
+
+    _priv_comp = Bn.from_binary(secret)
+
+    Thread(target=_watch_mix, args=(mix_pid,), daemon=True).start()
+
+
+def _watch_mix(mix_pid):
+    # the workers are not told, when the mix process is killed, so they
+    # check for it themselves
+    while os.getppid() == mix_pid:
+        sleep(1)
+
+    os._exit(0)
+
+
+def _process(channel_id, message_counter, message):
+    return process(_priv_comp, message_counter, message, _element_cache, channel_id)
+
+
+class ChannelInitPool:
+    def __init__(self, secret, workers):
+        # spawned workers don't inherit the socket of the mix
+        self.executor = ProcessPoolExecutor(workers, mp_context=get_context("spawn"), initializer=_init_worker,
+                                            initargs=(secret.binary(), os.getpid()))
+
+        # (channel, message counter, future) of finished channel inits
+        self.completed = deque()
+
+        self.notify_recv, self.notify_send = socketpair()
+        self.notify_recv.setblocking(False)
+        self.notify_send.setblocking(False)
+
+    def submit(self, channel, msg_ctr, channel_init):
+        """Processes the channel init message of the given channel in one of
+        the workers. Takes the return values of ChannelMid.start_channel_init.
+        """
+        future = self.executor.submit(_process, channel.in_chan_id, b2i(msg_ctr), channel_init)
+
+        future.add_done_callback(lambda done: self._done(channel, msg_ctr, done))
+
+    def _done(self, channel, msg_ctr, future):
+        # called in a thread of the executor
+        self.completed.append((channel, msg_ctr, future))
+
+        try:
+            self.notify_send.send(b"\x00")
+        except BlockingIOError:
+            # enough notifications are waiting already
+            pass
+
+    def fileno(self):
+        """Becomes readable, when channel inits were finished."""
+        return self.notify_recv.fileno()
+
+    def finish_completed(self):
+        """Hands the results of all finished channel inits to their
+        channels. Returns the exceptions of the channel inits, that failed."""
+        try:
+            while self.notify_recv.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+
+        failed = []
+
+        while self.completed:
+            channel, msg_ctr, future = self.completed.popleft()
+
+            try:
+                key_req, key_res, _, channel_init = future.result()
+            except Exception as error:
+                channel.abort_channel_init()
+
+                failed.append(error)
+                continue
+
+            channel.finish_channel_init(msg_ctr, key_req, key_res, channel_init)
+
+        return failed
+
+    def shutdown(self):
+        self.executor.shutdown()
@@ -0,0 +1,80 @@
+"""Contains the queue a Mix stores the packets in, that it sends in one
+direction. Every channel gets a queue of its own and when a flush strategy
+takes packets out, the channels take turns, so a channel with a lot of
+packets can not push back the packets of the others. Every channel gives one
+packet per turn, channel ids are random and short lived, so there is nothing
+to weight them by. The flush strategies shuffle the packets they take, so
+the order, in which the channels take their turns, is not visible on the
+wire."""
+from collections import deque
+
+from constants import CHAN_ID_SIZE
+from util import b2i
+
+
+class ChannelQueue:
+    """Stores packets per channel and gives them out in turns."""
+
+    def __init__(self):
+        # packets of the channels by channel id, oldest first
+        self.queues = dict()
+
+        # ids of the channels with packets, in the order of their turns
+        self.ready = deque()
+
+        self.length = 0
+
+    def add(self, chan_id, packet):
+        """Stores a packet, that is sent with the given channel id."""
+        queue = self.queues.get(chan_id)
+
+        if queue is None:
+            queue = self.queues[chan_id] = deque()
+
+            self.ready.append(chan_id)
+
+        queue.append(packet)
+
+        self.length += 1
+
+    def extend(self, packets):
+        """Stores packets made by UDPChannel.create_packet, whose channel ids
+        are read from their headers."""
+        for packet in packets:
+            self.add(b2i(packet[:CHAN_ID_SIZE]), packet)
+
+    def take(self, count):
+        """Removes up to count packets and returns them. The channels take
+        turns giving their oldest packet, the next call goes on with the
+        channel, whose turn is next."""
+        taken = []
+
+        while self.ready and len(taken) < count:
+            chan_id = self.ready.popleft()
+            queue = self.queues[chan_id]
+
+            taken.append(queue.popleft())
+
+            if queue:
+                self.ready.append(chan_id)
+            else:
+                del self.queues[chan_id]
+
+        self.length -= len(taken)
+
+        return taken
+
+    def clear(self):
+        self.queues.clear()
+        self.ready.clear()
+
+        self.length = 0
+
+    def __iter__(self):
+        """Yields the stored packets channel by channel, without removing
+        them."""
+        for chan_id in self.ready:
+            yield from self.queues[chan_id]
+
+    def __len__(self):
+        return self.length
@@ -3,6 +3,8 @@ from util import i2b
 
 
 class Counter:
+    __slots__ = ["current_value"]
+
     def __init__(self, start):
         self.current_value = start
 
@@ -1,20 +1,38 @@
 #!/usr/bin/python3 -u
 """Contains the EntryPoint object, which connects clients with a mix chain, by
 converting them into mix messages before sending."""
+import logging
 from argparse import ArgumentParser
+from select import select
 from socket import socket, AF_INET, SOCK_DGRAM as UDP
+from time import time
 
 from petlib.ec import EcPt, EcGroup
 
+from ChannelContextPool import ChannelContextPool
 from LinkEncryption import LinkDecryptor, LinkEncryptor
-from UDPChannel import ChannelEntry
-from constants import IPV4_LEN, PORT_LEN, SYM_KEY_LEN, UDP_MTU
-from util import b2i, read_cfg_values, cut, b2ip, parse_ip_port
+from Log import add_log_arguments, setup_logging_from_args
+from Metrics import REGISTRY, MetricsRegistry, MetricsServer
+from PacketDrops import PacketDrops, DROP_REASONS
+from SendScheduler import RoundRobinScheduler, send_scheduler, parse_weights, ROUND_ROBIN, DEFICIT_ROUND_ROBIN
+from Trace import TraceRing, RECEIVED, CRYPTED, SENT, REQUEST, RESPONSE
+from UDPChannel import EntryChannels, UnknownChannelError
+from constants import IPV4_LEN, PORT_LEN, SYM_KEY_LEN, UDP_MTU, CONTEXT_POOL_SIZE, METRICS_HOST
+from util import b2i, read_cfg_values, cut, b2ip, parse_ip_port, seconds_until
 
 OWN_ADDR_ARG = "own_ip:port"
 MIX_ADDR_ARG = "mix_ip:port"
 KEYFILE_ARG = "keyfile"
 
+# how many fragments are sent, before packets waiting on the socket are handled
+SEND_BURST = 64
+
+# how many channels prepare their key streams, before the socket is checked
+# again
+PREFETCH_BATCH = 16
+
+log = logging.getLogger("EntryPoint")
+
 
 class EntryPoint:
     """The EntryPoint connects Clients with the mix chain. It takes regular
@@ -24,7 +42,8 @@ class EntryPoint:
     Responses that come in over the mix chain are reassembled here as well and
     sent to the clients that are responded to."""
 
-    def __init__(self, listen_addr, addr_to_mix):
+    def __init__(self, listen_addr, addr_to_mix, context_pool_size=0, trace=None, scheduler=None,
+                 send_burst=SEND_BURST):
         # where to listen on
         self.own_addr = listen_addr
 
@@ -34,36 +53,105 @@ class EntryPoint:
         # map of (src_ip:port, dest_ip:port) to channel id
         self.ips2id = dict()
 
+        # the channels of this entry point by their channel id
+        self.channels = EntryChannels()
+
+        # decides which channel sends its next fragment
+        if scheduler is None:
+            scheduler = RoundRobinScheduler()
+
+        self.scheduler = scheduler
+        self.send_burst = send_burst
+
         # list of the asymmetric mix ciphers to encrypt channel init messages
         self.pub_comps = []
 
+        # number of channel contexts to keep ready for new channels, if any
+        self.context_pool_size = context_pool_size
+        self.context_pool = None
+
         # the socket we listen for packet on
         self.listener_socket = None
 
         self.link_decryptor = LinkDecryptor(bytes(SYM_KEY_LEN))
         self.link_encryptor = LinkEncryptor(bytes(SYM_KEY_LEN))
 
+        # packets, that were dropped, because handling them failed
+        self.drops = PacketDrops()
+
+        # the TraceRing packet events are recorded into, if any
+        self.trace = trace
+
+        # metrics of this node, the process wide ones are in REGISTRY
+        self.metrics = MetricsRegistry()
+
+        self._register_metrics(self.metrics)
+
+    def _register_metrics(self, registry):
+        self.requests_received = registry.counter("pymix_packets_received_total", "Packets received by the node.",
+                                                  {"direction": "request"})
+        self.responses_received = registry.counter("pymix_packets_received_total", "Packets received by the node.",
+                                                   {"direction": "response"})
+        self.requests_sent = registry.counter("pymix_packets_sent_total", "Packets sent by the node.",
+                                              {"direction": "request"})
+        self.responses_sent = registry.counter("pymix_packets_sent_total", "Packets sent by the node.",
+                                               {"direction": "response"})
+
+        registry.gauge("pymix_queued_messages", "Client messages waiting to be sent as fragments.",
+                       function=lambda: sum(len(channel.packets) for channel in list(self.channels.table.values())))
+        registry.gauge("pymix_channels", "Channels known to the node.", function=lambda: len(self.channels.table))
+        registry.gauge("pymix_ready_channels", "Channels with fragments waiting to be sent.",
+                       function=lambda: len(self.scheduler))
+        registry.gauge("pymix_channel_contexts", "Channel contexts ready for new channels.",
+                       function=lambda: len(self.context_pool) if self.context_pool is not None else 0)
+
+        for reason in DROP_REASONS:
+            registry.counter("pymix_packets_dropped_total", "Packets dropped, because handling them failed.",
+                             {"reason": reason}, lambda reason=reason: self.drops[reason])
+
     def set_keys(self, public_keys):
-        """Initializes a cipher for en- and decrypting using the given keys."""
+        """Initializes a cipher for en- and decrypting using the given keys.
+        Contexts for new channels are prepared with them from now on."""
         self.pub_comps = public_keys
 
+        if self.context_pool is not None:
+            self.context_pool.stop()
+
+        if self.context_pool_size:
+            self.context_pool = ChannelContextPool(self.channels, public_keys, self.context_pool_size)
+
     def handle_mix_response(self, response):
         """Takes a mix fragment and the channel id it came from. This
         represents a part of a response that was send back through the mix
         chain."""
         chan_id, msg_ctr, fragment, msg_type = self.link_decryptor.decrypt(response)
 
-        channel = ChannelEntry.table[chan_id]
+        if chan_id not in self.channels.table:
+            raise UnknownChannelError("Got response for unknown channel", chan_id)
+
+        if self.trace is not None:
+            self.trace.record(RECEIVED, RESPONSE, chan_id, b2i(msg_ctr))
+
+        channel = self.channels.table[chan_id]
 
         channel.response(msg_type + msg_ctr + fragment)
 
+        if self.trace is not None:
+            self.trace.record(CRYPTED, RESPONSE, chan_id, b2i(msg_ctr))
+
         # send received responses to their respective recipients without
         # waiting
         for mix_msg in channel.get_completed_responses():
-            print(self, "Data {}:{} - {} <- {}".format(*channel.src_addr, channel.chan_id, len(mix_msg.payload)))
+            log.debug("%s Data %s:%d - %d <- %d", self, *channel.src_addr, channel.chan_id, len(mix_msg.payload))
+
+            # the fragment, that completed the message
+            if self.trace is not None:
+                self.trace.record(SENT, RESPONSE, chan_id, b2i(msg_ctr))
 
             self.listener_socket.sendto(mix_msg.payload, channel.src_addr)
 
+            self.responses_sent.inc()
+
     def handle_client_request(self, request, src_addr):
         """Takes a message and the source address it came from. The destination
         header is cut off, parsed and mapped to a channel. Then the payload is
@@ -79,7 +167,7 @@ class EntryPoint:
             try:
                 channel_id = self.ips2id[src_addr, dest_addr]
 
-                channel = ChannelEntry.table[channel_id]
+                channel = self.channels.table[channel_id]
             except KeyError:
                 del self.ips2id[src_addr, dest_addr]
                 channel = self.make_new_channel(src_addr, dest_addr)
@@ -87,39 +175,98 @@ class EntryPoint:
         # add fragments to internal packet list
         channel.request(payload)
 
+        self.scheduler.add(channel)
+
     def make_new_channel(self, src_addr, dest_addr):
-        channel = ChannelEntry(src_addr, dest_addr, self.pub_comps)
+        if self.context_pool is not None:
+            context = self.context_pool.get()
+        else:
+            context = None
+
+        channel = self.channels.create(src_addr, dest_addr, self.pub_comps, context)
 
         self.ips2id[(src_addr, dest_addr)] = channel.chan_id
 
         return channel
 
-    def send_messages_to_mix(self):
-        for channel in ChannelEntry.table.values():
-            while channel.can_send():
-                message = channel.get_message()
-                cipher_text = self.link_encryptor.encrypt(message)
+    def handle_packet(self, data, addr):
+        """Hands the packet to the response or request path, depending on the
+        address it came from. If handling it fails, the packet is dropped."""
+        try:
+            if addr == self.mix_addr:
+                self.responses_received.inc()
+                self.handle_mix_response(data)
+            else:
+                self.requests_received.inc()
+                self.handle_client_request(data, addr)
+        except Exception as error:
+            self.drop_packet(error)
+
+    def drop_packet(self, error):
+        """Counts a packet, whose handling raised the given exception."""
+        reason = self.drops.drop(error)
+
+        log.warning("%s Dropped packet: %s %s", self, reason, error)
+
+    def send_messages_to_mix(self, limit=None):
+        """Sends the fragments of the channels, in the order the scheduler
+        chooses, but at most limit of them. The rest stays for the next call.
+        """
+        for channel in self.scheduler.take(limit):
+            message = channel.get_message()
 
-                print(self, "{}:{} - {} ->".format(*channel.src_addr, channel.chan_id), len(cipher_text))
+            if self.trace is not None:
+                self.trace.record_packet(CRYPTED, REQUEST, message)
 
-                self.listener_socket.sendto(cipher_text, mix_addr)
+            cipher_text = self.link_encryptor.encrypt(message)
+
+            log.debug("%s %s:%d - %d -> %d", self, *channel.src_addr, channel.chan_id, len(cipher_text))
+
+            if self.trace is not None:
+                self.trace.record_packet(SENT, REQUEST, message)
+
+            self.listener_socket.sendto(cipher_text, self.mix_addr)
+
+            self.requests_sent.inc()
+
+    def prefetch_pads(self):
+        """Lets up to PREFETCH_BATCH of the channels, that recently sent or
+        received fragments, prepare the key streams of their next ones.
+        Returns whether there are channels left to do."""
+        return self.channels.prefetch_pads(PREFETCH_BATCH)
 
     def run(self):
         """Starts the EntryPoint main loop, listening on the given address and
         converting/relaying messages."""
         self.listener_socket = socket(AF_INET, UDP)
-        self.listener_socket.bind(own_addr)
+        self.listener_socket.bind(self.own_addr)
 
-        print(self, "Listening on {}:{}.".format(*own_addr))
+        log.info("%s Listening on %s:%d.", self, *self.own_addr)
         while True:
-            data, addr = self.listener_socket.recvfrom(UDP_MTU)
+            waiting = select([self.listener_socket], [], [], 0)[0]
 
-            if addr == self.mix_addr:
-                self.handle_mix_response(data)
-            else:
-                self.handle_client_request(data, addr)
+            if not waiting and not self.scheduler:
+                # use the time until the next packet arrives, a few channels
+                # at a time
+                while self.prefetch_pads() and not select([self.listener_socket], [], [], 0)[0]:
+                    pass
+
+                # wait for the next packet or the next channel, that may time
+                # out
+                timeout = seconds_until([self.channels.next_deadline()])
+
+                waiting = select([self.listener_socket], [], [], timeout)[0]
+
+            self.channels.remove_timed_out(time())
 
-            self.send_messages_to_mix()
+            # packets and bursts of fragments take turns, while there are
+            # fragments left to send
+            if waiting:
+                data, addr = self.listener_socket.recvfrom(UDP_MTU)
+
+                self.handle_packet(data, addr)
+
+            self.send_messages_to_mix(self.send_burst)
 
     def __str__(self):
         return "EntryPoint"
@@ -131,9 +278,35 @@ if __name__ == "__main__":
     ap.add_argument(
         OWN_ADDR_ARG, help="ip and port, to listen for packets on.")
     ap.add_argument("config", help="Config file describing the mix chain.")
+    ap.add_argument("--context-pool", type=int, default=CONTEXT_POOL_SIZE,
+                    help="Number of channel contexts to prepare in the background. 0 prepares them on demand.")
+    ap.add_argument("--scheduler", choices=[ROUND_ROBIN, DEFICIT_ROUND_ROBIN], default=ROUND_ROBIN,
+                    help="In which order the channels send their fragments.")
+    ap.add_argument("--weight", action="append", default=[], metavar="IP:PORT=WEIGHT",
+                    help="Fragments a channel to or from this address may send per turn of the deficit-round-robin "
+                         "scheduler, instead of 1. Can be repeated.")
+    ap.add_argument("--send-burst", type=int, default=SEND_BURST,
+                    help="Maximum number of fragments sent, before waiting packets are handled.")
+    ap.add_argument("--metrics-port", type=int, default=0,
+                    help="Port to serve the metrics of the entry point on, in the Prometheus text format. 0 serves "
+                         "none.")
+    ap.add_argument("--trace", metavar="FILE",
+                    help="Record the packet events of the entry point into a trace ring in this file, for "
+                         "TraceAnalyzer.py.")
+    add_log_arguments(ap)
+    ap.add_argument("--asyncio", action="store_true", help="Run the entry point on an asyncio event loop.")
+    ap.add_argument("--uvloop", action="store_true",
+                    help="Use the event loop of the uvloop package. Implies --asyncio.")
 
     args = ap.parse_args()
 
+    setup_logging_from_args(args)
+
+    try:
+        scheduler = send_scheduler(args.scheduler, parse_weights(args.weight))
+    except ValueError as error:
+        ap.error(str(error))
+
     # get own ip and port
     own_addr = parse_ip_port(getattr(args, OWN_ADDR_ARG))
 
@@ -143,7 +316,8 @@ if __name__ == "__main__":
     mix_addr = parse_ip_port("{}:{}".format(mix_ip, mix_port))
 
     # this entry point instance
-    entry_point = EntryPoint(own_addr, mix_addr)
+    entry_point = EntryPoint(own_addr, mix_addr, args.context_pool, TraceRing(args.trace) if args.trace else None,
+                             scheduler, args.send_burst)
 
     # prepare the keys
     public_keys = []
@@ -157,4 +331,12 @@ if __name__ == "__main__":
     # init the ciphers
     entry_point.set_keys(public_keys)
 
-    entry_point.run()
+    if args.metrics_port:
+        MetricsServer([REGISTRY, entry_point.metrics], (METRICS_HOST, args.metrics_port)).start()
+
+    if args.asyncio or args.uvloop:
+        from AsyncRuntime import run, start_entry_point
+
+        run([start_entry_point(entry_point)], args.uvloop)
+    else:
+        entry_point.run()
@@ -3,19 +3,27 @@
 mix messages. Their payloads are sent to the destination from a fixed random
 so that the destination can respond to it. Responses to that port get broken
 up into fragments and sent back over the udp channel/mix chain."""
+import logging
 from argparse import ArgumentParser as ArgParser
 from selectors import EVENT_READ
 # standard library
 from socket import socket, AF_INET, SOCK_DGRAM as UDP
+from time import time
 
 from LinkEncryption import LinkDecryptor, LinkEncryptor
-from UDPChannel import ChannelExit
-from constants import UDP_MTU, SYM_KEY_LEN, CHAN_INIT_MSG_FLAG, INIT_OVERHEAD
-from util import parse_ip_port, cut
+from Log import add_log_arguments, setup_logging_from_args
+from Metrics import REGISTRY, MetricsRegistry, MetricsServer
+from PacketDrops import PacketDrops, DROP_REASONS
+from Trace import TraceRing, RECEIVED, QUEUED, SENT, REQUEST, RESPONSE
+from UDPChannel import ExitChannels, UnknownChannelError
+from constants import UDP_MTU, SYM_KEY_LEN, CHAN_INIT_MSG_FLAG, INIT_OVERHEAD, METRICS_HOST
+from util import parse_ip_port, cut, b2i, seconds_until
+
+log = logging.getLogger("ExitPoint")
 
 
 class ExitPoint:
-    def __init__(self, own_addr):
+    def __init__(self, own_addr, trace=None):
         self.mix_addr = None
 
         # the socket the mix sends fragments to
@@ -23,29 +31,153 @@ class ExitPoint:
         self.sock_to_mix.bind(own_addr)
         self.sock_to_mix.setblocking(False)
 
-        # add it to the socket selector in Channel Exit
-        ChannelExit.sock_sel.register(self.sock_to_mix, EVENT_READ)
+        # the channels of this exit point by their channel id
+        self.channels = ExitChannels()
+
+        # the sockets of the channels are registered with the same selector
+        self.channels.sock_sel.register(self.sock_to_mix, EVENT_READ)
 
         self.link_decryptor = LinkDecryptor(bytes(SYM_KEY_LEN))
         self.link_encryptor = LinkEncryptor(bytes(SYM_KEY_LEN))
 
+        # packets from the mix, that were dropped, because handling them failed
+        self.drops = PacketDrops()
+
+        # the TraceRing packet events are recorded into, if any
+        self.trace = trace
+
+        # metrics of this node, the process wide ones are in REGISTRY
+        self.metrics = MetricsRegistry()
+
+        self._register_metrics(self.metrics)
+
+    def _register_metrics(self, registry):
+        self.requests_received = registry.counter("pymix_packets_received_total", "Packets received by the node.",
+                                                  {"direction": "request"})
+        self.responses_received = registry.counter("pymix_packets_received_total", "Packets received by the node.",
+                                                   {"direction": "response"})
+        self.responses_sent = registry.counter("pymix_packets_sent_total", "Packets sent by the node.",
+                                               {"direction": "response"})
+
+        registry.gauge("pymix_queued_packets", "Packets waiting to be sent.", {"direction": "response"},
+                       lambda: len(self.channels.to_mix))
+        registry.gauge("pymix_channels", "Channels known to the node.", function=lambda: len(self.channels.table))
+
+        for reason in DROP_REASONS:
+            registry.counter("pymix_packets_dropped_total", "Packets dropped, because handling them failed.",
+                             {"reason": reason}, lambda reason=reason: self.drops[reason])
+
+    def handle_mix_packet(self, packet):
+        """Link decrypts a packet from the mix and hands it to its channel. A
+        channel init message for an unknown channel creates a new channel.
+        Returns the channel the packet belonged to."""
+        self.requests_received.inc()
+
+        chan_id, msg_ctr, fragment, msg_type = self.link_decryptor.decrypt(packet)
+
+        if self.trace is not None:
+            self.trace.record(RECEIVED, REQUEST, chan_id, b2i(msg_ctr))
+
+        # new channel detected
+        if msg_type == CHAN_INIT_MSG_FLAG:
+            channel = self.channels.table.get(chan_id)
+
+            if channel is not None and self.channels.expiry.expired(channel, time()):
+                # the mix gave the id of a channel, that timed out, to a new one
+                self.channels.remove(chan_id)
+
+                channel = None
+
+            # automatically puts it into the channel table
+            if channel is not None:
+                log.debug("%s Received Channel Init message for established Channel %d", self, chan_id)
+
+                _, fragment = cut(fragment, INIT_OVERHEAD)
+
+                channel.recv_request(fragment)
+            else:
+                channel = self.channels.create(chan_id)
+
+                # first message of a channel is channel init
+                channel.parse_channel_init(fragment)
+
+            channel.send_chan_confirm()
+        else:
+            # data msg
+            if chan_id not in self.channels.table.keys():
+                raise UnknownChannelError("Received Data Msg before Channel was established", chan_id)
+            else:
+                channel = self.channels.table[chan_id]
+                channel.recv_request(fragment)
+
+        return channel
+
+    def handle_response(self, channel, response):
+        """Hands a response from the destination to its channel. Returns
+        False, if the channel was removed in the meantime. Its id may belong
+        to another channel by now, so the response is dropped and the socket
+        should be closed."""
+        if self.channels.table.get(channel.in_chan_id) is not channel:
+            return False
+
+        self.responses_received.inc()
+
+        queued = len(self.channels.to_mix)
+
+        channel.recv_response(response)
+
+        if self.trace is not None:
+            for packet in self.channels.to_mix[queued:]:
+                self.trace.record_packet(QUEUED, RESPONSE, packet)
+
+        return True
+
+    def drop_packet(self, error):
+        """Counts a packet, whose handling raised the given exception."""
+        reason = self.drops.drop(error)
+
+        log.warning("%s Dropped packet: %s %s", self, reason, error)
+
+    def send_to_mix(self):
+        """Sends the responses stored by the channels to the mix."""
+        for packet in self.channels.to_mix:
+            cipher_text = self.link_encryptor.encrypt(packet)
+
+            log.debug("%s Data/Init <- %d", self, len(cipher_text))
+
+            if self.trace is not None:
+                self.trace.record_packet(SENT, RESPONSE, packet)
+
+            self.sock_to_mix.sendto(cipher_text, self.mix_addr)
+
+        self.responses_sent.inc(len(self.channels.to_mix))
+
+        self.channels.to_mix.clear()
+
     def run(self):
         while True:
-            events = ChannelExit.sock_sel.select()
+            # wait for packets or the next channel, that may time out
+            events = self.channels.sock_sel.select(seconds_until([self.channels.next_deadline()]))
+
+            self.channels.remove_timed_out(time())
 
             for key, _ in events:
                 channel = key.data
 
                 if channel is not None:
+                    if self.channels.table.get(channel.in_chan_id) is not channel:
+                        # removed meanwhile, its socket is closed
+                        continue
+
                     # if the socket is associated with a channel, it's a
                     # response
                     try:
                         response = channel.out_sock.recv(UDP_MTU)
                     except ConnectionRefusedError as cfe:
-                        print(cfe, channel.out_sock.getpeername())
+                        log.warning("%s %s", cfe, channel.out_sock.getpeername())
                         continue
 
-                    channel.recv_response(response)
+                    self.handle_response(channel, response)
                 else:
                     # the only socket without a channel is the mix socket
                     sock = key.fileobj
@@ -60,42 +192,13 @@ class ExitPoint:
                     else:
                         packet = sock.recv(UDP_MTU)
 
-                    chan_id, _, fragment, msg_type = self.link_decryptor.decrypt(packet)
-
-                    # new channel detected
-                    if msg_type == CHAN_INIT_MSG_FLAG:
-                        # automatically puts it into the channel table
-                        # of ChannelExit
-                        if chan_id in ChannelExit.table.keys():
-                            print(self, "Received Channel Init message for established Channel", chan_id)
-
-                            channel = ChannelExit.table[chan_id]
-
-                            _, fragment = cut(fragment, INIT_OVERHEAD)
-
-                            channel.recv_request(fragment)
-                        else:
-                            channel = ChannelExit(chan_id)
-
-                            # first message of a channel is channel init
-                            channel.parse_channel_init(fragment)
-
-                        channel.send_chan_confirm()
-                    else:
-                        # data msg
-                        if chan_id not in ChannelExit.table.keys():
-                            raise Exception("Received Data Msg before Channel was established", chan_id)
-                        else:
-                            ChannelExit.table[chan_id].recv_request(fragment)
+                    try:
+                        self.handle_mix_packet(packet)
+                    except Exception as error:
+                        self.drop_packet(error)
 
                 # send responses to mix
-                for packet in ChannelExit.to_mix:
-                    cipher_text = self.link_encryptor.encrypt(packet)
-
-                    print(self, "Data/Init <-", len(cipher_text))
-                    self.sock_to_mix.send(cipher_text)
-
-                ChannelExit.to_mix.clear()
+                self.send_to_mix()
 
     def __str__(self):
         return "ExitPoint"
@@ -104,11 +207,32 @@ class ExitPoint:
 if __name__ == "__main__":
     parser = ArgParser(description="Receives data on the specified ip:port using UDP and prints it on stdout.")
     parser.add_argument("ip:port", help="IP and Port pair to listen for datagrams on")
+    parser.add_argument("--metrics-port", type=int, default=0,
+                        help="Port to serve the metrics of the exit point on, in the Prometheus text format. 0 serves "
+                             "none.")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="Record the packet events of the exit point into a trace ring in this file, for "
+                             "TraceAnalyzer.py.")
+    add_log_arguments(parser)
+    parser.add_argument("--asyncio", action="store_true", help="Run the exit point on an asyncio event loop.")
+    parser.add_argument("--uvloop", action="store_true",
+                        help="Use the event loop of the uvloop package. Implies --asyncio.")
 
     args = parser.parse_args()
 
+    setup_logging_from_args(args)
+
     own_socket_addr = parse_ip_port(getattr(args, "ip:port"))
-    print("Listening on {}:{}".format(*own_socket_addr))
+    log.info("Listening on %s:%d", *own_socket_addr)
+
+    exit_point = ExitPoint(own_socket_addr, TraceRing(args.trace) if args.trace else None)
+
+    if args.metrics_port:
+        MetricsServer([REGISTRY, exit_point.metrics], (METRICS_HOST, args.metrics_port)).start()
+
+    if args.asyncio or args.uvloop:
+        from AsyncRuntime import run, start_exit_point
 
-    exit_point = ExitPoint(own_socket_addr)
-    exit_point.run()
+        run([start_exit_point(exit_point)], args.uvloop)
+    else:
+        exit_point.run()
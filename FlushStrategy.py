@@ -0,0 +1,147 @@
+"""Contains the strategies a Mix can use to decide, when and which of its
+stored packets are sent out. A strategy with a deadline wants to be asked
+again at that point in time, even if no new packets arrived until then.
+The packets are taken from a ChannelQueue, so the channels share the packets
+of a flush fairly. With a limit a flush sends at most that many packets, the
+rest waits for the next one."""
+from time import time
+
+from util import shuffle
+
+THRESHOLD = "threshold"
+TIMED = "timed"
+TIMED_POOL = "timed-pool"
+
+
+class ThresholdFlush:
+    """Sends out stored packets in groups of threshold packets, in the order
+    the ChannelQueue gives them out. Each group is shuffled before sending.
+    Packets, that do not fill a complete group, stay in the store. If the
+    limit left complete groups in the store, it wants to flush again right
+    away, after the Mix had the chance to receive."""
+
+    def __init__(self, threshold, limit=None):
+        if threshold < 1:
+            raise ValueError("Threshold can't be less than 1.")
+
+        if limit is not None and limit < threshold:
+            raise ValueError("Limit can't be less than the threshold.")
+
+        self.threshold = threshold
+        self.limit = limit
+        self.next_flush = None
+
+    def deadline(self):
+        return self.next_flush
+
+    def select(self, packets, now):
+        sendable = len(packets) - len(packets) % self.threshold
+
+        if self.limit is not None:
+            sendable = min(sendable, self.limit - self.limit % self.threshold)
+
+        selected = packets.take(sendable)
+
+        for start in range(0, sendable, self.threshold):
+            group = selected[start:start + self.threshold]
+            shuffle(group)
+
+            selected[start:start + self.threshold] = group
+
+        self.next_flush = now if len(packets) >= self.threshold else None
+
+        return selected
+
+
+class TimedFlush:
+    """Sends out all stored packets in random order, every interval seconds."""
+
+    def __init__(self, interval, limit=None):
+        if interval <= 0:
+            raise ValueError("Interval has to be greater than 0.")
+
+        if limit is not None and limit < 1:
+            raise ValueError("Limit can't be less than 1.")
+
+        self.interval = interval
+        self.limit = limit
+        self.next_flush = time() + interval
+
+    def deadline(self):
+        return self.next_flush
+
+    def select(self, packets, now):
+        if now < self.next_flush:
+            return []
+
+        self._schedule_next(now)
+
+        return self._take(packets, len(packets))
+
+    def _schedule_next(self, now):
+        self.next_flush += self.interval
+
+        # we were late by more than one interval, start counting from now
+        if self.next_flush <= now:
+            self.next_flush = now + self.interval
+
+    def _take(self, packets, count):
+        if self.limit is not None:
+            count = min(count, self.limit)
+
+        selected = packets.take(count)
+
+        shuffle(selected)
+
+        return selected
+
+
+class TimedPoolFlush(TimedFlush):
+    """Every interval seconds sends out all stored packets, except for
+    pool_size randomly chosen ones, which stay in the store. With a limit,
+    the kept back ones are chosen from the packets the channels would give
+    for the flush and pool_size more."""
+
+    def __init__(self, interval, pool_size, limit=None):
+        super().__init__(interval, limit)
+
+        if pool_size < 0:
+            raise ValueError("Pool size can't be negative.")
+
+        self.pool_size = pool_size
+
+    def select(self, packets, now):
+        if now < self.next_flush:
+            return []
+
+        self._schedule_next(now)
+
+        count = max(0, len(packets) - self.pool_size)
+
+        if self.limit is not None:
+            count = min(count, self.limit)
+
+        if not count:
+            return []
+
+        selected = packets.take(count + self.pool_size)
+
+        shuffle(selected)
+
+        # the pool goes back to the queues of its channels
+        packets.extend(selected[count:])
+
+        return selected[:count]
+
+
+def flush_strategy(name, threshold, interval, pool_size, limit=None):
+    """Returns a new flush strategy of the given name, taking the parameters
+    it needs from the given ones."""
+    if name == THRESHOLD:
+        return ThresholdFlush(threshold, limit)
+    elif name == TIMED:
+        return TimedFlush(interval, limit)
+    elif name == TIMED_POOL:
+        return TimedPoolFlush(interval, pool_size, limit)
+
+    raise ValueError("Unknown flush strategy", name)
@@ -5,6 +5,10 @@ from constants import LINK_CTR_START, CTR_PREFIX_LEN, LINK_HEADER_LEN, GCM_MAC_L
 from util import cut, gcm_cipher, b2i, get_random_bytes
 
 
+class LinkAuthenticationError(ValueError):
+    pass
+
+
 class LinkEncryptor:
     def __init__(self, link_key):
         self.key = link_key
@@ -40,7 +44,10 @@ class LinkDecryptor:
 
         cipher = gcm_cipher(self.key, link_ctr)
 
-        plain_header = cipher.decrypt_and_verify(header, mac)
+        try:
+            plain_header = cipher.decrypt_and_verify(header, mac)
+        except ValueError as error:
+            raise LinkAuthenticationError("Link header of counter {} failed to verify.".format(link_ctr)) from error
 
         chan_id, msg_ctr, msg_type, _ = cut(
             plain_header, CHAN_ID_SIZE, CTR_PREFIX_LEN, MSG_TYPE_FLAG_LEN)
@@ -0,0 +1,127 @@
+"""Sets up the logging of the nodes. Log records are put into a queue and
+formatted and written by a background thread, so the data path never waits on
+a write. Messages about single packets are logged with the DEBUG level, so on
+the default INFO level they cost a level check and nothing else. Every module
+logs under its own name, which is the category records can be sampled by."""
+import atexit
+import logging
+import os
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+
+from constants import LOG_LEVEL
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(message)s"
+
+LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR"]
+
+
+class SampleFilter(logging.Filter):
+    """Only lets every rate-th record of a category through. Categories are
+    the names of the loggers, records of categories without a rate all pass.
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+
+        self.rates = rates
+        self.counts = dict.fromkeys(rates, 0)
+
+    def filter(self, record):
+        rate = self.rates.get(record.name)
+
+        if rate is None:
+            return True
+
+        count = self.counts[record.name]
+        self.counts[record.name] = count + 1
+
+        return count % rate == 0
+
+
+class DeferredQueueHandler(QueueHandler):
+    """Puts records into the queue as they are, unlike the QueueHandler, which
+    formats their messages first. The writer thread formats them instead."""
+
+    def prepare(self, record):
+        return record
+
+
+class LogWriter:
+    """Writes the records of the queue handler to a stream from a background
+    thread."""
+
+    def __init__(self, stream, sample_rates=None):
+        self.handler = DeferredQueueHandler(SimpleQueue())
+        self.handler.addFilter(SampleFilter(sample_rates or dict()))
+
+        self.stream_handler = logging.StreamHandler(stream)
+        self.stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+        self.listener = QueueListener(self.handler.queue, self.stream_handler)
+        self.running = False
+
+    def start(self):
+        self.listener.start()
+        self.running = True
+
+    def stop(self):
+        """Writes the remaining records and stops the thread."""
+        if self.running:
+            self.listener.stop()
+            self.running = False
+
+    def restart(self):
+        """Gives a forked process its own queue and writer thread, since the
+        thread of the parent does not exist there."""
+        self.handler.queue = SimpleQueue()
+
+        self.listener = QueueListener(self.handler.queue, self.stream_handler)
+        self.start()
+
+
+def parse_sample_rates(values):
+    """Takes a list of category=rate strings, as given on the command line,
+    and returns the rates by category."""
+    rates = dict()
+
+    for value in values:
+        category, _, rate = value.partition("=")
+
+        if not category or not rate.isdigit() or int(rate) < 1:
+            raise ValueError("Expected category=rate, with a rate of at least 1, got '{}'.".format(value))
+
+        rates[category] = int(rate)
+
+    return rates
+
+
+def add_log_arguments(parser):
+    """Adds the logging options to the argument parser of a node."""
+    parser.add_argument("--log-level", choices=LEVELS, default=LOG_LEVEL,
+                        help="Only log messages of this level or above. Single packets are logged with DEBUG.")
+    parser.add_argument("--log-sample", action="append", default=[], metavar="CATEGORY=RATE",
+                        help="Only log every RATE-th message of a category, like UDPChannel=100. Can be repeated.")
+
+
+def setup_logging(level=LOG_LEVEL, sample_rates=None, stream=None):
+    """Lets all loggers of the process write through a new LogWriter and
+    returns it."""
+    writer = LogWriter(stream or sys.stdout, sample_rates)
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(writer.handler)
+
+    writer.start()
+
+    atexit.register(writer.stop)
+    os.register_at_fork(after_in_child=writer.restart)
+
+    return writer
+
+
+def setup_logging_from_args(args):
+    """Sets up the logging with the options added by add_log_arguments."""
+    return setup_logging(args.log_level, parse_sample_rates(args.log_sample))
@@ -0,0 +1,212 @@
+"""Contains a small registry of counters, gauges and histograms, that the
+nodes update on their data paths, and a server, that exposes them in the
+Prometheus text format. Updating a metric is a single addition, values that
+already exist elsewhere, like the size of a channel table, are only read,
+when the metrics are scraped. Every node has a registry of its own, so
+several nodes can share a process. Metrics of the whole process are kept in
+REGISTRY."""
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+
+COUNTER = "counter"
+GAUGE = "gauge"
+HISTOGRAM = "histogram"
+
+# upper bounds in seconds, for the durations of crypto operations and batches
+TIME_BUCKETS = [0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1]
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+
+    return "{" + ",".join('{}="{}"'.format(name, value) for name, value in sorted(labels.items())) + "}"
+
+
+class Metric:
+    """A single value, that is either counted up, set, or read from a
+    function, when the metrics are scraped."""
+
+    def __init__(self, name, labels, function=None):
+        self.name = name
+        self.labels = labels
+
+        self.value = 0
+        self.function = function
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def set(self, value):
+        self.value = value
+
+    def samples(self):
+        value = self.value if self.function is None else self.function()
+
+        return [(self.name, self.labels, value)]
+
+
+class Histogram(Metric):
+    """Counts observed values in buckets of the given upper bounds."""
+
+    def __init__(self, name, labels, buckets=TIME_BUCKETS):
+        super().__init__(name, labels)
+
+        self.buckets = sorted(buckets)
+
+        # one more for the values above the highest bound
+        self.counts = [0] * (len(self.buckets) + 1)
+
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+
+        self.sum += value
+        self.count += 1
+
+    def drain(self):
+        """Returns the bucket counts, sum and count of the values observed
+        since the last call and starts over. Meant for processes, that don't
+        serve their metrics themselves, but hand them to one that does."""
+        observations = self.counts, self.sum, self.count
+
+        self.counts = [0] * (len(self.buckets) + 1)
+
+        self.sum = 0
+        self.count = 0
+
+        return observations
+
+    def merge(self, counts, total, count):
+        """Adds the observations returned by drain of a histogram with the
+        same buckets."""
+        self.counts = [own + other for own, other in zip(self.counts, counts)]
+
+        self.sum += total
+        self.count += count
+
+    def samples(self):
+        samples = []
+        cumulative = 0
+
+        for bound, count in zip(self.buckets + ["+Inf"], self.counts):
+            cumulative += count
+
+            samples.append((self.name + "_bucket", dict(self.labels, le=str(bound)), cumulative))
+
+        samples.append((self.name + "_sum", self.labels, self.sum))
+        samples.append((self.name + "_count", self.labels, self.count))
+
+        return samples
+
+
+class MetricsRegistry:
+    def __init__(self):
+        # (type, help text) by name
+        self.families = dict()
+
+        # metrics by name and labels
+        self.metrics = dict()
+
+    def counter(self, name, help_text, labels=None, function=None):
+        """Returns the counter of the given name and labels, which is created,
+        if necessary. If a function is given, it returns the current count."""
+        return self._get(Metric, COUNTER, name, help_text, labels, function=function)
+
+    def gauge(self, name, help_text, labels=None, function=None):
+        """Returns the gauge of the given name and labels, which is created,
+        if necessary. If a function is given, it returns the current value."""
+        return self._get(Metric, GAUGE, name, help_text, labels, function=function)
+
+    def histogram(self, name, help_text, labels=None, buckets=TIME_BUCKETS):
+        """Returns the histogram of the given name and labels, which is
+        created, if necessary."""
+        return self._get(Histogram, HISTOGRAM, name, help_text, labels, buckets=buckets)
+
+    def _get(self, metric_class, metric_type, name, help_text, labels, **kwargs):
+        labels = labels or dict()
+
+        key = (name, tuple(sorted(labels.items())))
+
+        if key not in self.metrics:
+            if self.families.setdefault(name, (metric_type, help_text))[0] != metric_type:
+                raise ValueError("Metric {} already exists with another type.".format(name))
+
+            self.metrics[key] = metric_class(name, labels, **kwargs)
+        elif kwargs.get("function") is not None:
+            self.metrics[key].function = kwargs["function"]
+
+        return self.metrics[key]
+
+    def exposition(self):
+        """Returns all metrics in the Prometheus text format."""
+        lines = []
+
+        metrics_by_name = dict()
+
+        # the node may add metrics meanwhile
+        for (name, _), metric in list(self.metrics.items()):
+            metrics_by_name.setdefault(name, []).append(metric)
+
+        for name, metrics in metrics_by_name.items():
+            metric_type, help_text = self.families[name]
+
+            lines.append("# HELP {} {}".format(name, help_text))
+            lines.append("# TYPE {} {}".format(name, metric_type))
+
+            for metric in metrics:
+                for sample_name, labels, value in metric.samples():
+                    lines.append("{}{} {}".format(sample_name, format_labels(labels), value))
+
+        return "\n".join(lines) + "\n"
+
+
+# the registry of the metrics, that belong to the whole process, like the time
+# spent on crypto operations
+REGISTRY = MetricsRegistry()
+
+
+class MetricsServer:
+    """Serves the metrics of the given registries over HTTP from a background
+    thread. Only GET /metrics is answered."""
+
+    def __init__(self, registries, addr):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+
+                body = "".join(registry.exposition() for registry in registries).encode()
+
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+
+                self.wfile.write(body)
+
+            def log_message(self, *_):
+                # don't write a line for every scrape
+                pass
+
+        self.server = ThreadingHTTPServer(addr, Handler)
+        self.server.daemon_threads = True
+
+        self.thread = Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def addr(self):
+        return self.server.server_address
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
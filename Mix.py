@@ -1,21 +1,37 @@
 #!/usr/bin/python3 -u
 # standard library
+import logging
 from argparse import ArgumentParser
+from copy import copy
+from selectors import DefaultSelector, EVENT_READ
 from socket import socket, AF_INET, SOCK_DGRAM as UDP
+from time import time, perf_counter
 
 from petlib.bn import Bn
 
+from ChannelInitPool import ChannelInitPool
+from FlushStrategy import ThresholdFlush, flush_strategy, THRESHOLD, TIMED, TIMED_POOL
 from LinkEncryption import LinkDecryptor, LinkEncryptor
+from Log import add_log_arguments, setup_logging_from_args
+from Metrics import REGISTRY, MetricsRegistry, MetricsServer
 from MsgV3 import get_pub_key
-from UDPChannel import ChannelMid
-from constants import UDP_MTU, SYM_KEY_LEN, DATA_MSG_FLAG
-from util import read_cfg_values, shuffle
+from PacketDrops import PacketDrops, DROP_REASONS
+from Trace import TraceRing, RECEIVED, DEQUEUED, SENT, REQUEST, RESPONSE
+from UDPChannel import MidChannels
+from constants import UDP_MTU, SYM_KEY_LEN, METRICS_HOST
+from util import read_cfg_values, b2i, seconds_until
 
 STORE_LIMIT = 1
 
+# how many datagrams are read from the socket, before the queues are flushed
+RECV_BATCH_SIZE = 64
+
+log = logging.getLogger("Mix")
+
 
 class Mix:
-    def __init__(self, secret, own_addr, next_addr, check_responses=True):
+    def __init__(self, secret, own_addr, next_addr, check_responses=True, batch_size=RECV_BATCH_SIZE,
+                 strategy=None, init_workers=0, trace=None, channels=None):
         # set up crypto
         # decrypt for messages from a client
         # encrypt for responses to the client
@@ -29,6 +45,26 @@ class Mix:
         # to the address of the associated channel id
         self.incoming = socket(AF_INET, UDP)
         self.incoming.bind(own_addr)
+        self.incoming.setblocking(False)
+
+        self.sock_sel = DefaultSelector()
+        self.sock_sel.register(self.incoming, EVENT_READ)
+
+        self.batch_size = batch_size
+
+        # decides when stored packets are sent out, one for each direction
+        if strategy is None:
+            strategy = ThresholdFlush(STORE_LIMIT)
+
+        self.request_strategy = strategy
+        self.response_strategy = copy(strategy)
+
+        # processes channel inits in other processes, if set
+        if init_workers:
+            self.init_pool = ChannelInitPool(secret, init_workers)
+            self.sock_sel.register(self.init_pool, EVENT_READ)
+        else:
+            self.init_pool = None
 
         self.next_addr = next_addr
         self.mix_addr = None
@@ -40,7 +76,46 @@ class Mix:
 
         self.check_responses = check_responses
 
-        print(self, "listening on {}:{}".format(*own_addr))
+        # the TraceRing packet events are recorded into, if any
+        self.trace = trace
+
+        # the channels of this mix and the packets they stored for sending
+        if channels is None:
+            channels = MidChannels(trace=trace)
+
+        self.channels = channels
+
+        # packets, that were dropped, because handling them failed
+        self.drops = PacketDrops()
+
+        # metrics of this node, the process wide ones are in REGISTRY
+        self.metrics = MetricsRegistry()
+
+        self._register_metrics(self.metrics)
+
+        log.info("%s listening on %s:%d", self, *own_addr)
+
+    def _register_metrics(self, registry):
+        self.requests_received = registry.counter("pymix_packets_received_total", "Packets received by the node.",
+                                                  {"direction": "request"})
+        self.responses_received = registry.counter("pymix_packets_received_total", "Packets received by the node.",
+                                                   {"direction": "response"})
+        self.requests_sent = registry.counter("pymix_packets_sent_total", "Packets sent by the node.",
+                                              {"direction": "request"})
+        self.responses_sent = registry.counter("pymix_packets_sent_total", "Packets sent by the node.",
+                                               {"direction": "response"})
+
+        self.batch_time = registry.histogram("pymix_batch_seconds", "Time it took to handle a received batch.")
+
+        registry.gauge("pymix_queued_packets", "Packets waiting to be sent.", {"direction": "request"},
+                       lambda: len(self.channels.requests))
+        registry.gauge("pymix_queued_packets", "Packets waiting to be sent.", {"direction": "response"},
+                       lambda: len(self.channels.responses))
+        registry.gauge("pymix_channels", "Channels known to the node.", function=self.channels.channel_count)
+
+        for reason in DROP_REASONS:
+            registry.counter("pymix_packets_dropped_total", "Packets dropped, because handling them failed.",
+                             {"reason": reason}, lambda reason=reason: self.drops[reason])
 
     def handle_mix_fragment(self, packet):
         """Handles a message coming in from a client to be sent over the mix
@@ -52,24 +127,11 @@ class Mix:
         later."""
         in_id, msg_ctr, fragment, msg_type = self.request_link_decryptor.decrypt(packet)
 
-        # connect incoming chan id with address of the packet
-        if msg_type == DATA_MSG_FLAG:
-            # existing channel
-
-            if in_id not in ChannelMid.table_in.keys():
-                raise Exception("Got data msg for uninitialized channel", in_id)
-
-            channel = ChannelMid.table_in[in_id]
-            channel.forward_request(msg_ctr + fragment)
-        else:
-            # new channel
-            if in_id in ChannelMid.table_in.keys():
-                print(self, "Duplicate channel initialization for", in_id)
-                channel = ChannelMid.table_in[in_id]
-            else:
-                channel = ChannelMid(in_id, self.check_responses)
+        if self.trace is not None:
+            self.trace.record(RECEIVED, REQUEST, in_id, b2i(msg_ctr))
 
-            channel.parse_channel_init(msg_ctr + fragment, self.priv_comp)
+        self.channels.handle_request(in_id, msg_ctr, fragment, msg_type, self.priv_comp, self.check_responses,
+                                     self.init_pool)
 
     def handle_response(self, response):
         """Handles a message, that came as a response to an initially made
@@ -80,50 +142,133 @@ class Mix:
         # packet had, then get the src ip for that channel id
         out_id, msg_ctr, fragment, msg_type = self.response_link_decryptor.decrypt(response)
 
-        channel = ChannelMid.table_out[out_id]
+        if self.trace is not None:
+            self.trace.record(RECEIVED, RESPONSE, out_id, b2i(msg_ctr))
 
-        channel.forward_response(msg_type + msg_ctr + fragment)
+        self.channels.handle_response(out_id, msg_ctr, fragment, msg_type)
 
-    def run(self):
-        while True:
-            # listen for packets
-            packet, addr = self.incoming.recvfrom(UDP_MTU)
+    def handle_batch(self, batch):
+        """Handles a list of (packet, address) tuples, as returned by
+        receive_batch."""
+        start = perf_counter()
+
+        for packet, addr in batch:
+            self.handle_packet(packet, addr)
+
+        self.channels.finish_layers()
 
+        self.batch_time.observe(perf_counter() - start)
+
+    def handle_packet(self, packet, addr):
+        """Hands the packet to the request or response path, depending on the
+        address it came from. If handling it fails, the packet is dropped."""
+        try:
             # if the src addr of the last packet is the same as the addr of the
             # next hop, then this packet is a response, otherwise a mix fragment
             if addr == self.next_addr:
+                self.responses_received.inc()
                 self.handle_response(packet)
             else:
+                self.requests_received.inc()
+
                 if self.mix_addr is None:
                     self.mix_addr = addr
                 self.handle_mix_fragment(packet)
+        except Exception as error:
+            self.drop_packet(error)
+
+    def drop_packet(self, error):
+        """Counts a packet, whose handling raised the given exception."""
+        reason = self.drops.drop(error)
 
-            # send out requests
-            if len(ChannelMid.requests) >= STORE_LIMIT:
-                # mix packets before sending
-                shuffle(ChannelMid.requests)
-                # send STORE_LIMIT packets
-                for _ in range(STORE_LIMIT):
-                    # use bound socket to send packets
-                    packet = ChannelMid.requests.pop()
+        log.warning("%s Dropped packet: %s %s", self, reason, error)
 
-                    enc_packet = self.request_link_encryptor.encrypt(packet)
+    def finish_channel_inits(self):
+        """Applies the channel inits, that the init pool finished processing.
+        """
+        if self.init_pool is not None:
+            for error in self.init_pool.finish_completed():
+                self.drop_packet(error)
 
-                    print(self, "Data/Init", "->", len(enc_packet))
-                    self.incoming.sendto(enc_packet, self.next_addr)
+            # requests held back for the channel inits
+            self.channels.finish_layers()
 
-            # send out responses
-            if len(ChannelMid.responses) >= STORE_LIMIT:
-                # mix packets before sending
-                shuffle(ChannelMid.responses)
-                # send STORE_LIMIT packets
-                for _ in range(STORE_LIMIT):
-                    packet = ChannelMid.responses.pop()
+    def receive_batch(self):
+        """Reads datagrams from the non-blocking socket, until either
+        batch_size datagrams were read or no more datagrams are waiting.
+        Returns a list of (packet, address) tuples."""
+        batch = []
 
-                    enc_packet = self.response_link_encryptor.encrypt(packet)
+        for _ in range(self.batch_size):
+            try:
+                batch.append(self.incoming.recvfrom(UDP_MTU))
+            except BlockingIOError:
+                break
 
-                    print(self, "Data/Init", "<-", len(enc_packet))
-                    self.incoming.sendto(enc_packet, self.mix_addr)
+        return batch
+
+    def send_requests(self):
+        """Sends the requests selected by the request strategy to the next hop
+        in one burst."""
+        sent = self._flush(self.request_strategy, self.channels.requests, self.request_link_encryptor,
+                           self.next_addr, REQUEST)
+
+        self.requests_sent.inc(sent)
+
+    def send_responses(self):
+        """Sends the responses selected by the response strategy to the
+        previous hop in one burst."""
+        sent = self._flush(self.response_strategy, self.channels.responses, self.response_link_encryptor,
+                           self.mix_addr, RESPONSE)
+
+        self.responses_sent.inc(sent)
+
+    def _flush(self, strategy, packets, link_encryptor, addr, direction):
+        selected = strategy.select(packets, time())
+
+        if self.trace is not None:
+            for packet in selected:
+                self.trace.record_packet(DEQUEUED, direction, packet)
+
+        for packet in selected:
+            enc_packet = link_encryptor.encrypt(packet)
+
+            if self.trace is not None:
+                self.trace.record_packet(SENT, direction, packet)
+
+            self.incoming.sendto(enc_packet, addr)
+
+            log.debug("%s Data/Init %s %d", self, "->" if direction == REQUEST else "<-", len(enc_packet))
+
+        return len(selected)
+
+    def flush_timeout(self):
+        """Returns the seconds until the next strategy deadline, or None, if
+        no strategy has one."""
+        return seconds_until([strategy.deadline() for strategy in (self.request_strategy, self.response_strategy)])
+
+    def run(self):
+        while True:
+            # wait for packets, the next flush deadline or the next channel,
+            # that may time out
+            self.sock_sel.select(seconds_until([self.request_strategy.deadline(), self.response_strategy.deadline(),
+                                                self.channels.next_deadline()]))
+
+            self.channels.remove_timed_out(time())
+
+            # drain the socket in batches, sending out packets after each one
+            while True:
+                batch = self.receive_batch()
+
+                self.handle_batch(batch)
+
+                self.finish_channel_inits()
+
+                self.send_requests()
+                self.send_responses()
+
+                if len(batch) < self.batch_size:
+                    break
 
     def __repr__(self):
         return "Mix:"
@@ -134,9 +279,40 @@ if __name__ == "__main__":
         description="Very simple mix implementation in python.")
     ap.add_argument("config",
                     help="A file containing configurations for the mix.")
+    ap.add_argument("--batch-size", type=int, default=RECV_BATCH_SIZE,
+                    help="Maximum number of datagrams read, before queued packets are sent out.")
+    ap.add_argument("--flush", choices=[THRESHOLD, TIMED, TIMED_POOL], default=THRESHOLD,
+                    help="When stored packets are sent out.")
+    ap.add_argument("--threshold", type=int, default=STORE_LIMIT,
+                    help="Number of packets sent out together by the threshold strategy.")
+    ap.add_argument("--interval", type=float, default=0.1,
+                    help="Seconds between flushes of the timed strategies.")
+    ap.add_argument("--pool-size", type=int, default=0,
+                    help="Number of packets the timed-pool strategy keeps back at each flush.")
+    ap.add_argument("--flush-limit", type=int, default=0,
+                    help="Maximum number of packets sent out per flush, shared fairly by the channels. 0 for no limit.")
+    ap.add_argument("--workers", type=int, default=0,
+                    help="Number of worker processes to split the channels between. 0 handles them in this one.")
+    ap.add_argument("--init-workers", type=int, default=0,
+                    help="Number of processes, that process channel inits. 0 processes them in the mix loop.")
+    ap.add_argument("--metrics-port", type=int, default=0,
+                    help="Port to serve the metrics of the mix on, in the Prometheus text format. 0 serves none.")
+    ap.add_argument("--trace", metavar="FILE",
+                    help="Record the packet events of the mix into a trace ring in this file, for TraceAnalyzer.py. "
+                         "The workers of --workers record into FILE.<index>.")
+    add_log_arguments(ap)
+    ap.add_argument("--asyncio", action="store_true",
+                    help="Run the mix on an asyncio event loop.")
+    ap.add_argument("--uvloop", action="store_true",
+                    help="Use the event loop of the uvloop package. Implies --asyncio.")
 
     args = ap.parse_args()
 
+    setup_logging_from_args(args)
+
+    if args.workers and args.init_workers:
+        ap.error("--init-workers can not be combined with --workers, the workers process their own inits.")
+
     # get configurations
 
     last_mix, listen_ip, listen_port, next_ip, next_port, secret_file = read_cfg_values(args.config)
@@ -148,6 +324,28 @@ if __name__ == "__main__":
 
     next_hop_addr = (next_ip, int(next_port))
 
-    mix = Mix(secret, listen_addr, next_hop_addr, last_mix != "true")
+    strategy = flush_strategy(args.flush, args.threshold, args.interval, args.pool_size, args.flush_limit or None)
+
+    trace = TraceRing(args.trace) if args.trace else None
+
+    mix: Mix
+
+    if args.workers:
+        # imported here, since ShardedMix imports this module
+        from ShardedMix import ShardedMix
+
+        mix = ShardedMix(secret, listen_addr, next_hop_addr, last_mix != "true", args.batch_size, strategy,
+                         args.workers, trace)
+    else:
+        mix = Mix(secret, listen_addr, next_hop_addr, last_mix != "true", args.batch_size, strategy,
+                  args.init_workers, trace)
+
+    if args.metrics_port:
+        MetricsServer([REGISTRY, mix.metrics], (METRICS_HOST, args.metrics_port)).start()
+
+    if args.asyncio or args.uvloop:
+        from AsyncRuntime import run, start_mix
 
-    mix.run()
+        run([start_mix(mix)], args.uvloop)
+    else:
+        mix.run()
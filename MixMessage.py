@@ -1,7 +1,7 @@
 import math
 
 from constants import DATA_FRAG_PAYLOAD_SIZE, INIT_OVERHEAD, DATA_OVERHEAD, INIT_FRAG_PAYLOAD_SIZE
-from util import b2i, i2b, get_random_bytes, cut
+from util import b2i, i2b, random_bytes, cut
 
 #########################################
 # MixMessage Fragment Format            #
@@ -43,6 +43,8 @@ assert DATA_PACKET_SIZE == INIT_PACKET_SIZE
 
 
 class MixMessageStore:
+    __slots__ = ["packets"]
+
     def __init__(self):
         self.packets = dict()
 
@@ -87,8 +89,14 @@ class MixMessageStore:
         for msg_id in msg_ids:
             self.remove(msg_id)
 
+        # an emptied dict keeps its table, until it is cleared
+        if not self.packets:
+            self.packets.clear()
+
 
 class MixMessage:
+    __slots__ = ["fragments", "id", "frag_count", "payload_size"]
+
     def __init__(self, msg_id):
         self.fragments = dict()
         self.id = msg_id
@@ -259,7 +267,7 @@ def make_fragment(message_id, fragment_number, last_fragment, payload, payload_l
 
     fragment += padding_bytes
 
-    fragment += payload[:payload_limit] + get_random_bytes(padding_len)
+    fragment += payload[:payload_limit] + random_bytes(padding_len)
 
     return fragment, payload_limit - (len(padding_bytes) + padding_len)
 
@@ -283,6 +291,8 @@ class FragmentGenerator:
 
     last_used_message_id = 0
 
+    __slots__ = ["udp_payload", "message_id", "current_fragment"]
+
     def __init__(self, udp_payload):
         self.udp_payload = udp_payload
 
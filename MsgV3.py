@@ -1,86 +1,157 @@
-from petlib.ec import EcPt
-from sphinxmix.SphinxParams import SphinxParams
+"""Contains the creation and processing of channel init messages. The
+parameters of the elliptic curve group are set up on first use, so nodes,
+that never do public key operations, like the ExitPoint, don't import petlib
+and sphinxmix at all."""
+from collections import OrderedDict
+from threading import Lock
 
-from constants import SYM_KEY_LEN, MIX_COUNT, GROUP_ELEMENT_LEN, CTR_PREFIX_LEN, NONCE_LEN
-from util import ctr_cipher, cut, gen_sym_key, i2b, get_random_bytes
+from constants import SYM_KEY_LEN, MIX_COUNT, GROUP_ELEMENT_LEN, CTR_PREFIX_LEN, NONCE_LEN, INIT_CACHE_SIZE
+from util import CtrContext, cut, gen_sym_key, i2b, random_bytes
 
-params = SphinxParams()
+_params = None
+_params_lock = Lock()
+
+
+def get_params():
+    """Returns the SphinxParams, creating them on the first call."""
+    global _params
+
+    if _params is None:
+        with _params_lock:
+            if _params is None:
+                from sphinxmix.SphinxParams import SphinxParams
+
+                _params = SphinxParams()
+
+    return _params
+
+
+def __getattr__(name):
+    # MsgV3.params is created on first access
+    if name == "params":
+        return get_params()
+
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+def decode_group_element(group_element):
+    """Returns the point encoded in the exported group element."""
+    from petlib.ec import EcPt
+
+    return EcPt.from_binary(group_element, get_params().group.G)
 
 
 def group_expon(exponent):
-    return params.group.expon_base([exponent])
+    return get_params().group.expon_base([exponent])
 
 
 def gen_priv_key():
-    return params.group.gensecret()
+    return get_params().group.gensecret()
 
 
 def get_pub_key(private_key):
     return group_expon(private_key)
 
 
-def gen_init_msg(pub_mix_keys, message_counter, request_channel_keys, response_channel_keys, payload):
+def gen_init_msg(pub_mix_keys, message_counter, request_channel_keys, response_channel_keys, payload,
+                 x_msg_1=None, group_element=None, dispersal_keys=None):
+    """Creates a channel init message. If x_msg_1 is given, it is used as the
+    secret for the group element, instead of a new random one. Reusing it for
+    the init messages of one channel lets the first mix reuse the decoded
+    group element. If the exported group element of x_msg_1 is given as well,
+    it is not computed again. The same goes for the dispersal keys of the
+    message counter, as returned by gen_dispersal_keys."""
+    params = get_params()
+
     assert len(pub_mix_keys) == len(request_channel_keys)
 
-    ctr_blind = gen_blind(i2b(message_counter, CTR_PREFIX_LEN) + bytes(NONCE_LEN - CTR_PREFIX_LEN))
+    if x_msg_1 is None:
+        x_msg_1 = params.group.gensecret()
 
-    y_mix_1, y_mix_2, y_mix_3 = pub_mix_keys
+    if group_element is None:
+        group_element = params.group.expon_base([x_msg_1]).export()
 
-    x_msg_1 = params.group.gensecret()
-    y_msg_1 = params.group.expon_base([x_msg_1])
-    k_disp_1 = params.group.expon(y_mix_1, [x_msg_1])
-    k_disp_1 = params.group.expon(k_disp_1, [ctr_blind])
-    blind_1 = gen_blind(k_disp_1)
+    if dispersal_keys is None:
+        dispersal_keys = gen_dispersal_keys(pub_mix_keys, message_counter, x_msg_1)
 
-    x_msg_2 = params.group.expon(x_msg_1, [blind_1])
-    k_disp_2 = params.group.expon(y_mix_2, [x_msg_2])
-    k_disp_2 = params.group.expon(k_disp_2, [ctr_blind])
-    blind_2 = gen_blind(k_disp_2)
+    chan_key_onion = random_bytes(MIX_COUNT * 2 * SYM_KEY_LEN)
+    payload_onion = payload
 
-    x_msg_3 = params.group.expon(x_msg_2, [blind_2])
-    k_disp_3 = params.group.expon(y_mix_3, [x_msg_3])
-    k_disp_3 = params.group.expon(k_disp_3, [ctr_blind])
+    for k_disp, k_chan_req, k_chan_res in zip(reversed(dispersal_keys), reversed(request_channel_keys), reversed(response_channel_keys)):
+        cipher = CtrContext(k_disp)
+
+        chan_key_onion = cipher.encrypt(message_counter, k_chan_req + k_chan_res + chan_key_onion[0:-2 * SYM_KEY_LEN])
+
+        payload_onion = cipher.encrypt(message_counter, payload_onion)
+
+    return group_element + chan_key_onion + payload_onion
 
-    chan_key_onion = get_random_bytes(MIX_COUNT * 2 * SYM_KEY_LEN)
-    payload_onion = payload
 
-    for k_disp, k_chan_req, k_chan_res in zip([k_disp_3, k_disp_2, k_disp_1], reversed(request_channel_keys), reversed(response_channel_keys)):
-        cipher = ctr_cipher(params.get_aes_key(k_disp), message_counter)
+def gen_dispersal_keys(pub_mix_keys, message_counter, x_msg_1):
+    """Returns the symmetric keys, that the mixes will derive from an init
+    message with the given counter and secret, in the order of the mixes.
+    They are the only part of an init message, that needs point
+    multiplications, so they can be made before the message itself."""
+    params = get_params()
 
-        chan_key_onion = cipher.encrypt(k_chan_req + k_chan_res + chan_key_onion[0:-2 * SYM_KEY_LEN])
+    ctr_blind = gen_blind(i2b(message_counter, CTR_PREFIX_LEN) + bytes(NONCE_LEN - CTR_PREFIX_LEN))
+
+    order = params.group.G.order()
+
+    dispersal_keys = []
 
-        cipher = ctr_cipher(params.get_aes_key(k_disp), message_counter)
+    x_msg = x_msg_1
 
-        payload_onion = cipher.encrypt(payload_onion)
+    for y_mix in pub_mix_keys:
+        if dispersal_keys:
+            # the mixes blind the group element with the key they derived
+            x_msg = x_msg.mod_mul(gen_blind(dispersal_keys[-1]), order)
 
-    return y_msg_1.export() + chan_key_onion + payload_onion
+        # the counter blind is folded into the secret, so every key needs
+        # only one point multiplication
+        k_disp = params.group.expon(y_mix, [x_msg, ctr_blind])
+
+        dispersal_keys.append(params.get_aes_key(k_disp))
+
+    return dispersal_keys
 
 
 def gen_blind(secret):
-    if isinstance(secret, EcPt):
-        return params.hb(params.get_aes_key(secret))
-    else:
+    params = get_params()
+
+    if isinstance(secret, bytes):
         return params.hb(secret)
+    else:
+        return params.hb(params.get_aes_key(secret))
+
+
+def process(priv_mix_key, message_counter, message, element_cache=None, channel_id=None):
+    """Processes a channel init message with the private key of a mix. With an
+    ElementCache the decoded group element is looked up for the given channel,
+    before it is decoded."""
+    params = get_params()
 
+    group_element, chan_key_onion, payload_onion = cut(message, GROUP_ELEMENT_LEN, MIX_COUNT * 2 * SYM_KEY_LEN)
 
-def process(priv_mix_key, message_counter, message):
-    y_msg, chan_key_onion, payload_onion = cut_init_message(message)
+    if element_cache is None:
+        y_msg = decode_group_element(group_element)
+    else:
+        y_msg = element_cache.get(channel_id, group_element)
 
     ctr_blind = gen_blind(i2b(message_counter, CTR_PREFIX_LEN) + bytes(NONCE_LEN - CTR_PREFIX_LEN))
 
-    k_disp = params.group.expon(y_msg, [priv_mix_key])
-    k_disp = params.group.expon(k_disp, [ctr_blind])
+    # one point multiplication for the private key and the counter blind
+    k_disp = params.group.expon(y_msg, [priv_mix_key, ctr_blind])
 
-    cipher = ctr_cipher(params.get_aes_key(k_disp), message_counter)
+    cipher = CtrContext(params.get_aes_key(k_disp))
 
-    k_chan_req, k_chan_res, chan_key_onion = cut(cipher.decrypt(chan_key_onion), SYM_KEY_LEN, SYM_KEY_LEN)
+    k_chan_req, k_chan_res, chan_key_onion = cut(cipher.decrypt(message_counter, chan_key_onion), SYM_KEY_LEN,
+                                                 SYM_KEY_LEN)
 
     chan_key_onion += gen_sym_key()
     chan_key_onion += gen_sym_key()
 
-    cipher = ctr_cipher(params.get_aes_key(k_disp), message_counter)
-
-    payload_onion = cipher.decrypt(payload_onion)
+    payload_onion = cipher.decrypt(message_counter, payload_onion)
 
     blind_1 = gen_blind(k_disp)
     y_msg_2 = params.group.expon(y_msg, [blind_1])
@@ -90,7 +161,49 @@ def process(priv_mix_key, message_counter, message):
     return k_chan_req, k_chan_res, payload_onion, message
 
 
+class ElementCache:
+    """Remembers the decoded group elements of the most recently processed
+    init messages, so repeated init messages of a channel, which carry the
+    same group element, don't need to decode it again. Holds at most size
+    entries, the least recently used ones are dropped first."""
+
+    def __init__(self, size=INIT_CACHE_SIZE):
+        self.size = size
+        self.elements = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, channel_id, group_element):
+        key = (channel_id, group_element)
+
+        if key in self.elements:
+            self.hits += 1
+            self.elements.move_to_end(key)
+
+            return self.elements[key]
+
+        self.misses += 1
+
+        y_msg = decode_group_element(group_element)
+
+        self.elements[key] = y_msg
+
+        if len(self.elements) > self.size:
+            self.elements.popitem(last=False)
+
+        return y_msg
+
+
+def get_init_payload(message):
+    """Returns the payload of an init message, that was processed by all
+    mixes, without decoding its group element."""
+    _, _, payload_onion = cut(message, GROUP_ELEMENT_LEN, MIX_COUNT * 2 * SYM_KEY_LEN)
+
+    return payload_onion
+
+
 def cut_init_message(message):
     group_element, channel_key_onion, payload_onion = cut(message, GROUP_ELEMENT_LEN, MIX_COUNT * 2 * SYM_KEY_LEN)
 
-    return EcPt.from_binary(group_element, params.group.G), channel_key_onion, payload_onion
+    return decode_group_element(group_element), channel_key_onion, payload_onion
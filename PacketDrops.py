@@ -0,0 +1,57 @@
+"""Counts the packets a node dropped, because handling them failed, by the
+reason they failed for. A single bad packet only costs its own handling this
+way, instead of the whole node. The counts can be read at any time."""
+from LinkEncryption import LinkAuthenticationError
+from ReplayDetection import ReplayDetectedError
+from UDPChannel import UnknownChannelError
+
+REPLAY = "replay"
+AUTH_FAILURE = "auth_failure"
+UNKNOWN_CHANNEL = "unknown_channel"
+MALFORMED = "malformed"
+
+DROP_REASONS = [REPLAY, AUTH_FAILURE, UNKNOWN_CHANNEL, MALFORMED]
+
+
+def drop_reason(error):
+    """Returns the reason a packet is dropped for, given the exception its
+    handling raised. Everything unexpected counts as a malformed packet."""
+    if isinstance(error, ReplayDetectedError):
+        return REPLAY
+
+    if isinstance(error, LinkAuthenticationError):
+        return AUTH_FAILURE
+
+    if isinstance(error, UnknownChannelError):
+        return UNKNOWN_CHANNEL
+
+    return MALFORMED
+
+
+class PacketDrops:
+    def __init__(self):
+        self.counts = dict.fromkeys(DROP_REASONS, 0)
+
+    def drop(self, error):
+        """Counts a packet, whose handling raised the given exception, and
+        returns the reason it was dropped for."""
+        reason = drop_reason(error)
+
+        self.counts[reason] += 1
+
+        return reason
+
+    def add(self, counts):
+        """Adds counts by reason, for example of a worker process."""
+        for reason, count in counts.items():
+            self.counts[reason] += count
+
+    def clear(self):
+        for reason in self.counts:
+            self.counts[reason] = 0
+
+    def total(self):
+        return sum(self.counts.values())
+
+    def __getitem__(self, reason):
+        return self.counts[reason]
@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 from constants import REPLAY_WINDOW_SIZE, LINK_CTR_START, CTR_PREFIX_LEN
 from util import i2b
 
@@ -6,22 +8,54 @@ class ReplayDetectedError(Exception):
     pass
 
 
+@lru_cache()
+def window_mask(window_size):
+    """Returns the mask of the bits of a window, shared by all detectors with
+    that window size."""
+    return (1 << window_size) - 1
+
+
 class ReplayDetector:
+    """Remembers which of the last window_size counter values below the
+    highest one were not seen yet, as bits of an integer. Checking and marking
+    a counter value are single bit operations, so large windows cost nothing
+    extra per packet. As long as the counter values arrive in order, no bit
+    is set and the integer takes up no more memory than a small number."""
+
+    __slots__ = ["window_size", "mask", "highest", "missing"]
+
     def __init__(self, window_size=REPLAY_WINDOW_SIZE, start=LINK_CTR_START):
-        self.replay_window = [start] * window_size
+        self.window_size = window_size
+        self.mask = window_mask(window_size)
+
+        # highest counter value seen so far, the start value and all values
+        # before it count as seen
+        self.highest = start
+
+        # bit n is set, if the counter value highest - n was not seen
+        self.missing = 0
 
     def check_replay_window(self, ctr):
-        if ctr in self:
+        offset = self.highest - ctr
+
+        if offset < 0:
+            # new highest value, move the window, the values in between are
+            # missing
+            if -offset < self.window_size:
+                self.missing = ((self.missing << -offset) | ((1 << -offset) - 2)) & self.mask
+            else:
+                self.missing = self.mask - 1
+
+            self.highest = ctr
+        elif offset >= self.window_size or not (self.missing >> offset) & 1:
             raise ReplayDetectedError(
                 "Counter value {}/{} was too old or already seen.".format(ctr, i2b(ctr, CTR_PREFIX_LEN)))
-
-        self.replay_window.append(ctr)
-
-        # remove the smallest element
-        self.replay_window.sort()
-        self.replay_window.pop(0)
+        else:
+            self.missing &= ~(1 << offset)
 
         return True
 
     def __contains__(self, ctr):
-        return ctr in self.replay_window or ctr < self.replay_window[0]
+        offset = self.highest - ctr
+
+        return offset >= 0 and (offset >= self.window_size or not (self.missing >> offset) & 1)
@@ -0,0 +1,184 @@
+"""Contains the schedulers an EntryPoint can use to decide, in which order its
+channels send their fragments to the mix. Only channels, that have fragments
+to send, are kept in a ready queue and they take turns, so a channel with a
+lot of data can not hold back the fragments of the others."""
+from collections import deque
+from math import ceil
+
+from util import parse_ip_port
+
+ROUND_ROBIN = "round-robin"
+DEFICIT_ROUND_ROBIN = "deficit-round-robin"
+
+
+class RoundRobinScheduler:
+    """Lets every ready channel send one fragment per turn, in the order they
+    became ready."""
+
+    def __init__(self):
+        self.ready = deque()
+
+        # ids of the channels in the ready queue
+        self.queued = set()
+
+    def add(self, channel):
+        """Puts a channel, that got fragments to send, into the ready queue,
+        if it isn't in there already."""
+        if channel.chan_id not in self.queued:
+            self.queued.add(channel.chan_id)
+            self.ready.append(channel)
+
+    def take(self, limit=None):
+        """Yields a channel for every fragment, that should be sent now, but
+        at most limit of them. One message has to be taken from the channel,
+        before the next one is yielded."""
+        taken = 0
+
+        while self.ready and (limit is None or taken < limit):
+            channel = self.ready.popleft()
+
+            if not self._can_send(channel):
+                continue
+
+            yield channel
+
+            taken += 1
+
+            self._requeue(channel)
+
+    def _can_send(self, channel):
+        """Checks a channel from the front of the queue. Channels without
+        fragments and channels, that timed out in the meantime, leave the
+        queue."""
+        if channel.can_send() and channel.channels.table.get(channel.chan_id) is channel:
+            return True
+
+        self._remove(channel)
+
+        return False
+
+    def _requeue(self, channel):
+        if channel.can_send():
+            self.ready.append(channel)
+        else:
+            self._remove(channel)
+
+    def _remove(self, channel):
+        self.queued.discard(channel.chan_id)
+
+    def __len__(self):
+        return len(self.ready)
+
+
+class DeficitRoundRobinScheduler(RoundRobinScheduler):
+    """Lets every ready channel send as many fragments per turn, as its weight
+    allows. All fragments have the same size, so the deficit of a channel is
+    counted in fragments. Weights below 1 let a channel send a fragment only
+    every few turns, the turns, in which no channel would send, are skipped
+    at once. The weight of a channel is that of its destination
+    address, that of its client address or 1."""
+
+    def __init__(self, weights=None):
+        super().__init__()
+
+        # weights by address
+        self.weights = weights or dict()
+
+        # fragments a channel may still send, by channel id
+        self.deficits = dict()
+
+    def take(self, limit=None):
+        taken = 0
+
+        # turns in a row, in which no fragment was sent
+        idle_turns = 0
+
+        while self.ready and (limit is None or taken < limit):
+            if idle_turns >= len(self.ready):
+                self._skip_idle_rounds()
+
+                idle_turns = 0
+
+            channel = self.ready.popleft()
+
+            if not self._can_send(channel):
+                continue
+
+            deficit = self.deficits.get(channel.chan_id, 0)
+
+            # a turn, that was cut short by the limit, goes on without a new
+            # quantum
+            if deficit < 1:
+                deficit += self.weight(channel)
+
+            if deficit < 1:
+                idle_turns += 1
+            else:
+                idle_turns = 0
+
+            while deficit >= 1 and (limit is None or taken < limit) and channel.can_send():
+                yield channel
+
+                deficit -= 1
+                taken += 1
+
+            self.deficits[channel.chan_id] = deficit
+
+            if deficit >= 1 and channel.can_send():
+                # the limit was reached, continue where we left off
+                self.ready.appendleft(channel)
+            else:
+                self._requeue(channel)
+
+    def _skip_idle_rounds(self):
+        """Gives the ready channels the quanta of the rounds, in which none of
+        them would send, at once, instead of taking turn after turn."""
+        rounds = min(ceil((1 - self.deficits.get(channel.chan_id, 0)) / self.weight(channel))
+                     for channel in self.ready)
+
+        # the next turn adds a quantum itself
+        for channel in self.ready:
+            self.deficits[channel.chan_id] = self.deficits.get(channel.chan_id, 0) + \
+                (rounds - 1) * self.weight(channel)
+
+    def weight(self, channel):
+        return self.weights.get(channel.dest_addr, self.weights.get(channel.src_addr, 1))
+
+    def _remove(self, channel):
+        super()._remove(channel)
+
+        # idle channels don't save up their deficit
+        self.deficits.pop(channel.chan_id, None)
+
+
+def parse_weights(values):
+    """Takes a list of ip:port=weight strings, as given on the command line,
+    and returns the weights by address."""
+    weights = dict()
+
+    for value in values:
+        addr, _, weight = value.partition("=")
+
+        try:
+            weight = float(weight)
+            addr = parse_ip_port(addr)
+        except ValueError:
+            weight = 0
+
+        if weight <= 0:
+            raise ValueError("Expected ip:port=weight, with a weight greater than 0, got '{}'.".format(value))
+
+        weights[addr] = weight
+
+    return weights
+
+
+def send_scheduler(name, weights=None):
+    """Returns a new scheduler of the given name. Weights are only used by the
+    deficit round robin scheduler."""
+    if name == ROUND_ROBIN:
+        return RoundRobinScheduler()
+    elif name == DEFICIT_ROUND_ROBIN:
+        return DeficitRoundRobinScheduler(weights)
+
+    raise ValueError("Unknown send scheduler", name)
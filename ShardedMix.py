@@ -0,0 +1,188 @@
+"""Contains a Mix, that splits its channels between several worker processes.
+The Mix process itself only does the socket I/O, the link en- and decryption
+and the flushing of the stored packets. Requests are handled by the worker
+owning their incoming channel id, responses by the worker owning their out
+going channel id. Every worker only gives out going channel ids of its own
+shard to new channels, so both ids of a channel belong to the same worker.
+When tracing, every worker records the events of its channels into a ring of
+its own. With every batch, the workers report how many channels they have and
+the time they spent on crypto operations, so the Mix process can serve them
+as its metrics."""
+import logging
+from multiprocessing import Pipe, Process
+from time import time
+
+from petlib.bn import Bn
+
+from ChannelIdAllocator import ChannelIdAllocator
+from ChannelQueue import ChannelQueue
+from Mix import Mix, RECV_BATCH_SIZE
+from PacketDrops import PacketDrops
+from Trace import TraceRing, RECEIVED, REQUEST, RESPONSE
+from UDPChannel import MidChannels
+from util import b2i, seconds_until
+
+log = logging.getLogger("ShardedMix")
+
+
+def run_worker(index, worker_count, secret, check_responses, connection, mix_connections, trace_path=None):
+    """Main loop of a worker process. Handles the lists of jobs it gets from
+    the Mix and sends back the packets, that its channels stored because of
+    them. Returns, when the Mix process goes away."""
+    # close our copies of the Mix ends, so we notice, when the Mix is gone
+    for mix_connection in mix_connections:
+        mix_connection.close()
+
+    trace = TraceRing("{}.{}".format(trace_path, index)) if trace_path is not None else None
+
+    channels = MidChannels(ChannelIdAllocator(index, worker_count), trace)
+
+    priv_comp = Bn.from_binary(secret)
+
+    # counts of the current job list, added to those of the Mix
+    drops = PacketDrops()
+
+    while True:
+        # channels time out, even if no jobs arrive
+        if not connection.poll(seconds_until([channels.next_deadline()])):
+            channels.remove_timed_out(time())
+            continue
+
+        try:
+            jobs = connection.recv()
+        except EOFError:
+            return
+
+        for direction, chan_id, msg_ctr, fragment, msg_type in jobs:
+            try:
+                if direction == REQUEST:
+                    channels.handle_request(chan_id, msg_ctr, fragment, msg_type, priv_comp, check_responses)
+                else:
+                    channels.handle_response(chan_id, msg_ctr, fragment, msg_type)
+            except Exception as error:
+                log.warning("Worker %d: Dropped packet: %s %s", index, drops.drop(error), error)
+
+        channels.finish_layers()
+
+        # the metrics of this process are not served, the Mix adds them to
+        # its own
+        timings = [MidChannels.layer_time.drain(), MidChannels.init_time.drain()]
+
+        connection.send((list(channels.requests), list(channels.responses), drops.counts, channels.channel_count(),
+                         timings))
+
+        channels.requests.clear()
+        channels.responses.clear()
+        drops.clear()
+
+
+class ShardedChannels:
+    """Takes the place of the MidChannels of a Mix in the Mix process. The
+    channels live in the workers, only the packets they stored for sending
+    and the number of channels each worker reported are kept here."""
+
+    def __init__(self, worker_count):
+        self.requests = ChannelQueue()
+        self.responses = ChannelQueue()
+
+        self.channel_counts = [0] * worker_count
+
+    def finish_layers(self):
+        # the workers do that for their part of the batch
+        pass
+
+    def next_deadline(self):
+        # the workers remove their timed out channels themselves
+        return None
+
+    def remove_timed_out(self, now):
+        pass
+
+    def channel_count(self):
+        return sum(self.channel_counts)
+
+
+class ShardedMix(Mix):
+    def __init__(self, secret, own_addr, next_addr, check_responses=True, batch_size=RECV_BATCH_SIZE,
+                 strategy=None, worker_count=2, trace=None):
+        if worker_count < 1:
+            raise ValueError("Need at least one worker.")
+
+        # jobs collected for each worker during the current batch
+        self.jobs = [[] for _ in range(worker_count)]
+
+        pipes = [Pipe() for _ in range(worker_count)]
+
+        trace_path = trace.path if trace is not None else None
+
+        self.connections = [mix_end for mix_end, _ in pipes]
+        self.workers = []
+
+        # start the workers before the socket is created, so they don't
+        # inherit it
+        for index, (_, worker_end) in enumerate(pipes):
+            worker = Process(target=run_worker, args=(index, worker_count, secret.binary(), check_responses,
+                                                      worker_end, self.connections, trace_path), daemon=True)
+            worker.start()
+
+            worker_end.close()
+
+            self.workers.append(worker)
+
+        super().__init__(secret, own_addr, next_addr, check_responses, batch_size, strategy, trace=trace,
+                         channels=ShardedChannels(worker_count))
+
+        log.info("%s started %d workers", self, worker_count)
+
+    def handle_mix_fragment(self, packet):
+        """Link decrypts the packet and stores it as a job for the worker
+        owning its incoming channel id."""
+        in_id, msg_ctr, fragment, msg_type = self.request_link_decryptor.decrypt(packet)
+
+        if self.trace is not None:
+            self.trace.record(RECEIVED, REQUEST, in_id, b2i(msg_ctr))
+
+        self.jobs[in_id % len(self.workers)].append((REQUEST, in_id, msg_ctr, fragment, msg_type))
+
+    def handle_response(self, response):
+        """Link decrypts the packet and stores it as a job for the worker
+        owning its out going channel id."""
+        out_id, msg_ctr, fragment, msg_type = self.response_link_decryptor.decrypt(response)
+
+        if self.trace is not None:
+            self.trace.record(RECEIVED, RESPONSE, out_id, b2i(msg_ctr))
+
+        self.jobs[out_id % len(self.workers)].append((RESPONSE, out_id, msg_ctr, fragment, msg_type))
+
+    def handle_batch(self, batch):
+        """Collects the jobs of the whole batch, lets the workers handle them in
+        parallel and stores the resulting packets for sending."""
+        super().handle_batch(batch)
+
+        busy = [index for index, jobs in enumerate(self.jobs) if jobs]
+
+        for index in busy:
+            self.connections[index].send(self.jobs[index])
+            self.jobs[index] = []
+
+        for index in busy:
+            requests, responses, drops, channel_count, timings = self.connections[index].recv()
+
+            self.channels.requests.extend(requests)
+            self.channels.responses.extend(responses)
+
+            self.drops.add(drops)
+
+            self.channels.channel_counts[index] = channel_count
+
+            for histogram, observations in zip([MidChannels.layer_time, MidChannels.init_time], timings):
+                histogram.merge(*observations)
+
+    def stop(self):
+        """Terminates the worker processes."""
+        for worker in self.workers:
+            worker.terminate()
+            worker.join()
+
+    def __repr__(self):
+        return "ShardedMix:"
@@ -0,0 +1,105 @@
+"""Contains a ring of fixed size binary events in a memory mapped file, that a
+node records the stages of its packets into. Every event has a monotonic
+timestamp, the channel id and the message counter of the packet, so the rings
+of all nodes of a chain can be merged afterwards by TraceAnalyzer.py. The
+timestamps are taken from the monotonic clock of the system, so only rings
+recorded on the same machine can be compared.
+
+An event, that a packet was received, has the channel id of the link it came
+in on, all other events have the channel id of the link it goes out on. A Mix
+records, which incoming channel id belongs to which out going one, when it
+creates a channel. Packets are recorded as sent right before they are handed
+to the socket."""
+import mmap
+from struct import Struct
+from time import monotonic_ns
+
+from constants import CHAN_ID_SIZE, CTR_PREFIX_LEN, MSG_TYPE_FLAG_LEN, TRACE_CAPACITY
+from util import b2i
+
+# events
+RECEIVED = 1
+# the onion layer of the node was removed or, on the way back, added
+CRYPTED = 2
+QUEUED = 3
+DEQUEUED = 4
+SENT = 5
+# a channel was created, the counter field holds the out going channel id
+CHANNEL = 6
+
+EVENT_NAMES = {RECEIVED: "received", CRYPTED: "crypted", QUEUED: "queued", DEQUEUED: "dequeued", SENT: "sent",
+               CHANNEL: "channel"}
+
+# directions
+REQUEST = 0
+RESPONSE = 1
+
+MAGIC = b"PMTR"
+
+# magic and capacity
+HEADER = Struct("<4sI")
+
+# nanoseconds, message counter, channel id, event, direction
+EVENT = Struct("<QIHBB")
+
+
+class TraceRing:
+    """Records events into the ring file at the given path, which is created
+    or overwritten. Once the ring is full, the oldest events are overwritten.
+    The position in the ring is not stored, the events are put in order by
+    their timestamps, when they are read."""
+
+    def __init__(self, path, capacity=TRACE_CAPACITY):
+        self.path = path
+        self.capacity = capacity
+
+        self.written = 0
+
+        with open(path, "w+b") as f:
+            f.truncate(HEADER.size + capacity * EVENT.size)
+
+            self.ring = mmap.mmap(f.fileno(), 0)
+
+        HEADER.pack_into(self.ring, 0, MAGIC, capacity)
+
+    def record(self, event, direction, chan_id, counter):
+        offset = HEADER.size + (self.written % self.capacity) * EVENT.size
+
+        EVENT.pack_into(self.ring, offset, monotonic_ns(), counter, chan_id, event, direction)
+
+        self.written += 1
+
+    def record_packet(self, event, direction, packet):
+        """Records an event for a packet made by UDPChannel.create_packet,
+        whose channel id and message counter are read from its header."""
+        chan_id = b2i(packet[:CHAN_ID_SIZE])
+
+        ctr_start = CHAN_ID_SIZE + MSG_TYPE_FLAG_LEN
+
+        self.record(event, direction, chan_id, b2i(packet[ctr_start:ctr_start + CTR_PREFIX_LEN]))
+
+    def close(self):
+        self.ring.close()
+
+
+def read_trace(path):
+    """Returns the events of a ring file as a list of (nanoseconds, event,
+    direction, channel id, message counter) tuples, oldest first."""
+    with open(path, "rb") as f:
+        data = f.read()
+
+    magic, capacity = HEADER.unpack_from(data)
+
+    if magic != MAGIC:
+        raise ValueError("{} is not a trace ring.".format(path))
+
+    events = []
+
+    for timestamp, counter, chan_id, event, direction in EVENT.iter_unpack(data[HEADER.size:]):
+        # slots, that were never written, are all zeros
+        if event:
+            events.append((timestamp, event, direction, chan_id, counter))
+
+    events.sort()
+
+    return events
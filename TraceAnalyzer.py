@@ -0,0 +1,213 @@
+#!/usr/bin/python3
+"""Merges the trace rings, that the nodes of a mix chain recorded, and shows
+how long the fragments spent in every stage of every hop and on the links in
+between. Requests are followed from the first given node to the last one,
+responses the other way around. The rings have to be given in the order of
+the chain, a node, that recorded into several rings, like a Mix with
+--workers, is given as a comma separated list of them.
+
+Channel ids are reused, once their channels timed out. The events of an id
+are therefore split into lifetimes, a new one starts, when a Mix creates a
+channel with it as the out going id, or when the id was not seen for longer
+than the channel timeout. Packets are followed into the lifetime, that the
+next node had at the time they were sent."""
+from argparse import ArgumentParser
+from os.path import basename
+from statistics import median
+
+from Trace import read_trace, EVENT_NAMES, CHANNEL, RECEIVED, REQUEST, RESPONSE
+from constants import CHANNEL_TIMEOUT_SEC
+
+
+class Hop:
+    """The events of one node of the chain."""
+
+    def __init__(self, name, events):
+        self.name = name
+
+        # [first timestamp, last timestamp] of every lifetime, by channel id
+        self.lifetimes = dict()
+
+        # out going (channel id, lifetime) by the incoming ones, as created by a Mix
+        self.channels = dict()
+
+        # timestamp by event, by (direction, channel id, lifetime, message counter)
+        self.stages = dict()
+
+        for timestamp, event, direction, chan_id, counter in sorted(events):
+            if event == CHANNEL:
+                in_key = (chan_id, self._touch(chan_id, timestamp))
+                out_key = (counter, self._touch(counter, timestamp, new_lifetime=True))
+
+                self.channels[in_key] = out_key
+            else:
+                key = (direction, chan_id, self._touch(chan_id, timestamp), counter)
+
+                # replayed packets only count the first time
+                self.stages.setdefault(key, dict()).setdefault(event, timestamp)
+
+        self.reverse_channels = {out_key: in_key for in_key, out_key in self.channels.items()}
+
+    def _touch(self, chan_id, timestamp, new_lifetime=False):
+        """Notes an event of the channel id and returns the lifetime it
+        belongs to."""
+        lifetimes = self.lifetimes.setdefault(chan_id, [])
+
+        if new_lifetime or not lifetimes or timestamp - lifetimes[-1][1] > CHANNEL_TIMEOUT_SEC * 10**9:
+            lifetimes.append([timestamp, timestamp])
+        else:
+            lifetimes[-1][1] = timestamp
+
+        return len(lifetimes) - 1
+
+    def lifetime(self, chan_id, timestamp):
+        """Returns the lifetime of the channel id, that a packet sent to this
+        node at the given time belongs to, or None, if there is none."""
+        for lifetime, (_, end) in enumerate(self.lifetimes.get(chan_id, [])):
+            if end >= timestamp:
+                return lifetime
+
+        return None
+
+    def out_id(self, direction, chan_id, lifetime):
+        """Returns the channel id and its lifetime, that a packet, which came
+        in with chan_id during the given lifetime, leaves the node with."""
+        if direction == REQUEST:
+            return self.channels.get((chan_id, lifetime), (chan_id, lifetime))
+        else:
+            return self.reverse_channels.get((chan_id, lifetime), (chan_id, lifetime))
+
+    def path(self, direction, chan_id, lifetime, counter):
+        """Returns the (timestamp, event) tuples of the packet, that came in
+        with the given channel id, lifetime and message counter, in order."""
+        received = self.stages.get((direction, chan_id, lifetime, counter), dict())
+        left = self.stages.get((direction, *self.out_id(direction, chan_id, lifetime), counter), dict())
+
+        events = [(timestamp, event) for event, timestamp in left.items() if event != RECEIVED]
+
+        if RECEIVED in received:
+            events.append((received[RECEIVED], RECEIVED))
+
+        return sorted(events)
+
+    def first_packets(self, direction):
+        """Returns the (channel id, lifetime, message counter) of the packets
+        of the direction, that came into or were made by this node, when it is
+        the first one they pass."""
+        out_keys = self.channels.values() if direction == REQUEST else self.channels.keys()
+
+        return [(chan_id, lifetime, counter)
+                for (packet_direction, chan_id, lifetime, counter), events in self.stages.items()
+                if packet_direction == direction and (RECEIVED in events or (chan_id, lifetime) not in out_keys)]
+
+
+def load_hops(ring_lists):
+    """Takes a list of comma separated ring paths, one entry for every node,
+    and returns a Hop for each of them."""
+    hops = []
+
+    for ring_list in ring_lists:
+        paths = ring_list.split(",")
+
+        events = []
+
+        for path in paths:
+            events.extend(read_trace(path))
+
+        hops.append(Hop(basename(paths[0]), events))
+
+    return hops
+
+
+def follow(hops, direction):
+    """Follows the packets of the direction through the hops, which have to be
+    in the order the packets pass them. Returns a list with a list of (hop
+    index, event, timestamp) tuples for every packet."""
+    timelines = []
+
+    for chan_id, lifetime, counter in hops[0].first_packets(direction):
+        timeline = []
+
+        for index, hop in enumerate(hops):
+            if index > 0:
+                # the lifetime of the id, when the previous node sent the packet
+                lifetime = hop.lifetime(chan_id, timeline[-1][2])
+
+            events = hop.path(direction, chan_id, lifetime, counter)
+
+            if not events:
+                # lost, dropped or overwritten in the ring
+                break
+
+            timeline.extend((index, event, timestamp) for timestamp, event in events)
+
+            chan_id, lifetime = hop.out_id(direction, chan_id, lifetime)
+
+        timelines.append(timeline)
+
+    return timelines
+
+
+def stage_delays(timelines, hops):
+    """Returns the delays in seconds between the consecutive events of the
+    timelines, by the name of the stage they belong to, in the order the
+    packets pass the stages. A stage is either the time between two events of
+    a node or the time on the link between two nodes."""
+    delays = dict()
+
+    for timeline in timelines:
+        for (index, event, start), (next_index, next_event, end) in zip(timeline, timeline[1:]):
+            if index == next_index:
+                stage = (index, event, "{} {} -> {}".format(hops[index].name, EVENT_NAMES[event],
+                                                            EVENT_NAMES[next_event]))
+            else:
+                # after all events of the node
+                stage = (index, CHANNEL, "{} -> {}".format(hops[index].name, hops[next_index].name))
+
+            delays.setdefault(stage, []).append((end - start) / 10**9)
+
+    return {name: delays[index, event, name] for index, event, name in sorted(delays)}
+
+
+def end_to_end_delays(timelines, hop_count):
+    """Returns the delays in seconds from the first to the last event of the
+    timelines, that passed all hops."""
+    return [(timeline[-1][2] - timeline[0][2]) / 10**9 for timeline in timelines
+            if len({index for index, _, _ in timeline}) == hop_count]
+
+
+def print_delays(title, timelines, hops):
+    out_format = "{:<40} {:>7} {:>10} {:>10} {:>10} {:>10}"
+
+    end_to_end = end_to_end_delays(timelines, len(hops))
+
+    print("{}: {} fragments, {} through all hops".format(title, len(timelines), len(end_to_end)))
+    print(out_format.format("Stage", "Count", "Min ms", "Avg ms", "Median ms", "Max ms"))
+
+    delays = stage_delays(timelines, hops)
+    delays["end to end"] = end_to_end
+
+    for stage, stage_delay in delays.items():
+        if not stage_delay:
+            continue
+
+        print(out_format.format(stage, len(stage_delay), *("{:.3f}".format(value * 1000) for value in [
+            min(stage_delay), sum(stage_delay) / len(stage_delay), median(stage_delay), max(stage_delay)])))
+
+    print()
+
+
+if __name__ == "__main__":
+    ap = ArgumentParser(description=__doc__)
+    ap.add_argument("rings", nargs="+", metavar="RING[,RING...]",
+                    help="Trace rings of the nodes, in the order of the chain, starting with the EntryPoint.")
+
+    args = ap.parse_args()
+
+    chain = load_hops(args.rings)
+
+    print_delays("Requests", follow(chain, REQUEST), chain)
+
+    chain.reverse()
+
+    print_delays("Responses", follow(chain, RESPONSE), chain)
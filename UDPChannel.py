@@ -1,36 +1,33 @@
+import logging
 from random import randint
 from selectors import DefaultSelector, EVENT_READ
 from socket import socket, AF_INET, SOCK_DGRAM as UDP
-from time import time
+from threading import Lock
+from time import time, perf_counter
 
+from ChannelExpiry import ChannelExpiry
+from ChannelQueue import ChannelQueue
+from ChannelIdAllocator import ChannelIdAllocator
 from Counter import Counter
+from Metrics import REGISTRY
 from MixMessage import DATA_FRAG_SIZE, MixMessageStore, DATA_PACKET_SIZE, FragmentGenerator, \
     make_dummy_init_fragment, make_dummy_data_fragment
-from MsgV3 import gen_init_msg, process, cut_init_message
+from MsgV3 import gen_init_msg, process, get_init_payload, gen_priv_key, get_pub_key, gen_dispersal_keys, \
+    ElementCache
 from ReplayDetection import ReplayDetector
+from Trace import CHANNEL, CRYPTED, QUEUED, REQUEST, RESPONSE
 from constants import CHAN_ID_SIZE, MIN_PORT, MAX_PORT, CTR_PREFIX_LEN, \
     IPV4_LEN, PORT_LEN, CHAN_INIT_MSG_FLAG, DATA_MSG_FLAG, \
-    CHAN_CONFIRM_MSG_FLAG, MSG_TYPE_FLAG_LEN, CHANNEL_CTR_START, CHANNEL_TIMEOUT_SEC
-from util import i2b, b2i, random_channel_id, cut, b2ip, gen_sym_key, ctr_cipher, \
-    get_random_bytes, ip2b
+    CHAN_CONFIRM_MSG_FLAG, MSG_TYPE_FLAG_LEN, CHANNEL_CTR_START, CHANNEL_TIMEOUT_SEC, PAD_PREFETCH_DEPTH
+from util import i2b, b2i, cut, b2ip, gen_sym_key, CtrContext, CombinedPads, \
+    ctr_crypt_batch, random_bytes, ip2b
 
 
-def check_for_timed_out_channels(channel_table, timeout=CHANNEL_TIMEOUT_SEC, log_prefix="UDPChannel"):
-    now = time()
+log = logging.getLogger("UDPChannel")
 
-    timed_out = []
 
-    for channel_id in channel_table.keys():
-        channel = channel_table[channel_id]
-
-        channel_timed_out = (now - channel.last_interaction) > timeout
-
-        if channel_timed_out:
-            print(log_prefix, "Timeout for channel", channel_id)
-
-            timed_out.append(channel_id)
-
-    return timed_out
+class UnknownChannelError(KeyError):
+    pass
 
 
 def create_packet(channel_id, message_type, message_counter, payload):
@@ -41,37 +38,150 @@ def create_packet(channel_id, message_type, message_counter, payload):
     return i2b(channel_id, CHAN_ID_SIZE) + message_type + message_counter + payload
 
 
+class ChannelContext:
+    """Holds everything a ChannelEntry needs, that can be made, before it is
+    known for which addresses the channel will be: the channel id, the
+    symmetric keys, the secret for the group element of the init messages and
+    the dispersal keys of the first init message. The channel id is taken
+    from the given EntryChannels."""
+
+    def __init__(self, channels, pub_comps):
+        self.chan_id = channels.random_channel()
+
+        self.req_sym_keys = []
+        self.res_sym_keys = []
+
+        for _ in pub_comps:
+            self.req_sym_keys.append(gen_sym_key())
+            self.res_sym_keys.append(gen_sym_key())
+
+        # cipher contexts by key, so the key schedules are only made once
+        self.ciphers = {key: CtrContext(key) for key in self.req_sym_keys + self.res_sym_keys}
+
+        # all init messages of the channel use the same group element, so the
+        # first mix can reuse its decoded form and we don't have to compute
+        # it again
+        self.init_secret = gen_priv_key()
+        self.init_group_element = get_pub_key(self.init_secret).export()
+
+        # dispersal keys by message counter, the first init message is sent
+        # with the counter value after the start value
+        first_counter = CHANNEL_CTR_START + 1
+
+        self.dispersal_keys = {first_counter: gen_dispersal_keys(pub_comps, first_counter, self.init_secret)}
+
+
+class EntryChannels:
+    """The registry of the channels of an EntryPoint. Channels and channel
+    contexts are created through it and get their ids from it."""
+
+    def __init__(self):
+        self.table = dict()
+
+        # entry channels time out a little earlier than those of the mixes
+        self.expiry = ChannelExpiry(self.table, CHANNEL_TIMEOUT_SEC - 5)
+
+        self.channel_ids = ChannelIdAllocator()
+
+        # channel ids are also given out to ChannelContexts made in other
+        # threads
+        self.id_lock = Lock()
+
+        # ids of the channels, that used up prepared key streams or are about
+        # to, oldest first. only those prefetch new ones, so idle channels
+        # cost nothing
+        self.prefetch_queue = dict()
+
+    def create(self, src_addr, dest_addr, pub_comps, context=None):
+        """Returns a new channel from the given ChannelContext or a new one."""
+        return ChannelEntry(self, src_addr, dest_addr, pub_comps, context)
+
+    def create_context(self, pub_comps):
+        return ChannelContext(self, pub_comps)
+
+    def remove_timed_out(self, now):
+        for channel_id in self.expiry.timed_out(now):
+            del self.table[channel_id]
+            self.prefetch_queue.pop(channel_id, None)
+
+            self.release_channel(channel_id, now)
+
+    def next_deadline(self):
+        return self.expiry.next_deadline()
+
+    def queue_prefetch(self, chan_id):
+        self.prefetch_queue[chan_id] = None
+
+    def prefetch_pads(self, limit):
+        """Lets up to limit of the queued channels prepare the key streams of
+        their next fragments. Returns whether channels are left in the queue.
+        """
+        for _ in range(min(limit, len(self.prefetch_queue))):
+            chan_id = next(iter(self.prefetch_queue))
+
+            del self.prefetch_queue[chan_id]
+
+            channel = self.table.get(chan_id)
+
+            if channel is not None:
+                channel.prefetch_pads()
+
+        return bool(self.prefetch_queue)
+
+    def random_channel(self):
+        with self.id_lock:
+            return self.channel_ids.allocate()
+
+    def release_channel(self, chan_id, now=None):
+        """Lets the id of a channel, that is gone, be given out again, once
+        the next hop dropped it as well."""
+        with self.id_lock:
+            self.channel_ids.release(chan_id, now)
+
+
 class ChannelEntry:
-    out_chan_list = []
-    to_mix = []
-    to_client = []
-    table = dict()
+    __slots__ = ["channels", "src_addr", "dest_addr", "chan_id", "pub_comps", "req_sym_keys", "res_sym_keys", "ciphers",
+                 "request_pads", "response_pads", "request_counter", "replay_detector", "init_secret",
+                 "init_group_element", "dispersal_keys", "packets", "mix_msg_store", "last_interaction",
+                 "allowed_to_send"]
+
+    def __init__(self, channels, src_addr, dest_addr, pub_comps, context=None):
+        """Creates a channel in the given EntryChannels from the given
+        ChannelContext or a new one."""
+        if context is None:
+            context = channels.create_context(pub_comps)
+
+        self.channels = channels
 
-    def __init__(self, src_addr, dest_addr, pub_comps):
         self.src_addr = src_addr
         self.dest_addr = dest_addr
-        self.chan_id = ChannelEntry.random_channel()
+        self.chan_id = context.chan_id
 
         self.pub_comps = pub_comps
 
-        print(self, "New Channel", self.dest_addr)
+        log.info("%s New Channel %s", self, self.dest_addr)
 
-        ChannelEntry.table[self.chan_id] = self
+        channels.table[self.chan_id] = self
 
-        self.req_sym_keys = []
-        self.res_sym_keys = []
-        self.request_counter = Counter(CHANNEL_CTR_START)
+        self.req_sym_keys = context.req_sym_keys
+        self.res_sym_keys = context.res_sym_keys
+        self.ciphers = context.ciphers
+        self.request_pads = None
+        self.response_pads = None
+        self.request_counter = CHANNEL_CTR_START
         self.replay_detector = ReplayDetector(start=CHANNEL_CTR_START)
 
-        for _ in self.pub_comps:
-            self.req_sym_keys.append(gen_sym_key())
-            self.res_sym_keys.append(gen_sym_key())
+        self.init_secret = context.init_secret
+        self.init_group_element = context.init_group_element
+        self.dispersal_keys = context.dispersal_keys
 
         self.packets = []
         self.mix_msg_store = MixMessageStore()
 
         self.last_interaction = time()
 
+        channels.expiry.add(self.chan_id, self)
+
         self.allowed_to_send = False
 
     def can_send(self):
@@ -108,12 +218,12 @@ class ChannelEntry:
         self.mix_msg_store.remove_completed()
 
         for packet in packets:
-            print(self, "Data", "<-", len(packet.payload))
+            log.debug("%s Data <- %d", self, len(packet.payload))
 
         return packets
 
     def _get_init_message(self):
-        self.request_counter.count()
+        self.request_counter += 1
 
         ip, port = self.dest_addr
 
@@ -121,13 +231,16 @@ class ChannelEntry:
 
         fragment = self._get_init_fragment()
 
-        channel_init = gen_init_msg(self.pub_comps, self.request_counter.current_value, self.req_sym_keys, self.res_sym_keys,
-                                    destination + fragment)
+        dispersal_keys = self.dispersal_keys.pop(self.request_counter, None)
 
-        print(self, "Init", "->", len(channel_init))
+        channel_init = gen_init_msg(self.pub_comps, self.request_counter, self.req_sym_keys, self.res_sym_keys,
+                                    destination + fragment, self.init_secret, self.init_group_element, dispersal_keys)
+
+        log.debug("%s Init -> %d", self, len(channel_init))
 
         # we send a counter value with init messages for channel replay detection only
-        return create_packet(self.chan_id, CHAN_INIT_MSG_FLAG, self.request_counter, channel_init)
+        return create_packet(self.chan_id, CHAN_INIT_MSG_FLAG, i2b(self.request_counter, CTR_PREFIX_LEN),
+                             channel_init)
 
     def _get_data_message(self):
         # todo make into generator
@@ -135,7 +248,7 @@ class ChannelEntry:
 
         message_counter, payload = cut(fragment, CTR_PREFIX_LEN)
 
-        print(self, "Data", "->", len(payload))
+        log.debug("%s Data -> %d", self, len(payload))
 
         return create_packet(self.chan_id, DATA_MSG_FLAG, message_counter, payload)
 
@@ -168,7 +281,10 @@ class ChannelEntry:
 
     def _chan_confirm_msg(self):
         if not self.allowed_to_send:
-            print(self, "Received channel confirmation")
+            log.info("%s Received channel confirmation", self)
+
+            # data fragments follow, have their key streams ready
+            self.channels.queue_prefetch(self.chan_id)
 
         self.allowed_to_send = True
 
@@ -177,10 +293,7 @@ class ChannelEntry:
 
         self.packets.append(generator)
 
-        timed_out = check_for_timed_out_channels(ChannelEntry.table, timeout=CHANNEL_TIMEOUT_SEC - 5)
-
-        for channel_id in timed_out:
-            del ChannelEntry.table[channel_id]
+        self.channels.remove_timed_out(self.last_interaction)
 
     def _receive_response_fragment(self, response):
         fragment = self._decrypt_fragment(response)
@@ -188,69 +301,229 @@ class ChannelEntry:
         try:
             self.mix_msg_store.parse_fragment(fragment)
         except ValueError:
-            print(self, "Dummy Response received")
+            log.debug("%s Dummy Response received", self)
             return
 
     def _encrypt_fragment(self, fragment):
-        self.request_counter.count()
-        counter = self.request_counter
+        self.request_counter += 1
 
-        for key in reversed(self.req_sym_keys):
+        fragment = self._request_pads().apply(self.request_counter, fragment)
 
-            cipher = ctr_cipher(key, int(counter))
+        self.channels.queue_prefetch(self.chan_id)
 
-            fragment = cipher.encrypt(fragment)
-
-        return bytes(counter) + fragment
+        return i2b(self.request_counter, CTR_PREFIX_LEN) + fragment
 
     def _decrypt_fragment(self, fragment):
         ctr, cipher_text = cut(fragment, CTR_PREFIX_LEN)
 
         ctr = b2i(ctr)
 
-        for key in self.res_sym_keys:
-            cipher = ctr_cipher(key, ctr)
+        cipher_text = self._response_pads().apply(ctr, cipher_text)
 
-            cipher_text = cipher.decrypt(cipher_text)
+        self.channels.queue_prefetch(self.chan_id)
 
         self.replay_detector.check_replay_window(ctr)
 
         return cipher_text
 
+    def prefetch_pads(self):
+        """Prepares the combined key streams for the next counter values of
+        requests and responses, so en- and decrypting a fragment only takes
+        one XOR. Meant to be called, when there is nothing else to do."""
+        self._request_pads().prefetch(self.request_counter + 1)
+
+        # responses are counted up by the exit point, starting after the
+        # highest one we have seen
+        self._response_pads().prefetch(self.replay_detector.highest + 1)
+
+    def _request_pads(self):
+        if self.request_pads is None or self.request_pads.keys != self.req_sym_keys:
+            self.request_pads = self._make_pads(self.req_sym_keys)
+
+        return self.request_pads
+
+    def _response_pads(self):
+        if self.response_pads is None or self.response_pads.keys != self.res_sym_keys:
+            self.response_pads = self._make_pads(self.res_sym_keys)
+
+        return self.response_pads
+
+    def _make_pads(self, keys):
+        return CombinedPads([self._cipher(key) for key in keys], DATA_FRAG_SIZE, PAD_PREFETCH_DEPTH)
+
+    def _cipher(self, key):
+        try:
+            return self.ciphers[key]
+        except KeyError:
+            # the keys were changed after the channel was made
+            cipher = self.ciphers[key] = CtrContext(key)
+
+            return cipher
+
     def __str__(self):
         return "ChannelEntry {}:{} - {}:".format(*self.src_addr, self.chan_id)
 
-    @staticmethod
-    def random_channel():
-        rand_id = random_channel_id()
 
-        while rand_id in ChannelEntry.out_chan_list:
-            rand_id = random_channel_id()
+class MidChannels:
+    """The registry of the channels of a Mix. Channels are created through it,
+    it hands the link decrypted packets to them and stores the packets, they
+    make for the next and previous hop, for sending."""
+
+    # time spent on the symmetric layers of a batch and on channel inits, in
+    # the metrics of the whole process
+    layer_time = REGISTRY.histogram("pymix_crypto_seconds", "Time spent on crypto operations.",
+                                    {"operation": "layers"})
+    init_time = REGISTRY.histogram("pymix_crypto_seconds", "Time spent on crypto operations.",
+                                   {"operation": "channel_init"})
+
+    def __init__(self, channel_ids=None, trace=None):
+        """Out going channel ids are taken from the given ChannelIdAllocator or
+        from all ids. When the channels are split between processes, every one
+        of them gets an allocator for its own shard of the ids. If a TraceRing
+        is given, the channels record their packet events into it."""
+        self.requests = ChannelQueue()
+        self.responses = ChannelQueue()
+
+        if channel_ids is None:
+            channel_ids = ChannelIdAllocator()
+
+        self.channel_ids = channel_ids
+
+        self.table_out = dict()
+        self.table_in = dict()
+
+        self.expiry = ChannelExpiry(self.table_in)
+
+        # decoded group elements of recent channel inits
+        self.init_cache = ElementCache()
+
+        self.trace = trace
+
+        # (packet queue, channel id, message type, counter, cipher context,
+        # fragment) of data messages, that still need their layer en- or
+        # decrypted. done for all of them together in finish_layers
+        self.layer_jobs = []
+
+    def create(self, in_chan_id, check_responses=True):
+        return ChannelMid(self, in_chan_id, check_responses)
+
+    def channel_count(self):
+        return len(self.table_in)
+
+    def finish_layers(self):
+        """En- and decrypts the layers of all data messages, that were
+        forwarded since the last call, in one batch and stores the resulting
+        packets for sending. Has to be called after every batch of handled
+        messages."""
+        jobs, self.layer_jobs = self.layer_jobs, []
+
+        if not jobs:
+            return
+
+        start = perf_counter()
+
+        payloads = ctr_crypt_batch([(context, b2i(ctr), fragment) for _, _, _, ctr, context, fragment in jobs])
+
+        MidChannels.layer_time.observe(perf_counter() - start)
+
+        trace = self.trace
+
+        if trace is not None:
+            for packets, chan_id, _, ctr, _, _ in jobs:
+                trace.record(CRYPTED, REQUEST if packets is self.requests else RESPONSE, chan_id, b2i(ctr))
+
+        for (packets, chan_id, msg_type, ctr, _, _), payload in zip(jobs, payloads):
+            packets.add(chan_id, create_packet(chan_id, msg_type, ctr, payload))
+
+            if trace is not None:
+                trace.record(QUEUED, REQUEST if packets is self.requests else RESPONSE, chan_id, b2i(ctr))
+
+    def handle_request(self, in_id, msg_ctr, fragment, msg_type, priv_comp, check_responses=True, init_pool=None):
+        """Hands a link decrypted request to the channel it belongs to. Data
+        messages need an already established channel, channel init messages
+        create a new one, if necessary. If an init pool is given, channel init
+        messages are processed by it, instead of right away."""
+        if msg_type == DATA_MSG_FLAG:
+            # existing channel
+
+            if in_id not in self.table_in.keys():
+                raise UnknownChannelError("Got data msg for uninitialized channel", in_id)
+
+            channel = self.table_in[in_id]
+            channel.forward_request(msg_ctr + fragment)
+        else:
+            # new channel
+            channel = self.table_in.get(in_id)
+
+            if channel is not None and self.expiry.expired(channel, time()):
+                # the previous hop gave the id of a channel, that timed out,
+                # to a new one
+                self.remove(in_id)
+
+                channel = None
+
+            if channel is not None:
+                log.debug("%s Duplicate channel initialization", channel)
+            else:
+                channel = self.create(in_id, check_responses)
+
+            if init_pool is None:
+                channel.parse_channel_init(msg_ctr + fragment, priv_comp)
+            else:
+                init_pool.submit(channel, *channel.start_channel_init(msg_ctr + fragment))
+
+    def handle_response(self, out_id, msg_ctr, fragment, msg_type):
+        """Hands a link decrypted response to the channel it belongs to. Expect
+        an UnknownChannelError, if there is no such channel."""
+        if out_id not in self.table_out:
+            raise UnknownChannelError("Got response for unknown channel", out_id)
 
-        ChannelEntry.out_chan_list.append(rand_id)
+        channel = self.table_out[out_id]
 
-        return rand_id
+        channel.forward_response(msg_type + msg_ctr + fragment)
+
+    def remove_timed_out(self, now):
+        for in_id in self.expiry.timed_out(now):
+            self.remove(in_id, now)
+
+    def next_deadline(self):
+        return self.expiry.next_deadline()
+
+    def remove(self, in_id, now=None):
+        out_id = self.table_in.pop(in_id).out_chan_id
+
+        del self.table_out[out_id]
+
+        self.channel_ids.release(out_id, now)
+
+    def random_channel(self):
+        return self.channel_ids.allocate()
 
 
 class ChannelMid:
-    out_chan_list = []
-    requests = []
-    responses = []
+    __slots__ = ["channels", "in_chan_id", "out_chan_id", "req_key", "res_key", "req_cipher", "res_cipher",
+                 "request_replay_detector", "response_replay_detector", "last_interaction", "initialized",
+                 "pending_inits", "pending_requests"]
 
-    table_out = dict()
-    table_in = dict()
+    def __init__(self, channels, in_chan_id, check_responses=True):
+        """Creates a channel in the given MidChannels."""
+        self.channels = channels
 
-    def __init__(self, in_chan_id, check_responses=True):
         self.in_chan_id = in_chan_id
-        self.out_chan_id = ChannelMid.random_channel()
+        self.out_chan_id = channels.random_channel()
 
-        print(self, "New Channel")
+        log.info("%s New Channel", self)
 
-        ChannelMid.table_out[self.out_chan_id] = self
-        ChannelMid.table_in[self.in_chan_id] = self
+        channels.table_out[self.out_chan_id] = self
+        channels.table_in[self.in_chan_id] = self
+
+        if channels.trace is not None:
+            channels.trace.record(CHANNEL, REQUEST, self.in_chan_id, self.out_chan_id)
 
         self.req_key = None
         self.res_key = None
+        self.req_cipher = None
+        self.res_cipher = None
         self.request_replay_detector = ReplayDetector(start=CHANNEL_CTR_START)
         if check_responses:
             self.response_replay_detector = ReplayDetector(start=CHANNEL_CTR_START)
@@ -259,33 +532,38 @@ class ChannelMid:
 
         self.last_interaction = time()
 
+        channels.expiry.add(self.in_chan_id, self)
+
         self.initialized = False
 
+        # channel inits handed to a ChannelInitPool and requests, that arrived
+        # before any of them was finished
+        self.pending_inits = 0
+        self.pending_requests = []
+
     def forward_request(self, request):
         """Takes a mix fragment, already stripped of the channel id."""
+        if not self.initialized:
+            if not self.pending_inits:
+                raise UnknownChannelError("Got data msg for channel, whose init failed", self.in_chan_id)
+
+            self.pending_requests.append(request)
+            return
+
         self.last_interaction = time()
 
         ctr, cipher_text = cut(request, CTR_PREFIX_LEN)
 
         self.request_replay_detector.check_replay_window(b2i(ctr))
 
-        cipher = ctr_cipher(self.req_key, b2i(ctr))
+        log.debug("%s Data -> %d", self, len(cipher_text))
 
-        payload = cipher.decrypt(cipher_text)
+        channels = self.channels
 
-        print(self, "Data", "->", len(payload))
+        channels.layer_jobs.append((channels.requests, self.out_chan_id, DATA_MSG_FLAG, ctr, self.req_cipher,
+                                    cipher_text))
 
-        packet = create_packet(self.out_chan_id, DATA_MSG_FLAG, ctr, payload)
-
-        ChannelMid.requests.append(packet)
-
-        timed_out = check_for_timed_out_channels(ChannelMid.table_in)
-
-        for in_id in timed_out:
-            out_id = ChannelMid.table_in[in_id].out_chan_id
-
-            del ChannelMid.table_in[in_id]
-            del ChannelMid.table_out[out_id]
+        channels.remove_timed_out(self.last_interaction)
 
     def forward_response(self, response):
         self.last_interaction = time()
@@ -297,26 +575,49 @@ class ChannelMid:
         if self.response_replay_detector is not None:
             self.response_replay_detector.check_replay_window(b2i(msg_ctr))
 
-        cipher = ctr_cipher(self.res_key, b2i(msg_ctr))
-
-        forward_msg = cipher.encrypt(response)
-
-        print(self, "Data", "<-", len(forward_msg))
+        log.debug("%s Data <- %d", self, len(response))
 
-        response = create_packet(self.in_chan_id, msg_type, msg_ctr, forward_msg)
-
-        ChannelMid.responses.append(response)
+        self.channels.layer_jobs.append((self.channels.responses, self.in_chan_id, msg_type, msg_ctr,
+                                         self.res_cipher, response))
 
     def parse_channel_init(self, channel_init, priv_comp):
         """Takes an already decrypted channel init message and reads the key.
         """
-        self.last_interaction = time()
+        msg_ctr, channel_init = self.start_channel_init(channel_init)
+
+        start = perf_counter()
+
+        try:
+            key_req, key_res, _, channel_init = process(priv_comp, b2i(msg_ctr), channel_init,
+                                                        self.channels.init_cache, self.in_chan_id)
+        except Exception:
+            self.abort_channel_init()
+            raise
 
+        MidChannels.init_time.observe(perf_counter() - start)
+
+        self.finish_channel_init(msg_ctr, key_req, key_res, channel_init)
+
+    def start_channel_init(self, channel_init):
+        """Checks the counter of an already decrypted channel init message and
+        returns it and the rest of the message, which still needs to be
+        processed with the private key of the mix. Replayed messages don't
+        count as using the channel."""
         msg_ctr, channel_init = cut(channel_init, CTR_PREFIX_LEN)
 
         self.request_replay_detector.check_replay_window(b2i(msg_ctr))
 
-        key_req, key_res, _, channel_init = process(priv_comp, b2i(msg_ctr), channel_init)
+        self.last_interaction = time()
+
+        self.pending_inits += 1
+
+        return msg_ctr, channel_init
+
+    def finish_channel_init(self, msg_ctr, key_req, key_res, channel_init):
+        """Takes the results of processing a channel init message, stores the
+        keys and the init message for the next hop. Requests, that were held
+        back until now, are forwarded afterwards."""
+        self.pending_inits -= 1
 
         if self.req_key is not None and self.res_key is not None:
             assert self.req_key == key_req
@@ -324,52 +625,124 @@ class ChannelMid:
         else:
             self.req_key = key_req
             self.res_key = key_res
+            self.req_cipher = CtrContext(key_req)
+            self.res_cipher = CtrContext(key_res)
 
         self.initialized = True
 
-        print(self, "Init", "->", len(channel_init))
+        log.debug("%s Init -> %d", self, len(channel_init))
 
         # todo look at this one again
         packet = create_packet(self.out_chan_id, CHAN_INIT_MSG_FLAG, msg_ctr, channel_init)
 
-        ChannelMid.requests.append(packet)
+        trace = self.channels.trace
+
+        if trace is not None:
+            trace.record(CRYPTED, REQUEST, self.out_chan_id, b2i(msg_ctr))
+
+        self.channels.requests.add(self.out_chan_id, packet)
+
+        if trace is not None:
+            trace.record(QUEUED, REQUEST, self.out_chan_id, b2i(msg_ctr))
+
+        if self.pending_requests:
+            pending_requests, self.pending_requests = self.pending_requests, []
+
+            for request in pending_requests:
+                self.forward_request(request)
+
+    def abort_channel_init(self):
+        """Called instead of finish_channel_init, if processing a channel init
+        message failed. Requests held back for it are dropped, if no other
+        channel init could still establish the channel."""
+        self.pending_inits -= 1
+
+        if not self.initialized and not self.pending_inits:
+            if self.pending_requests:
+                log.warning("%s Dropped %d requests of failed channel init", self, len(self.pending_requests))
+
+            self.pending_requests.clear()
 
     def __str__(self):
         return "ChannelMid {} - {}:".format(self.in_chan_id, self.out_chan_id)
 
-    @staticmethod
-    def random_channel():
-        rand_id = random_channel_id()
 
-        while rand_id in ChannelMid.table_out.keys():
-            rand_id = random_channel_id()
+class ExitChannels:
+    """The registry of the channels of an ExitPoint. Channels are created
+    through it, the sockets to their destinations are registered with its
+    selector and their responses stored in it for sending."""
+
+    def __init__(self):
+        self.out_ports = []
+        self.sock_sel = DefaultSelector()
+        self.to_mix = []
+
+        self.table = dict()
+
+        self.expiry = ChannelExpiry(self.table)
 
-        ChannelMid.out_chan_list.append(rand_id)
+    def create(self, in_chan_id):
+        return ChannelExit(self, in_chan_id)
 
-        return rand_id
+    def remove_timed_out(self, now):
+        for channel_id in self.expiry.timed_out(now):
+            self.remove(channel_id)
+
+    def next_deadline(self):
+        return self.expiry.next_deadline()
+
+    def remove(self, in_chan_id):
+        """Removes a channel from the table and closes its socket."""
+        self.table.pop(in_chan_id).close()
+
+    def random_socket(self):
+        """Returns a socket bound to a random port, that is not in use already.
+        """
+
+        while True:
+            rand_port = randint(MIN_PORT, MAX_PORT)
+
+            if rand_port in self.out_ports:
+                # Port already in use by us
+                continue
+
+            try:
+                new_sock = socket(AF_INET, UDP)
+                new_sock.bind(("127.0.0.1", rand_port))
+                new_sock.setblocking(False)
+
+                self.out_ports.append(rand_port)
+
+                return new_sock
+            except OSError:
+                # Port already in use by another application, try a new one
+                pass
 
 
 class ChannelExit:
-    out_ports = []
-    sock_sel = DefaultSelector()
-    to_mix = []
+    __slots__ = ["channels", "in_chan_id", "out_sock", "transport", "dest_addr", "last_interaction",
+                 "response_counter", "mix_msg_store"]
 
-    table = dict()
+    def __init__(self, channels, in_chan_id):
+        """Creates a channel in the given ExitChannels."""
+        self.channels = channels
 
-    def __init__(self, in_chan_id):
         self.in_chan_id = in_chan_id
-        self.out_sock = ChannelExit.random_socket()
+        self.out_sock = channels.random_socket()
+
+        # set by the asyncio runtime, once it took over the socket
+        self.transport = None
 
         self.dest_addr = ("0.0.0.0", 0)
 
         self.last_interaction = time()
-        self.response_counter = Counter(CHANNEL_CTR_START)
-        self.response_counter.count()
+        self.response_counter = CHANNEL_CTR_START + 1
 
-        print(self, "New Channel")
+        log.info("%s New Channel", self)
 
         self.mix_msg_store = MixMessageStore()
-        ChannelExit.table[in_chan_id] = self
+        channels.table[in_chan_id] = self
+        channels.expiry.add(in_chan_id, self)
 
     def recv_request(self, request):
         """The mix fragment gets added to the fragment store. If the channel id
@@ -384,24 +757,21 @@ class ChannelExit:
         try:
             self.mix_msg_store.parse_fragment(fragment)
         except ValueError:
-            print(self, "Dummy Request received")
+            log.debug("%s Dummy Request received", self)
             return
 
         # send completed mix messages to the destination immediately
         for mix_message in self.mix_msg_store.completed():
-            print(self, "Data", "->", len(mix_message.payload))
+            log.debug("%s Data -> %d", self, len(mix_message.payload))
 
             try:
                 self.out_sock.send(mix_message.payload)
             except ConnectionRefusedError:
-                print("Channel", self.in_chan_id, "with address", self.out_sock, "connection refused.")
+                log.warning("Channel %d with address %s connection refused.", self.in_chan_id, self.out_sock)
 
         self.mix_msg_store.remove_completed()
 
-        timed_out = check_for_timed_out_channels(ChannelExit.table)
-
-        for channel_id in timed_out:
-            del ChannelExit.table[channel_id]
+        self.channels.remove_timed_out(self.last_interaction)
 
     def recv_response(self, response):
         """Turns the response into a MixMessage and saves its fragments for
@@ -412,19 +782,19 @@ class ChannelExit:
         frag_gen = FragmentGenerator(response)
 
         while frag_gen:
-            print(self, "Data", "<-", len(frag_gen.udp_payload))
+            log.debug("%s Data <- %d", self, len(frag_gen.udp_payload))
 
-            self.response_counter.count()
+            self.response_counter += 1
 
             fragment = frag_gen.get_data_fragment()
-            packet = create_packet(self.in_chan_id, DATA_MSG_FLAG, bytes(self.response_counter),
+            packet = create_packet(self.in_chan_id, DATA_MSG_FLAG, i2b(self.response_counter, CTR_PREFIX_LEN),
                                    fragment)
 
-            ChannelExit.to_mix.append(packet)
+            self.channels.to_mix.append(packet)
 
     def parse_channel_init(self, channel_init):
         self.last_interaction = time()
-        _, _, payload = cut_init_message(channel_init)
+        payload = get_init_payload(channel_init)
 
         ip, port, fragment = cut(payload, IPV4_LEN, PORT_LEN)
 
@@ -437,49 +807,39 @@ class ChannelExit:
             self.out_sock.connect(self.dest_addr)
         except OSError:
             # couldn't connect, maybe not a channel init message?
-            print("Couldn't connect to destination. Dropped message.")
+            log.warning("Couldn't connect to destination. Dropped message.")
             self.out_sock.close()
-            del ChannelExit.table[self.in_chan_id]
+            del self.channels.table[self.in_chan_id]
 
             return
 
-        ChannelExit.sock_sel.register(self.out_sock, EVENT_READ, data=self)
-        print(self, "Init", "->", len(channel_init))
+        self.channels.sock_sel.register(self.out_sock, EVENT_READ, data=self)
+        log.debug("%s Init -> %d", self, len(channel_init))
 
         self.recv_request(fragment)
 
     def send_chan_confirm(self):
-        self.response_counter.count()
-        packet = create_packet(self.in_chan_id, CHAN_CONFIRM_MSG_FLAG, bytes(self.response_counter),
-                               get_random_bytes(DATA_PACKET_SIZE))
-
-        print(self, "Init", "<-", "len:", len(packet))
-
-        ChannelExit.to_mix.append(packet)
-
-    def __str__(self):
-        return "ChannelExit {} - {}:{}:".format(self.in_chan_id, *self.dest_addr)
+        self.response_counter += 1
+        packet = create_packet(self.in_chan_id, CHAN_CONFIRM_MSG_FLAG, i2b(self.response_counter, CTR_PREFIX_LEN),
+                               random_bytes(DATA_PACKET_SIZE))
 
-    @staticmethod
-    def random_socket():
-        """Returns a socket bound to a random port, that is not in use already.
-        """
+        log.debug("%s Init <- len: %d", self, len(packet))
 
-        while True:
-            rand_port = randint(MIN_PORT, MAX_PORT)
+        self.channels.to_mix.append(packet)
 
-            if rand_port in ChannelExit.out_ports:
-                # Port already in use by us
-                continue
-
-            try:
-                new_sock = socket(AF_INET, UDP)
-                new_sock.bind(("127.0.0.1", rand_port))
-                new_sock.setblocking(False)
+    def close(self):
+        """Closes the socket to the destination, through the transport, if
+        the asyncio runtime took it over."""
+        try:
+            self.channels.sock_sel.unregister(self.out_sock)
+        except (KeyError, ValueError):
+            # not registered or closed already
+            pass
 
-                ChannelExit.out_ports.append(rand_port)
+        if self.transport is not None:
+            self.transport.close()
+        else:
+            self.out_sock.close()
 
-                return new_sock
-            except OSError:
-                # Port already in use by another application, try a new one
-                pass
+    def __str__(self):
+        return "ChannelExit {} - {}:{}:".format(self.in_chan_id, *self.dest_addr)
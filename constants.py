@@ -13,10 +13,34 @@ CHAN_ID_SIZE = 2
 MIN_CHAN_ID = 1
 MAX_CHAN_ID = 2**(8 * CHAN_ID_SIZE) - 1
 
-REPLAY_WINDOW_SIZE = 10
+# counter values below the highest one, that may still arrive out of order
+REPLAY_WINDOW_SIZE = 4096
 
 CHANNEL_TIMEOUT_SEC = 30
 
+# seconds a released channel id is held back, so the next hop has dropped the
+# old channel, before a new one gets its id
+CHANNEL_ID_REUSE_DELAY = CHANNEL_TIMEOUT_SEC + 10
+
+# channel contexts an entry point keeps ready for new channels
+CONTEXT_POOL_SIZE = 16
+
+# level the nodes log on, messages about single packets are DEBUG
+LOG_LEVEL = "INFO"
+
+# address the nodes serve their metrics on, if a port is given
+METRICS_HOST = "127.0.0.1"
+
+# events a trace ring holds, before the oldest ones are overwritten
+TRACE_CAPACITY = 2**20
+
+# counter values an entry channel prepares the combined onion key streams for
+PAD_PREFETCH_DEPTH = 8
+
+# bytes of the pool, that padding and dummy traffic take their random bytes
+# from. refilled from a new key, once used up
+RANDOM_POOL_SIZE = 2**16
+
 # sym encryption
 
 SYM_KEY_LEN = 16
@@ -58,6 +82,9 @@ INIT_PAYLOAD_LEN = IPV4_LEN + PORT_LEN
 
 INIT_OVERHEAD = GROUP_ELEMENT_LEN + MIX_COUNT * 2 * SYM_KEY_LEN + INIT_PAYLOAD_LEN
 
+# number of group elements a mix remembers the shared secret of
+INIT_CACHE_SIZE = 1024
+
 # data message
 
 DATA_OVERHEAD = 0
@@ -0,0 +1,84 @@
+import asyncio
+from socket import socket
+from typing import List, Set, Optional, Coroutine, Any, Callable, Union
+
+from Types import AddressTuple
+
+from EntryPoint import EntryPoint
+from ExitPoint import ExitPoint
+from Mix import Mix
+from ShardedMix import ShardedChannels
+from UDPChannel import ChannelExit, EntryChannels, MidChannels, ExitChannels
+
+
+class ExpiryTimer:
+    channels: Union[EntryChannels, MidChannels, ExitChannels, ShardedChannels]
+    on_sweep: Optional[Callable[[], None]]
+    loop: asyncio.AbstractEventLoop
+    timer: Optional[asyncio.TimerHandle]
+
+    def __init__(self, channels: Union[EntryChannels, MidChannels, ExitChannels, ShardedChannels], on_sweep: Optional[Callable[[], None]]=...) -> None: ...
+    def start(self) -> None: ...
+    def _sweep(self) -> None: ...
+
+
+class EntryPointProtocol(asyncio.DatagramProtocol):
+    entry_point: EntryPoint
+    loop: asyncio.AbstractEventLoop
+    send_scheduled: bool
+    prefetch_scheduled: bool
+    expiry_timer: ExpiryTimer
+
+    def __init__(self, entry_point: EntryPoint) -> None: ...
+    def connection_made(self, transport: asyncio.BaseTransport) -> None: ...
+    def datagram_received(self, data: bytes, addr: AddressTuple) -> None: ...
+    def _scheduled_send(self) -> None: ...
+    def _send_burst(self) -> None: ...
+    def _prefetch_pads(self) -> None: ...
+
+
+class MixProtocol(asyncio.DatagramProtocol):
+    mix: Mix
+    loop: asyncio.AbstractEventLoop
+    batch: List[tuple]
+    flush_timer: Optional[asyncio.TimerHandle]
+    expiry_timer: ExpiryTimer
+
+    def __init__(self, mix: Mix) -> None: ...
+    def connection_made(self, transport: asyncio.BaseTransport) -> None: ...
+    def datagram_received(self, data: bytes, addr: AddressTuple) -> None: ...
+    def _handle_batch(self) -> None: ...
+    def _finish_channel_inits(self) -> None: ...
+    def _flush(self) -> None: ...
+    def _schedule_flush(self) -> None: ...
+
+
+class ExitPointProtocol(asyncio.DatagramProtocol):
+    exit_point: ExitPoint
+    loop: asyncio.AbstractEventLoop
+    channel_socks: Set[socket]
+    expiry_timer: ExpiryTimer
+
+    def __init__(self, exit_point: ExitPoint) -> None: ...
+    def connection_made(self, transport: asyncio.BaseTransport) -> None: ...
+    def datagram_received(self, data: bytes, addr: AddressTuple) -> None: ...
+    def _watch_channel(self, channel: ChannelExit) -> None: ...
+    def _forget_removed_channels(self) -> None: ...
+
+
+class ChannelProtocol(asyncio.DatagramProtocol):
+    exit_point: ExitPoint
+    channel: ChannelExit
+    transport: Optional[asyncio.DatagramTransport]
+
+    def __init__(self, exit_point: ExitPoint, channel: ChannelExit) -> None: ...
+    def connection_made(self, transport: asyncio.BaseTransport) -> None: ...
+    def datagram_received(self, data: bytes, addr: AddressTuple) -> None: ...
+    def error_received(self, exc: Exception) -> None: ...
+
+
+async def start_entry_point(entry_point: EntryPoint) -> None: ...
+async def start_mix(mix: Mix) -> None: ...
+async def start_exit_point(exit_point: ExitPoint) -> None: ...
+
+def run(starts: List[Coroutine[Any, Any, None]], use_uvloop: bool=...) -> None: ...
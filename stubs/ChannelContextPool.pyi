@@ -0,0 +1,22 @@
+from queue import Queue
+from threading import Thread
+from typing import List
+
+from petlib.ec import EcPt
+
+from UDPChannel import ChannelContext, EntryChannels
+
+
+class ChannelContextPool:
+    channels: EntryChannels
+    pub_comps: List[EcPt]
+    contexts: Queue
+    stopped: bool
+    producer: Thread
+
+    def __init__(self, channels: EntryChannels, pub_comps: List[EcPt], size: int) -> None: ...
+    def _produce(self) -> None: ...
+    def get(self) -> ChannelContext: ...
+    def stop(self) -> None: ...
+    def _drop_contexts(self) -> None: ...
+    def __len__(self) -> int: ...
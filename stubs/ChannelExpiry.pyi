@@ -0,0 +1,15 @@
+from itertools import count
+from typing import Any, Dict, List, Optional, Tuple
+
+class ChannelExpiry:
+    table: Dict[int, Any]
+    timeout: float
+    deadlines: List[Tuple[float, int, int, Any]]
+    entry_numbers: count
+
+    def __init__(self, table: Dict[int, Any], timeout: float=...) -> None: ...
+    def add(self, channel_id: int, channel: Any) -> None: ...
+    def timed_out(self, now: float) -> List[int]: ...
+    def next_deadline(self) -> Optional[float]: ...
+    def expired(self, channel: Any, now: float) -> bool: ...
+    def __len__(self) -> int: ...
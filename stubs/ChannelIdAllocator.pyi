@@ -0,0 +1,23 @@
+from typing import Deque, Optional, Set, Tuple
+
+RANDOM_PROBES: int
+
+class ChannelIdsExhaustedError(IndexError):
+    pass
+
+class ChannelIdAllocator:
+    first_id: int
+    shard_count: int
+    id_count: int
+    bitmap: bytearray
+    free_count: int
+    reuse_delay: float
+    held: Deque[Tuple[float, int]]
+    held_ids: Set[int]
+
+    def __init__(self, shard_index: int=..., shard_count: int=..., min_id: int=..., max_id: int=..., reuse_delay: float=...) -> None: ...
+    def allocate(self, now: Optional[float]=...) -> int: ...
+    def _scan(self, start: int) -> int: ...
+    def release(self, chan_id: int, now: Optional[float]=...) -> None: ...
+    def _free_held(self, now: float) -> None: ...
+    def __len__(self) -> int: ...
@@ -0,0 +1,29 @@
+from concurrent.futures import Future, ProcessPoolExecutor
+from socket import socket
+from typing import Deque, List, Optional, Tuple
+
+from petlib.bn import Bn
+
+from MsgV3 import ElementCache
+from UDPChannel import ChannelMid
+
+_priv_comp: Optional[Bn]
+_element_cache: ElementCache
+
+def _init_worker(secret: bytes, mix_pid: int) -> None: ...
+def _watch_mix(mix_pid: int) -> None: ...
+def _process(channel_id: int, message_counter: int, message: bytes) -> Tuple[bytes, bytes, bytes, bytes]: ...
+
+
+class ChannelInitPool:
+    executor: ProcessPoolExecutor
+    completed: Deque[Tuple[ChannelMid, bytes, Future]]
+    notify_recv: socket
+    notify_send: socket
+
+    def __init__(self, secret: Bn, workers: int) -> None: ...
+    def submit(self, channel: ChannelMid, msg_ctr: bytes, channel_init: bytes) -> None: ...
+    def _done(self, channel: ChannelMid, msg_ctr: bytes, future: Future) -> None: ...
+    def fileno(self) -> int: ...
+    def finish_completed(self) -> List[Exception]: ...
+    def shutdown(self) -> None: ...
@@ -0,0 +1,15 @@
+from typing import Deque, Dict, Iterable, Iterator, List
+
+
+class ChannelQueue:
+    queues: Dict[int, Deque[bytes]]
+    ready: Deque[int]
+    length: int
+
+    def __init__(self) -> None: ...
+    def add(self, chan_id: int, packet: bytes) -> None: ...
+    def extend(self, packets: Iterable[bytes]) -> None: ...
+    def take(self, count: int) -> List[bytes]: ...
+    def clear(self) -> None: ...
+    def __iter__(self) -> Iterator[bytes]: ...
+    def __len__(self) -> int: ...
@@ -1,13 +1,20 @@
 from socket import socket
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional
 
 from Types import AddressTuple
 from petlib.bn import Bn
 from petlib.ec import EcPt
 
+from ChannelContextPool import ChannelContextPool
 from LinkEncryption import LinkEncryptor, LinkDecryptor
-from UDPChannel import ChannelEntry
+from Metrics import Metric, MetricsRegistry
+from PacketDrops import PacketDrops
+from SendScheduler import SendScheduler
+from Trace import TraceRing
+from UDPChannel import ChannelEntry, EntryChannels
 
+SEND_BURST: int
+PREFETCH_BATCH: int
 
 class EntryPoint:
     own_addr: AddressTuple
@@ -16,13 +23,31 @@ class EntryPoint:
     pub_comps: List[EcPt]
     listener_socket: socket
 
+    context_pool_size: int
+    context_pool: Optional[ChannelContextPool]
+
     link_decryptor: LinkDecryptor
     link_encryptor: LinkEncryptor
+    drops: PacketDrops
+    metrics: MetricsRegistry
+    trace: Optional[TraceRing]
+    channels: EntryChannels
+    scheduler: SendScheduler
+    send_burst: int
+
+    requests_received: Metric
+    responses_received: Metric
+    requests_sent: Metric
+    responses_sent: Metric
 
-    def __init__(self, listen_addr: AddressTuple, addr_to_mix: AddressTuple) -> None: ...
+    def __init__(self, listen_addr: AddressTuple, addr_to_mix: AddressTuple, context_pool_size: int=..., trace: Optional[TraceRing]=..., scheduler: Optional[SendScheduler]=..., send_burst: int=...) -> None: ...
+    def _register_metrics(self, registry: MetricsRegistry) -> None: ...
     def set_keys(self, keys: List[Bn]) -> None: ...
     def handle_mix_response(self, response: bytes) -> None: ...
     def handle_client_request(self, request: bytes, src_addr: AddressTuple) -> None: ...
     def make_new_channel(self, src_addr: AddressTuple, dest_addr: AddressTuple) -> ChannelEntry: ...
-    def send_messages_to_mix(self) -> None: ...
+    def handle_packet(self, data: bytes, addr: AddressTuple) -> None: ...
+    def drop_packet(self, error: Exception) -> None: ...
+    def send_messages_to_mix(self, limit: Optional[int]=...) -> None: ...
+    def prefetch_pads(self) -> bool: ...
     def run(self) -> None: ...
@@ -1,8 +1,13 @@
 from socket import socket
+from typing import Optional
 
 from Types import AddressTuple
 
 from LinkEncryption import LinkDecryptor, LinkEncryptor
+from Metrics import Metric, MetricsRegistry
+from PacketDrops import PacketDrops
+from Trace import TraceRing
+from UDPChannel import ChannelExit, ExitChannels
 
 
 class ExitPoint:
@@ -11,6 +16,19 @@ class ExitPoint:
 
     link_decryptor: LinkDecryptor
     link_encryptor: LinkEncryptor
+    drops: PacketDrops
+    metrics: MetricsRegistry
+    trace: Optional[TraceRing]
+    channels: ExitChannels
 
-    def __init__(self, own_addr: AddressTuple) -> None: ...
+    requests_received: Metric
+    responses_received: Metric
+    responses_sent: Metric
+
+    def __init__(self, own_addr: AddressTuple, trace: Optional[TraceRing]=...) -> None: ...
+    def _register_metrics(self, registry: MetricsRegistry) -> None: ...
+    def handle_mix_packet(self, packet: bytes) -> ChannelExit: ...
+    def handle_response(self, channel: ChannelExit, response: bytes) -> bool: ...
+    def drop_packet(self, error: Exception) -> None: ...
+    def send_to_mix(self) -> None: ...
     def run(self) ->  None: ...
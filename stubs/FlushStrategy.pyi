@@ -0,0 +1,40 @@
+from typing import List, Optional, Union
+
+from ChannelQueue import ChannelQueue
+
+THRESHOLD: str
+TIMED: str
+TIMED_POOL: str
+
+
+class ThresholdFlush:
+    threshold: int
+    limit: Optional[int]
+    next_flush: Optional[float]
+
+    def __init__(self, threshold: int, limit: Optional[int]=...) -> None: ...
+    def deadline(self) -> Optional[float]: ...
+    def select(self, packets: ChannelQueue, now: float) -> List[bytes]: ...
+
+
+class TimedFlush:
+    interval: float
+    limit: Optional[int]
+    next_flush: float
+
+    def __init__(self, interval: float, limit: Optional[int]=...) -> None: ...
+    def deadline(self) -> Optional[float]: ...
+    def select(self, packets: ChannelQueue, now: float) -> List[bytes]: ...
+    def _schedule_next(self, now: float) -> None: ...
+    def _take(self, packets: ChannelQueue, count: int) -> List[bytes]: ...
+
+
+class TimedPoolFlush(TimedFlush):
+    pool_size: int
+
+    def __init__(self, interval: float, pool_size: int, limit: Optional[int]=...) -> None: ...
+
+
+FlushStrategy = Union[ThresholdFlush, TimedFlush, TimedPoolFlush]
+
+def flush_strategy(name: str, threshold: int, interval: float, pool_size: int, limit: Optional[int]=...) -> FlushStrategy: ...
@@ -4,6 +4,9 @@ from Counter import Counter
 from ReplayDetection import ReplayDetector
 
 
+class LinkAuthenticationError(ValueError):
+    pass
+
 class LinkEncryptor:
     key: bytes
     counter: Counter
@@ -0,0 +1,34 @@
+import logging
+from argparse import ArgumentParser, Namespace
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Optional, TextIO
+
+LOG_FORMAT: str
+
+LEVELS: List[str]
+
+class SampleFilter(logging.Filter):
+    rates: Dict[str, int]
+    counts: Dict[str, int]
+
+    def __init__(self, rates: Dict[str, int]) -> None: ...
+    def filter(self, record: logging.LogRecord) -> bool: ...
+
+class DeferredQueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord: ...
+
+class LogWriter:
+    handler: DeferredQueueHandler
+    stream_handler: logging.StreamHandler
+    listener: QueueListener
+    running: bool
+
+    def __init__(self, stream: TextIO, sample_rates: Optional[Dict[str, int]]=...) -> None: ...
+    def start(self) -> None: ...
+    def stop(self) -> None: ...
+    def restart(self) -> None: ...
+
+def parse_sample_rates(values: List[str]) -> Dict[str, int]: ...
+def add_log_arguments(parser: ArgumentParser) -> None: ...
+def setup_logging(level: str=..., sample_rates: Optional[Dict[str, int]]=..., stream: Optional[TextIO]=...) -> LogWriter: ...
+def setup_logging_from_args(args: Namespace) -> LogWriter: ...
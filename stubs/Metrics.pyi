@@ -0,0 +1,63 @@
+from http.server import ThreadingHTTPServer
+from threading import Thread
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from Types import AddressTuple
+
+COUNTER: str
+GAUGE: str
+HISTOGRAM: str
+
+TIME_BUCKETS: List[float]
+
+CONTENT_TYPE: str
+
+Sample = Tuple[str, Dict[str, str], Union[int, float]]
+
+def format_labels(labels: Dict[str, str]) -> str: ...
+
+class Metric:
+    name: str
+    labels: Dict[str, str]
+    value: Union[int, float]
+    function: Optional[Callable[[], Union[int, float]]]
+
+    def __init__(self, name: str, labels: Dict[str, str], function: Optional[Callable[[], Union[int, float]]]=...) -> None: ...
+    def inc(self, amount: Union[int, float]=...) -> None: ...
+    def set(self, value: Union[int, float]) -> None: ...
+    def samples(self) -> List[Sample]: ...
+
+class Histogram(Metric):
+    buckets: List[float]
+    counts: List[int]
+    sum: float
+    count: int
+
+    def __init__(self, name: str, labels: Dict[str, str], buckets: List[float]=...) -> None: ...
+    def observe(self, value: float) -> None: ...
+    def drain(self) -> Tuple[List[int], float, int]: ...
+    def merge(self, counts: List[int], total: float, count: int) -> None: ...
+    def samples(self) -> List[Sample]: ...
+
+class MetricsRegistry:
+    families: Dict[str, Tuple[str, str]]
+    metrics: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Metric]
+
+    def __init__(self) -> None: ...
+    def counter(self, name: str, help_text: str, labels: Optional[Dict[str, str]]=..., function: Optional[Callable[[], int]]=...) -> Metric: ...
+    def gauge(self, name: str, help_text: str, labels: Optional[Dict[str, str]]=..., function: Optional[Callable[[], Union[int, float]]]=...) -> Metric: ...
+    def histogram(self, name: str, help_text: str, labels: Optional[Dict[str, str]]=..., buckets: List[float]=...) -> Histogram: ...
+    def _get(self, metric_class: type, metric_type: str, name: str, help_text: str, labels: Optional[Dict[str, str]], **kwargs: Any) -> Any: ...
+    def exposition(self) -> str: ...
+
+REGISTRY: MetricsRegistry
+
+class MetricsServer:
+    server: ThreadingHTTPServer
+    thread: Thread
+
+    def __init__(self, registries: List[MetricsRegistry], addr: AddressTuple) -> None: ...
+    @property
+    def addr(self) -> AddressTuple: ...
+    def start(self) -> None: ...
+    def stop(self) -> None: ...
@@ -1,12 +1,23 @@
+from selectors import DefaultSelector
 from socket import socket
+from typing import List, Tuple, Optional, Union
 
 from Types import AddressTuple
 from petlib.bn import Bn
 from petlib.ec import EcPt
 
+from ChannelInitPool import ChannelInitPool
+from ChannelQueue import ChannelQueue
+from FlushStrategy import FlushStrategy
 from LinkEncryption import LinkEncryptor, LinkDecryptor
+from Metrics import Metric, Histogram, MetricsRegistry
+from PacketDrops import PacketDrops
+from Trace import TraceRing
+from ShardedMix import ShardedChannels
+from UDPChannel import MidChannels
 
 STORE_LIMIT: int
+RECV_BATCH_SIZE: int
 
 class Mix:
     priv_comp: Bn
@@ -20,9 +31,35 @@ class Mix:
     request_link_decryptor: LinkDecryptor
     response_link_decryptor: LinkDecryptor
 
+    sock_sel: DefaultSelector
+    batch_size: int
+    request_strategy: FlushStrategy
+    response_strategy: FlushStrategy
+    init_pool: Optional[ChannelInitPool]
+
     check_responses: bool
+    drops: PacketDrops
+    metrics: MetricsRegistry
+    trace: Optional[TraceRing]
+    channels: Union[MidChannels, ShardedChannels]
+
+    requests_received: Metric
+    responses_received: Metric
+    requests_sent: Metric
+    responses_sent: Metric
+    batch_time: Histogram
 
-    def __init__(self, private_key: Bn, own_address: AddressTuple, next_address: AddressTuple, check_responses: bool) -> None: ...
+    def __init__(self, private_key: Bn, own_address: AddressTuple, next_address: AddressTuple, check_responses: bool, batch_size: int, strategy: Optional[FlushStrategy], init_workers: int, trace: Optional[TraceRing]=..., channels: Optional[Union[MidChannels, ShardedChannels]]=...) -> None: ...
     def handle_mix_fragment(self, payload: bytes) -> None: ...
     def handle_response(self, payload: bytes) -> None: ...
+    def _register_metrics(self, registry: MetricsRegistry) -> None: ...
+    def handle_packet(self, packet: bytes, addr: AddressTuple) -> None: ...
+    def drop_packet(self, error: Exception) -> None: ...
+    def handle_batch(self, batch: List[Tuple[bytes, AddressTuple]]) -> None: ...
+    def finish_channel_inits(self) -> None: ...
+    def receive_batch(self) -> List[Tuple[bytes, AddressTuple]]: ...
+    def send_requests(self) -> None: ...
+    def send_responses(self) -> None: ...
+    def _flush(self, strategy: FlushStrategy, packets: ChannelQueue, link_encryptor: LinkEncryptor, addr: AddressTuple, direction: int) -> int: ...
+    def flush_timeout(self) -> Optional[float]: ...
     def run(self) -> None: ...
@@ -1,16 +1,38 @@
-from typing import List, Tuple, Union
+from threading import Lock
+from typing import Callable, List, Tuple, Union, Optional, Dict
 
 from petlib.bn import Bn
 from petlib.ec import EcPt
 from sphinxmix.SphinxParams import SphinxParams
 
 params: SphinxParams
+_params: Optional[SphinxParams]
+_params_lock: Lock
+
+# imported from util
+random_bytes: Callable[[int], bytes]
+gen_sym_key: Callable[[], bytes]
+
+def get_params() -> SphinxParams: ...
+def decode_group_element(group_element: bytes) -> EcPt: ...
 
 def group_expon(exponent: Bn) -> EcPt: ...
 def gen_priv_key() -> Bn: ...
 def get_pub_key(private_key: Bn) -> EcPt: ...
 
-def gen_init_msg(pub_mix_keys: List[EcPt], message_counter: int, request_channel_keys: List[bytes], response_channel_keys: List[bytes], payload: bytes) -> bytes: ...
+def gen_init_msg(pub_mix_keys: List[EcPt], message_counter: int, request_channel_keys: List[bytes], response_channel_keys: List[bytes], payload: bytes, x_msg_1: Optional[Bn]=..., group_element: Optional[bytes]=..., dispersal_keys: Optional[List[bytes]]=...) -> bytes: ...
+def gen_dispersal_keys(pub_mix_keys: List[EcPt], message_counter: int, x_msg_1: Bn) -> List[bytes]: ...
 def gen_blind(secret: Union[EcPt,bytes]) -> Bn: ...
-def process(priv_mix_key: Bn, message_counter: int, message: bytes) -> Tuple[bytes, bytes, bytes, bytes]: ...
+def process(priv_mix_key: Bn, message_counter: int, message: bytes, element_cache: Optional[ElementCache]=..., channel_id: Optional[int]=...) -> Tuple[bytes, bytes, bytes, bytes]: ...
+
+class ElementCache:
+    size: int
+    elements: Dict[Tuple[Optional[int], bytes], EcPt]
+    hits: int
+    misses: int
+
+    def __init__(self, size: int=...) -> None: ...
+    def get(self, channel_id: Optional[int], group_element: bytes) -> EcPt: ...
+
+def get_init_payload(message: bytes) -> bytes: ...
 def cut_init_message(message: bytes) -> Tuple[EcPt, bytes, bytes]: ...
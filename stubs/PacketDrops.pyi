@@ -0,0 +1,20 @@
+from typing import Dict, List
+
+REPLAY: str
+AUTH_FAILURE: str
+UNKNOWN_CHANNEL: str
+MALFORMED: str
+
+DROP_REASONS: List[str]
+
+def drop_reason(error: Exception) -> str: ...
+
+class PacketDrops:
+    counts: Dict[str, int]
+
+    def __init__(self) -> None: ...
+    def drop(self, error: Exception) -> str: ...
+    def add(self, counts: Dict[str, int]) -> None: ...
+    def clear(self) -> None: ...
+    def total(self) -> int: ...
+    def __getitem__(self, reason: str) -> int: ...
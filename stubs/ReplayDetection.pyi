@@ -1,12 +1,17 @@
-from typing import Optional, List
+from typing import Optional
 
 
 class ReplayDetectedError(Exception):
     pass
 
 
+def window_mask(window_size: int) -> int: ...
+
 class ReplayDetector:
-    replay_window: List[int]
+    window_size: int
+    mask: int
+    highest: int
+    missing: int
     def __init__(self, window_size: Optional[int]=..., start: Optional[int]=...): ...
 
     def check_replay_window(self, ctr: int) -> bool: ...
@@ -0,0 +1,35 @@
+from typing import Deque, Dict, Iterator, List, Optional, Set, Union
+
+from Types import AddressTuple
+from UDPChannel import ChannelEntry
+
+ROUND_ROBIN: str
+DEFICIT_ROUND_ROBIN: str
+
+
+class RoundRobinScheduler:
+    ready: Deque[ChannelEntry]
+    queued: Set[int]
+
+    def __init__(self) -> None: ...
+    def add(self, channel: ChannelEntry) -> None: ...
+    def take(self, limit: Optional[int]=...) -> Iterator[ChannelEntry]: ...
+    def _can_send(self, channel: ChannelEntry) -> bool: ...
+    def _requeue(self, channel: ChannelEntry) -> None: ...
+    def _remove(self, channel: ChannelEntry) -> None: ...
+    def __len__(self) -> int: ...
+
+
+class DeficitRoundRobinScheduler(RoundRobinScheduler):
+    weights: Dict[AddressTuple, float]
+    deficits: Dict[int, float]
+
+    def __init__(self, weights: Optional[Dict[AddressTuple, float]]=...) -> None: ...
+    def _skip_idle_rounds(self) -> None: ...
+    def weight(self, channel: ChannelEntry) -> float: ...
+
+
+SendScheduler = Union[RoundRobinScheduler, DeficitRoundRobinScheduler]
+
+def parse_weights(values: List[str]) -> Dict[AddressTuple, float]: ...
+def send_scheduler(name: str, weights: Optional[Dict[AddressTuple, float]]=...) -> SendScheduler: ...
@@ -0,0 +1,40 @@
+from multiprocessing import Process
+from multiprocessing.connection import Connection
+from typing import List, Tuple, Optional
+
+from Types import AddressTuple
+from petlib.bn import Bn
+
+from ChannelQueue import ChannelQueue
+from FlushStrategy import FlushStrategy
+from Mix import Mix
+from Trace import TraceRing
+
+REQUEST: int
+RESPONSE: int
+
+Job = Tuple[int, int, bytes, bytes, bytes]
+
+def run_worker(index: int, worker_count: int, secret: bytes, check_responses: bool, connection: Connection, mix_connections: List[Connection], trace_path: Optional[str]=...) -> None: ...
+
+
+class ShardedChannels:
+    requests: ChannelQueue
+    responses: ChannelQueue
+    channel_counts: List[int]
+
+    def __init__(self, worker_count: int) -> None: ...
+    def finish_layers(self) -> None: ...
+    def channel_count(self) -> int: ...
+    def next_deadline(self) -> Optional[float]: ...
+    def remove_timed_out(self, now: float) -> None: ...
+
+
+class ShardedMix(Mix):
+    channels: ShardedChannels
+    workers: List[Process]
+    connections: List[Connection]
+    jobs: List[List[Job]]
+
+    def __init__(self, private_key: Bn, own_address: AddressTuple, next_address: AddressTuple, check_responses: bool, batch_size: int, strategy: Optional[FlushStrategy], worker_count: int, trace: Optional[TraceRing]=...) -> None: ...
+    def stop(self) -> None: ...
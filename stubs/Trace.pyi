@@ -0,0 +1,36 @@
+from mmap import mmap
+from struct import Struct
+from typing import Dict, List, Tuple
+
+RECEIVED: int
+CRYPTED: int
+QUEUED: int
+DEQUEUED: int
+SENT: int
+CHANNEL: int
+
+EVENT_NAMES: Dict[int, str]
+
+REQUEST: int
+RESPONSE: int
+
+MAGIC: bytes
+
+HEADER: Struct
+EVENT: Struct
+
+# nanoseconds, event, direction, channel id, message counter
+Event = Tuple[int, int, int, int, int]
+
+class TraceRing:
+    path: str
+    capacity: int
+    written: int
+    ring: mmap
+
+    def __init__(self, path: str, capacity: int=...) -> None: ...
+    def record(self, event: int, direction: int, chan_id: int, counter: int) -> None: ...
+    def record_packet(self, event: int, direction: int, packet: bytes) -> None: ...
+    def close(self) -> None: ...
+
+def read_trace(path: str) -> List[Event]: ...
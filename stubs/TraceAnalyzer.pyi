@@ -0,0 +1,26 @@
+from typing import Dict, List, Optional, Tuple
+
+from Trace import Event
+
+# hop index, event, nanoseconds
+TimelineEntry = Tuple[int, int, int]
+
+class Hop:
+    name: str
+    lifetimes: Dict[int, List[List[int]]]
+    channels: Dict[Tuple[int, int], Tuple[int, int]]
+    reverse_channels: Dict[Tuple[int, int], Tuple[int, int]]
+    stages: Dict[Tuple[int, int, int, int], Dict[int, int]]
+
+    def __init__(self, name: str, events: List[Event]) -> None: ...
+    def _touch(self, chan_id: int, timestamp: int, new_lifetime: bool=...) -> int: ...
+    def lifetime(self, chan_id: int, timestamp: int) -> Optional[int]: ...
+    def out_id(self, direction: int, chan_id: int, lifetime: Optional[int]) -> Tuple[int, Optional[int]]: ...
+    def path(self, direction: int, chan_id: int, lifetime: Optional[int], counter: int) -> List[Tuple[int, int]]: ...
+    def first_packets(self, direction: int) -> List[Tuple[int, int, int]]: ...
+
+def load_hops(ring_lists: List[str]) -> List[Hop]: ...
+def follow(hops: List[Hop], direction: int) -> List[List[TimelineEntry]]: ...
+def stage_delays(timelines: List[List[TimelineEntry]], hops: List[Hop]) -> Dict[str, List[float]]: ...
+def end_to_end_delays(timelines: List[List[TimelineEntry]], hop_count: int) -> List[float]: ...
+def print_delays(title: str, timelines: List[List[TimelineEntry]], hops: List[Hop]) -> None: ...
@@ -1,36 +1,75 @@
 from selectors import DefaultSelector
 from socket import socket
-from typing import List, Dict, ClassVar, Optional, Union
+from threading import Lock
+from typing import List, Dict, ClassVar, Optional, Union, Tuple, Any
 
 from Types import AddressTuple
 from petlib.bn import Bn
 from petlib.ec import EcPt
 
+from ChannelExpiry import ChannelExpiry
+from ChannelIdAllocator import ChannelIdAllocator
+from ChannelQueue import ChannelQueue
+from ChannelInitPool import ChannelInitPool
 from Counter import Counter
 from MixMessage import MixMessage, MixMessageStore, FragmentGenerator
+from Metrics import Histogram
+from MsgV3 import ElementCache
 from ReplayDetection import ReplayDetector
+from Trace import TraceRing
+from util import CtrContext, CombinedPads
 
 
-def check_for_timed_out_channels(channel_table: Dict[int, Union[ChannelEntry, ChannelMid, ChannelExit]],
-                                 timeout:Optional[int]=...,
-                                 log_prefix:Optional[str]=... ) -> List[int]: ...
+class UnknownChannelError(KeyError):
+    pass
 
 def create_packet(channel_id: int, message_type: bytes, message_counter: Union[bytes, Counter], payload: bytes) -> bytes: ...
 
+class ChannelContext:
+    chan_id: int
+    req_sym_keys: List[bytes]
+    res_sym_keys: List[bytes]
+    init_secret: Bn
+    init_group_element: bytes
+    dispersal_keys: Dict[int, List[bytes]]
+    ciphers: Dict[bytes, CtrContext]
+
+    def __init__(self, channels: EntryChannels, pub_comps: List[EcPt]) -> None: ...
+
+class EntryChannels:
+    table: Dict[int, ChannelEntry]
+    expiry: ChannelExpiry
+    channel_ids: ChannelIdAllocator
+    id_lock: Lock
+    prefetch_queue: Dict[int, None]
+
+    def __init__(self) -> None: ...
+    def create(self, src_addr: AddressTuple, dest_addr: AddressTuple, pub_comps: List[EcPt], context: Optional[ChannelContext]=...) -> ChannelEntry: ...
+    def create_context(self, pub_comps: List[EcPt]) -> ChannelContext: ...
+    def next_deadline(self) -> Optional[float]: ...
+    def remove_timed_out(self, now: float) -> None: ...
+    def queue_prefetch(self, chan_id: int) -> None: ...
+    def prefetch_pads(self, limit: int) -> bool: ...
+    def random_channel(self) -> int: ...
+    def release_channel(self, chan_id: int, now: Optional[float]=...) -> None: ...
+
 class ChannelEntry:
-    out_chan_list: ClassVar[List[int]]
-    to_mix: ClassVar[List[bytes]]
-    to_client: ClassVar[List[bytes]]
-    table: ClassVar[Dict[int, ChannelEntry]]
+    channels: EntryChannels
 
     src_addr: AddressTuple
     dest_addr: AddressTuple
     chan_id: int
 
     pub_comps: List[EcPt]
+    init_secret: Bn
+    init_group_element: bytes
+    dispersal_keys: Dict[int, List[bytes]]
     req_sym_keys: List[bytes]
     res_sym_keys: List[bytes]
-    request_counter: Counter
+    ciphers: Dict[bytes, CtrContext]
+    request_pads: Optional[CombinedPads]
+    response_pads: Optional[CombinedPads]
+    request_counter: int
     replay_detector: ReplayDetector
 
     packets: List[FragmentGenerator]
@@ -38,7 +77,7 @@ class ChannelEntry:
     last_interaction: float
     allowed_to_send: bool
 
-    def __init__(self, src_addr: AddressTuple, dest_addr: AddressTuple, pub_comps: List[EcPt]) -> None: ...
+    def __init__(self, channels: EntryChannels, src_addr: AddressTuple, dest_addr: AddressTuple, pub_comps: List[EcPt], context: Optional[ChannelContext]=...) -> None: ...
     def can_send(self) -> bool: ...
     def request(self, request: bytes) -> None: ...
     def response(self, response: bytes) -> None: ...
@@ -55,24 +94,50 @@ class ChannelEntry:
 
     def _encrypt_fragment(self, fragment: bytes) -> bytes: ...
     def _decrypt_fragment(self, fragment: bytes) -> bytes: ...
+    def prefetch_pads(self) -> None: ...
+    def _request_pads(self) -> CombinedPads: ...
+    def _response_pads(self) -> CombinedPads: ...
+    def _make_pads(self, keys: List[bytes]) -> CombinedPads: ...
+    def _cipher(self, key: bytes) -> CtrContext: ...
 
     def __str__(self) -> str: ...
 
-    @staticmethod
-    def random_channel() -> int: ...
+class MidChannels:
+    layer_time: ClassVar[Histogram]
+    init_time: ClassVar[Histogram]
+
+    requests: ChannelQueue
+    responses: ChannelQueue
+
+    channel_ids: ChannelIdAllocator
+
+    table_out: Dict[int, ChannelMid]
+    table_in: Dict[int, ChannelMid]
+    expiry: ChannelExpiry
+    init_cache: ElementCache
+    trace: Optional[TraceRing]
+    layer_jobs: List[Tuple[ChannelQueue, int, bytes, bytes, CtrContext, bytes]]
+
+    def __init__(self, channel_ids: Optional[ChannelIdAllocator]=..., trace: Optional[TraceRing]=...) -> None: ...
+    def create(self, in_chan_id: int, check_responses: bool=...) -> ChannelMid: ...
+    def channel_count(self) -> int: ...
+    def finish_layers(self) -> None: ...
+    def handle_request(self, in_id: int, msg_ctr: bytes, fragment: bytes, msg_type: bytes, priv_comp: Bn, check_responses: bool=..., init_pool: Optional[ChannelInitPool]=...) -> None: ...
+    def handle_response(self, out_id: int, msg_ctr: bytes, fragment: bytes, msg_type: bytes) -> None: ...
+    def next_deadline(self) -> Optional[float]: ...
+    def remove_timed_out(self, now: float) -> None: ...
+    def remove(self, in_id: int, now: Optional[float]=...) -> None: ...
+    def random_channel(self) -> int: ...
 
 class ChannelMid:
-    out_chan_list: ClassVar[List[int]]
-    requests: ClassVar[List[bytes]]
-    responses: ClassVar[List[bytes]]
-
-    table_out: ClassVar[Dict[int, ChannelMid]]
-    table_in: ClassVar[Dict[int, ChannelMid]]
+    channels: MidChannels
 
     in_chan_id: int
     out_chan_id: int
     req_key: bytes
     res_key: bytes
+    req_cipher: Optional[CtrContext]
+    res_cipher: Optional[CtrContext]
 
     request_replay_detector: ReplayDetector
     response_replay_detector: ReplayDetector
@@ -83,37 +148,50 @@ class ChannelMid:
 
     initialized: bool
 
-    def __init__(self, in_chan_id: int, check_responses: bool) -> None: ...
+    pending_inits: int
+    pending_requests: List[bytes]
+
+    def __init__(self, channels: MidChannels, in_chan_id: int, check_responses: bool=...) -> None: ...
     def forward_request(self, request: bytes) -> None: ...
     def forward_response(self, response: bytes) -> None: ...
     def parse_channel_init(self, channel_init: bytes, priv_comp: Bn) -> None: ...
+    def start_channel_init(self, channel_init: bytes) -> Tuple[bytes, bytes]: ...
+    def finish_channel_init(self, msg_ctr: bytes, key_req: bytes, key_res: bytes, channel_init: bytes) -> None: ...
+    def abort_channel_init(self) -> None: ...
 
     def __str__(self) -> str: ...
 
-    @staticmethod
-    def random_channel() -> int: ...
+class ExitChannels:
+    out_ports: List[int]
+    sock_sel: DefaultSelector
+    to_mix: List[bytes]
+    table: Dict[int, ChannelExit]
+    expiry: ChannelExpiry
+
+    def __init__(self) -> None: ...
+    def create(self, in_chan_id: int) -> ChannelExit: ...
+    def next_deadline(self) -> Optional[float]: ...
+    def remove_timed_out(self, now: float) -> None: ...
+    def remove(self, in_chan_id: int) -> None: ...
+    def random_socket(self) -> socket: ...
 
 class ChannelExit:
-    out_ports: ClassVar[List[int]]
-    sock_sel: ClassVar[DefaultSelector]
-    to_mix: ClassVar[List[bytes]]
-    table: ClassVar[Dict[int, ChannelExit]]
+    channels: ExitChannels
 
     in_chan_id: int
     out_sock: socket
+    transport: Optional[Any]
     dest_addr: AddressTuple
     mix_msg_store: MixMessageStore
 
     last_interaction: float
-    response_counter: Counter
+    response_counter: int
 
-    def __init__(self, in_chan_id:int) -> None: ...
+    def __init__(self, channels: ExitChannels, in_chan_id: int) -> None: ...
     def recv_request(self, request: bytes)-> None: ...
     def recv_response(self, response: bytes) -> None: ...
     def parse_channel_init(self, channel_init: bytes) -> None: ...
     def send_chan_confirm(self) -> None: ...
+    def close(self) -> None: ...
 
     def __str__(self) -> str: ...
-
-    @staticmethod
-    def random_socket() -> socket: ...
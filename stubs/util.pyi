@@ -1,4 +1,4 @@
-from typing import List, Dict, Tuple, Any, Union
+from typing import List, Dict, Tuple, Any, Union, Iterable, Optional
 
 from Cryptodome.Cipher._mode_ctr import CtrMode
 from Cryptodome.Cipher._mode_gcm import GcmMode
@@ -22,11 +22,51 @@ def read_cfg_values(filepath: str) -> List[str]: ...
 def partitions(sequence: Union[List[Any], str], part_size: int) -> int: ...
 def partitioned(sequence: Union[List[Any], str], part_size: int) -> List[Any]: ...
 def byte_len(integer: int) -> int: ...
-def random_channel_id() -> int: ...
 def cut(sequence: bytes, *cut_points: int) -> Tuple[bytes, ...]: ...
+def seconds_until(deadlines: Iterable[Optional[float]]) -> Optional[float]: ...
 def gen_sym_key() -> bytes: ...
 def gen_ctr_prefix() -> int: ...
+
+class RandomPool:
+    size: int
+    buffer: bytes
+    offset: int
+
+    def __init__(self, size: int=...) -> None: ...
+    def get(self, length: int) -> bytes: ...
+    def refill(self) -> None: ...
+
+_random_pool: RandomPool
+
+def random_bytes(length: int) -> bytes: ...
+
 def ctr_cipher(key: bytes, counter: int) -> CtrMode: ...
+def counter_blocks(block_count: int) -> bytes: ...
+
+class CtrContext:
+    key: bytes
+    cipher: Any
+
+    def __init__(self, key: bytes) -> None: ...
+    def keystream(self, counter: int, length: int) -> bytes: ...
+    def encrypt(self, counter: int, data: bytes) -> bytes: ...
+    def decrypt(self, counter: int, data: bytes) -> bytes: ...
+
+def ctr_crypt_batch(jobs: List[Tuple[CtrContext, int, bytes]]) -> List[bytes]: ...
+
+class CombinedPads:
+    contexts: List[CtrContext]
+    keys: List[bytes]
+    length: int
+    depth: int
+    pads: Dict[int, bytes]
+
+    def __init__(self, contexts: List[CtrContext], length: int, depth: int) -> None: ...
+    def prefetch(self, first_counter: int) -> None: ...
+    def apply(self, counter: int, data: bytes) -> bytes: ...
+    def _make_pad(self, counter: int, length: int) -> bytes: ...
+    def __len__(self) -> int: ...
+
 def gcm_cipher(key: bytes, counter: int) -> GcmMode: ...
 def link_encrypt(key: bytes, link_ctr: int, packet: bytes) -> bytes: ...
 def link_decrypt(key: bytes, packet: bytes) -> Tuple[int, int, bytes, bytes, bytes]: ...
@@ -0,0 +1,97 @@
+import asyncio
+from socket import socket, AF_INET, SOCK_DGRAM as UDP
+
+from AsyncRuntime import start_mix
+from FlushStrategy import TimedFlush
+from LinkEncryption import LinkEncryptor, LinkDecryptor
+from Mix import Mix
+from MsgV3 import gen_priv_key, get_pub_key
+from UDPChannel import EntryChannels
+from constants import MIX_COUNT, SYM_KEY_LEN, CHAN_INIT_MSG_FLAG, UDP_MTU
+
+local_addr = ("127.0.0.1", 0)
+dest_addr = ("127.0.0.2", 23456)
+
+
+def test_mix_protocol():
+    private_keys = [gen_priv_key() for _ in range(MIX_COUNT)]
+    public_keys = [get_pub_key(private_key) for private_key in private_keys]
+
+    next_hop = socket(AF_INET, UDP)
+    next_hop.bind(local_addr)
+    next_hop.setblocking(False)
+
+    client = socket(AF_INET, UDP)
+    client.bind(local_addr)
+
+    # only the flush deadline sends the packets out
+    mix = Mix(private_keys[0], local_addr, next_hop.getsockname(), strategy=TimedFlush(0.1))
+
+    link_encryptor = LinkEncryptor(bytes(SYM_KEY_LEN))
+    link_decryptor = LinkDecryptor(bytes(SYM_KEY_LEN))
+
+    loop = asyncio.new_event_loop()
+
+    try:
+        loop.run_until_complete(start_mix(mix))
+
+        channels = [EntryChannels().create(client.getsockname(), dest_addr, public_keys) for _ in range(5)]
+
+        for channel in channels:
+            client.sendto(link_encryptor.encrypt(channel.get_message()), mix.incoming.get_extra_info("sockname"))
+
+        loop.run_until_complete(asyncio.sleep(0.3))
+
+        out_going = []
+
+        try:
+            while True:
+                out_going.append(next_hop.recv(UDP_MTU))
+        except BlockingIOError:
+            pass
+
+        assert len(out_going) == len(channels)
+
+        for packet in out_going:
+            _, _, _, msg_type = link_decryptor.decrypt(packet)
+
+            assert msg_type == CHAN_INIT_MSG_FLAG
+    finally:
+        loop.close()
+
+
+def test_mix_channels_time_out():
+    private_keys = [gen_priv_key() for _ in range(MIX_COUNT)]
+    public_keys = [get_pub_key(private_key) for private_key in private_keys]
+
+    next_hop = socket(AF_INET, UDP)
+    next_hop.bind(local_addr)
+
+    client = socket(AF_INET, UDP)
+    client.bind(local_addr)
+
+    mix = Mix(private_keys[0], local_addr, next_hop.getsockname())
+    mix.channels.expiry.timeout = 0.1
+
+    link_encryptor = LinkEncryptor(bytes(SYM_KEY_LEN))
+
+    loop = asyncio.new_event_loop()
+
+    try:
+        loop.run_until_complete(start_mix(mix))
+
+        channels = [EntryChannels().create(client.getsockname(), dest_addr, public_keys) for _ in range(5)]
+
+        for channel in channels:
+            client.sendto(link_encryptor.encrypt(channel.get_message()), mix.incoming.get_extra_info("sockname"))
+
+        loop.run_until_complete(asyncio.sleep(0.05))
+
+        assert mix.channels.channel_count() == len(channels)
+
+        # no further datagrams arrive, only the timer removes the channels
+        loop.run_until_complete(asyncio.sleep(0.2))
+
+        assert mix.channels.channel_count() == 0
+    finally:
+        loop.close()
@@ -0,0 +1,61 @@
+from time import sleep
+
+from ChannelContextPool import ChannelContextPool
+from MsgV3 import gen_priv_key, get_pub_key, process
+from UDPChannel import EntryChannels
+from constants import MIX_COUNT, CHAN_ID_SIZE, MSG_TYPE_FLAG_LEN, CTR_PREFIX_LEN
+from util import cut, b2i
+
+src_addr = ("127.0.0.1", 12345)
+dest_addr = ("127.0.0.2", 23456)
+
+private_keys = [gen_priv_key() for _ in range(MIX_COUNT)]
+public_keys = [get_pub_key(private_key) for private_key in private_keys]
+
+channels = EntryChannels()
+
+
+def test_pool_is_filled_in_background():
+    pool = ChannelContextPool(channels, public_keys, 4)
+
+    try:
+        for _ in range(100):
+            if len(pool) == 4:
+                break
+
+            sleep(0.05)
+
+        assert len(pool) == 4
+
+        contexts = [pool.get() for _ in range(6)]
+
+        # the last ones were made on demand or in the meantime
+        assert len(set(context.chan_id for context in contexts)) == 6
+    finally:
+        pool.stop()
+
+    assert not pool.producer.is_alive()
+
+
+def test_channel_from_context():
+    pool = ChannelContextPool(channels, public_keys, 1)
+
+    try:
+        context = pool.get()
+    finally:
+        pool.stop()
+
+    channel = channels.create(src_addr, dest_addr, public_keys, context)
+
+    assert channel.chan_id == context.chan_id
+
+    _, _, msg_ctr, init_message = cut(channel.get_message(), CHAN_ID_SIZE, MSG_TYPE_FLAG_LEN, CTR_PREFIX_LEN)
+
+    # the precomputed dispersal keys were used
+    assert not channel.dispersal_keys
+
+    for private_key, req_key, res_key in zip(private_keys, channel.req_sym_keys, channel.res_sym_keys):
+        key_req, key_res, _, init_message = process(private_key, b2i(msg_ctr), init_message)
+
+        assert key_req == req_key
+        assert key_res == res_key
@@ -4,8 +4,8 @@ from Counter import Counter
 from MixMessage import INIT_PACKET_SIZE, FragmentGenerator
 from MsgV3 import get_pub_key, gen_priv_key
 from ReplayDetection import ReplayDetectedError
-from UDPChannel import ChannelEntry
-from constants import MIX_COUNT, CHAN_ID_SIZE, MSG_TYPE_FLAG_LEN, CTR_PREFIX_LEN
+from UDPChannel import EntryChannels
+from constants import MIX_COUNT, CHAN_ID_SIZE, MSG_TYPE_FLAG_LEN, CTR_PREFIX_LEN, CHAN_CONFIRM_MSG_FLAG
 from util import gen_sym_key, ctr_cipher, i2b, cut, b2i
 
 src_addr = ("127.0.0.1", 12345)
@@ -14,9 +14,11 @@ dest_addr = ("127.0.0.2", 23456)
 private_keys = [gen_priv_key() for i in range(MIX_COUNT)]
 public_keys = [get_pub_key(private_key) for private_key in private_keys]
 
+channels = EntryChannels()
+
 
 def test_get_init_message():
-    channel = ChannelEntry(src_addr, dest_addr, public_keys)
+    channel = channels.create(src_addr, dest_addr, public_keys)
 
     channel_initialization_message = channel._get_init_message()
 
@@ -24,7 +26,7 @@ def test_get_init_message():
 
 
 def test_replay_detection():
-    channel = ChannelEntry(src_addr, dest_addr, public_keys)
+    channel = channels.create(src_addr, dest_addr, public_keys)
 
     counter = 1234
     sym_key = gen_sym_key()
@@ -50,7 +52,7 @@ def test_replay_detection():
 
 
 def test_encrypt_fragment():
-    channel = ChannelEntry(src_addr, dest_addr, public_keys)
+    channel = channels.create(src_addr, dest_addr, public_keys)
 
     sym_key = gen_sym_key()
     channel.req_sym_keys = [sym_key] * MIX_COUNT
@@ -72,9 +74,44 @@ def test_encrypt_fragment():
     assert packet1 == packet2
 
 
+def test_prefetched_pads():
+    channel = channels.create(src_addr, dest_addr, public_keys)
+    other = channels.create(src_addr, dest_addr, public_keys)
+
+    other.req_sym_keys = channel.req_sym_keys
+
+    channel.prefetch_pads()
+
+    assert len(channel.request_pads) > 0
+
+    fragment = FragmentGenerator(bytes(100)).get_data_fragment()
+
+    assert channel._encrypt_fragment(fragment) == other._encrypt_fragment(fragment)
+
+
+def test_only_active_channels_prefetch():
+    registry = EntryChannels()
+
+    idle = registry.create(src_addr, dest_addr, public_keys)
+    active = registry.create(src_addr, dest_addr, public_keys)
+
+    active.response(CHAN_CONFIRM_MSG_FLAG)
+
+    assert not registry.prefetch_pads(1)
+
+    assert idle.request_pads is None
+    assert len(active.request_pads) > 0
+
+    # sending a fragment queues the channel again
+    active.request(bytes(100))
+    active.get_message()
+
+    assert list(registry.prefetch_queue) == [active.chan_id]
+
+
 @pytest.mark.skip(reason="no way of currently testing this")
 def test_decrypt_fragment():
-    channel = ChannelEntry(src_addr, dest_addr, public_keys)
+    channel = channels.create(src_addr, dest_addr, public_keys)
 
     sym_key = gen_sym_key()
     channel.req_sym_keys = [sym_key] * MIX_COUNT
@@ -0,0 +1,18 @@
+from UDPChannel import ExitChannels
+
+
+def test_timed_out_channels_close_their_sockets():
+    channels = ExitChannels()
+
+    channel = channels.create(1)
+    channels.sock_sel.register(channel.out_sock, 1, data=channel)
+
+    assert channels.next_deadline() == channel.last_interaction + channels.expiry.timeout
+
+    channels.remove_timed_out(channels.next_deadline() + 1)
+
+    assert not channels.table
+    assert channel.out_sock.fileno() == -1
+    assert not channels.sock_sel.get_map()
+
+    assert channels.next_deadline() is None
@@ -0,0 +1,92 @@
+#!/usr/bin/python3
+"""Compares the time it takes to look for timed out channels on every packet
+with the ChannelExpiry index against the former scan over the whole channel
+table. Both have to find the same channels."""
+from random import Random
+from timeit import timeit
+
+from ChannelExpiry import ChannelExpiry
+
+runs = 5
+packet_count = 10000
+timeout = 30
+
+
+class FakeChannel:
+    def __init__(self, last_interaction):
+        self.last_interaction = last_interaction
+
+
+def scan_timed_out(channel_table, now):
+    return [channel_id for channel_id, channel in channel_table.items() if now - channel.last_interaction > timeout]
+
+
+def make_table(channel_count):
+    return {channel_id: FakeChannel(0) for channel_id in range(channel_count)}
+
+
+def packets(channel_count, seed=0):
+    """Returns (channel id, time) of packets for random channels of the first
+    half of the table, one every millisecond. All channels were last used 25
+    seconds before the first packet, so the other half times out along the
+    way."""
+    random = Random(seed)
+
+    return [(random.randrange(channel_count // 2), index / 1000) for index in range(packet_count)]
+
+
+def handle_with_scan(channel_count, packet_list):
+    table = make_table(channel_count)
+    timed_out = []
+
+    for channel_id, now in packet_list:
+        if channel_id in table:
+            table[channel_id].last_interaction = now + timeout - 5
+
+        for timed_out_id in scan_timed_out(table, now + timeout - 5):
+            del table[timed_out_id]
+            timed_out.append(timed_out_id)
+
+    return timed_out
+
+
+def handle_with_index(channel_count, packet_list):
+    table = make_table(channel_count)
+    expiry = ChannelExpiry(table, timeout)
+
+    for channel_id, channel in table.items():
+        expiry.add(channel_id, channel)
+
+    timed_out = []
+
+    for channel_id, now in packet_list:
+        if channel_id in table:
+            table[channel_id].last_interaction = now + timeout - 5
+
+        for timed_out_id in expiry.timed_out(now + timeout - 5):
+            del table[timed_out_id]
+            timed_out.append(timed_out_id)
+
+    return timed_out
+
+
+for channel_count in [100, 1000]:
+    packet_list = packets(channel_count)
+
+    timed_out = handle_with_scan(channel_count, packet_list)
+
+    assert timed_out, "No channel timed out."
+    assert sorted(timed_out) == sorted(handle_with_index(channel_count, packet_list))
+
+print("Scan and index find the same timed out channels.")
+
+out_format = "{:>6} channels, scan: {:8.2f}us, index: {:8.2f}us per packet"
+
+for channel_count in [10, 100, 1000, 10000]:
+    packet_list = packets(channel_count)
+
+    scan_time = timeit(lambda: handle_with_scan(channel_count, packet_list), number=runs)
+    index_time = timeit(lambda: handle_with_index(channel_count, packet_list), number=runs)
+
+    print(out_format.format(channel_count, scan_time / runs / packet_count * 10**6,
+                            index_time / runs / packet_count * 10**6))
@@ -0,0 +1,53 @@
+from ChannelExpiry import ChannelExpiry
+
+
+class FakeChannel:
+    def __init__(self, last_interaction):
+        self.last_interaction = last_interaction
+
+
+def test_timed_out():
+    table = dict()
+    expiry = ChannelExpiry(table, timeout=10)
+
+    for channel_id in range(5):
+        table[channel_id] = FakeChannel(channel_id)
+        expiry.add(channel_id, table[channel_id])
+
+    assert expiry.timed_out(10) == []
+
+    # used since it was added
+    table[1].last_interaction = 12
+
+    # removed from the table by someone else
+    del table[2]
+
+    # replaced by a new channel with the same id
+    table[3] = FakeChannel(20)
+    expiry.add(3, table[3])
+
+    assert expiry.timed_out(14.5) == [0, 4]
+
+    # only the refreshed channel and the new one remain
+    assert len(expiry) == 2
+
+    assert expiry.timed_out(22.5) == [1]
+    assert expiry.timed_out(30.5) == [3]
+    assert len(expiry) == 0
+
+
+def test_next_deadline():
+    table = dict()
+    expiry = ChannelExpiry(table, timeout=10)
+
+    assert expiry.next_deadline() is None
+
+    for channel_id, last_interaction in [(1, 5), (2, 3)]:
+        table[channel_id] = FakeChannel(last_interaction)
+        expiry.add(channel_id, table[channel_id])
+
+    assert expiry.next_deadline() == 13
+
+    expiry.timed_out(13.5)
+
+    assert expiry.next_deadline() == 15
@@ -0,0 +1,85 @@
+import pytest
+
+from ChannelIdAllocator import ChannelIdAllocator, ChannelIdsExhaustedError
+from constants import MIN_CHAN_ID, MAX_CHAN_ID
+
+
+def test_allocate_and_release():
+    allocator = ChannelIdAllocator(min_id=1, max_id=10, reuse_delay=0)
+
+    ids = [allocator.allocate() for _ in range(10)]
+
+    assert sorted(ids) == list(range(1, 11))
+    assert len(allocator) == 0
+
+    with pytest.raises(ChannelIdsExhaustedError):
+        allocator.allocate()
+
+    allocator.release(4)
+    allocator.release(7)
+
+    assert len(allocator) == 2
+    assert sorted([allocator.allocate(), allocator.allocate()]) == [4, 7]
+
+    allocator.release(4)
+
+    # released twice
+    with pytest.raises(ValueError):
+        allocator.release(4)
+
+
+def test_released_ids_are_held_back():
+    allocator = ChannelIdAllocator(min_id=1, max_id=2, reuse_delay=10)
+
+    first = allocator.allocate(now=0)
+    second = allocator.allocate(now=0)
+
+    allocator.release(first, now=5)
+
+    with pytest.raises(ChannelIdsExhaustedError):
+        allocator.allocate(now=14)
+
+    # released twice, while it is held back
+    with pytest.raises(ValueError):
+        allocator.release(first, now=14)
+
+    assert allocator.allocate(now=15) == first
+
+    allocator.release(second, now=20)
+
+    assert allocator.free_count == 0
+    assert list(allocator.held) == [(30, second)]
+
+
+def test_shards():
+    for shard_index in range(3):
+        allocator = ChannelIdAllocator(shard_index, 3, min_id=1, max_id=20)
+
+        ids = [allocator.allocate() for _ in range(len(allocator))]
+
+        assert sorted(ids) == [chan_id for chan_id in range(1, 21) if chan_id % 3 == shard_index]
+
+
+def test_allocate_all_ids():
+    # most ids are only found by scanning the bitmap
+    allocator = ChannelIdAllocator(min_id=1, max_id=1000, reuse_delay=0)
+
+    ids = [allocator.allocate() for _ in range(1000)]
+
+    assert sorted(ids) == list(range(1, 1001))
+
+    for chan_id in [1, 500, 1000]:
+        allocator.release(chan_id)
+
+    assert sorted(allocator.allocate() for _ in range(3)) == [1, 500, 1000]
+
+    with pytest.raises(ValueError):
+        allocator.release(1001)
+
+
+def test_bitmap_size():
+    # one bit for every id of the shard
+    assert MAX_CHAN_ID - MIN_CHAN_ID + 1 == 2**16 - 1
+
+    assert len(ChannelIdAllocator().bitmap) == 2**13
+    assert len(ChannelIdAllocator(1, 4).bitmap) == 2**11
@@ -0,0 +1,59 @@
+from select import select
+
+from LinkEncryption import LinkEncryptor, LinkDecryptor
+from Mix import Mix
+from MsgV3 import gen_priv_key, get_pub_key
+from UDPChannel import EntryChannels
+from constants import MIX_COUNT, SYM_KEY_LEN, DATA_MSG_FLAG, CHAN_INIT_MSG_FLAG
+
+local_addr = ("127.0.0.1", 0)
+client_addr = ("127.0.0.1", 12345)
+next_addr = ("127.0.0.1", 12346)
+dest_addr = ("127.0.0.2", 23456)
+
+
+def test_requests_wait_for_channel_init():
+    private_keys = [gen_priv_key() for _ in range(MIX_COUNT)]
+    public_keys = [get_pub_key(private_key) for private_key in private_keys]
+
+    mix = Mix(private_keys[0], local_addr, next_addr, init_workers=2)
+
+    link_encryptor = LinkEncryptor(bytes(SYM_KEY_LEN))
+    link_decryptor = LinkDecryptor(bytes(SYM_KEY_LEN))
+
+    try:
+        channels = [EntryChannels().create(client_addr, dest_addr, public_keys) for _ in range(5)]
+
+        batch = [(link_encryptor.encrypt(channel.get_message()), client_addr) for channel in channels]
+
+        # data messages, that arrive, before the inits are processed
+        for channel in channels:
+            channel.allowed_to_send = True
+
+        batch.extend((link_encryptor.encrypt(channel.get_message()), client_addr) for channel in channels)
+
+        mix.handle_batch(batch)
+
+        assert not mix.channels.requests
+
+        while len(mix.channels.requests) < 2 * len(channels):
+            readable, _, _ = select([mix.init_pool], [], [], 10)
+
+            assert readable, "channel inits took too long"
+
+            mix.finish_channel_inits()
+
+        msg_types = dict()
+
+        for packet in mix.channels.requests:
+            out_id, _, _, msg_type = link_decryptor.decrypt(link_encryptor.encrypt(packet))
+
+            msg_types.setdefault(out_id, []).append(msg_type)
+
+        assert len(msg_types) == len(channels)
+
+        # every init is forwarded before the data of its channel
+        for types in msg_types.values():
+            assert types == [CHAN_INIT_MSG_FLAG, DATA_MSG_FLAG]
+    finally:
+        mix.init_pool.shutdown()
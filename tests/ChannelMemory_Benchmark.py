@@ -0,0 +1,106 @@
+#!/usr/bin/python3
+"""Reports how many bytes of Python objects a channel takes up in an
+EntryPoint, a Mix and an ExitPoint, after it forwarded some packets in both
+directions. Measured with tracemalloc over many channels, so memory allocated
+by the crypto libraries themselves is not included."""
+import gc
+import tracemalloc
+from socket import socket, AF_INET, SOCK_DGRAM as UDP
+
+from MixMessage import DATA_FRAG_SIZE, FragmentGenerator
+from MsgV3 import gen_priv_key, get_pub_key
+from UDPChannel import EntryChannels, MidChannels, ExitChannels
+from constants import MIX_COUNT, DATA_MSG_FLAG, CTR_PREFIX_LEN
+from util import gen_sym_key, i2b
+
+packet_count = 10
+
+client_addr = ("127.0.0.1", 12345)
+dest_addr = ("127.0.0.2", 23456)
+
+
+public_keys = [get_pub_key(gen_priv_key()) for _ in range(MIX_COUNT)]
+
+
+def fill_entry_channels(channels, count):
+    for _ in range(count):
+        channel = channels.create(client_addr, dest_addr, public_keys)
+        channel.allowed_to_send = True
+
+        for counter in range(1, packet_count + 1):
+            channel.request(bytes(100))
+            channel.get_message()
+
+            # as if a response came in
+            channel.replay_detector.check_replay_window(counter)
+
+
+def fill_mid_channels(channels, count):
+    for in_id in range(count):
+        channel = channels.create(in_id)
+
+        msg_ctr, init_message = channel.start_channel_init(i2b(1, CTR_PREFIX_LEN) + bytes(100))
+        channel.finish_channel_init(msg_ctr, gen_sym_key(), gen_sym_key(), init_message)
+
+        for counter in range(2, packet_count + 2):
+            channel.forward_request(i2b(counter, CTR_PREFIX_LEN) + bytes(DATA_FRAG_SIZE))
+            channel.forward_response(DATA_MSG_FLAG + i2b(counter, CTR_PREFIX_LEN) + bytes(DATA_FRAG_SIZE))
+
+        channels.finish_layers()
+
+        # the packets are sent out right away
+        channels.requests.clear()
+        channels.responses.clear()
+
+
+def fill_exit_channels(channels, count):
+    destination = socket(AF_INET, UDP)
+    destination.bind(("127.0.0.1", 0))
+
+    # a complete message for the destination
+    request = FragmentGenerator(bytes(100)).get_data_fragment()
+
+    for in_id in range(count):
+        channel = channels.create(in_id)
+        channel.out_sock.connect(destination.getsockname())
+
+        channel.send_chan_confirm()
+
+        for _ in range(packet_count):
+            channel.recv_request(request)
+            channel.recv_response(bytes(100))
+
+        channels.to_mix.clear()
+
+    for channel in channels.table.values():
+        channel.out_sock.close()
+
+    destination.close()
+
+
+def bytes_per_channel(channels, fill_channels, count):
+    """Fills the registry with count channels. Only the memory they take up is
+    measured, not that of the registry itself."""
+    gc.collect()
+
+    tracemalloc.start()
+
+    before, _ = tracemalloc.get_traced_memory()
+
+    fill_channels(channels, count)
+
+    gc.collect()
+
+    after, _ = tracemalloc.get_traced_memory()
+
+    tracemalloc.stop()
+
+    return (after - before) / count
+
+
+out_format = "{:<12} {:>6} channels: {:8.0f} bytes per channel"
+
+for name, registry, fill, channel_count in [("EntryPoint", EntryChannels(), fill_entry_channels, 100),
+                                            ("Mix", MidChannels(), fill_mid_channels, 20000),
+                                            ("ExitPoint", ExitChannels(), fill_exit_channels, 500)]:
+    print(out_format.format(name, channel_count, bytes_per_channel(registry, fill, channel_count)))
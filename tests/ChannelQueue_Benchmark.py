@@ -0,0 +1,84 @@
+#!/usr/bin/python3
+"""Compares how many flushes the packets of light channels wait in a Mix,
+while one bulk channel sends more packets, than a flush sends out. Once with
+all packets in one list, as the Mix stored them before, once in a
+ChannelQueue. Also reports how fast packets are taken out of a ChannelQueue."""
+from statistics import mean
+from timeit import timeit
+
+from ChannelQueue import ChannelQueue
+
+flush_count = 200
+flush_limit = 40
+
+bulk_id = 1
+bulk_packets = 50
+
+light_ids = range(2, 12)
+
+
+def arrivals(flush):
+    """Packets arriving before the given flush as (channel id, flush) pairs."""
+    packets = [(bulk_id, flush)] * bulk_packets
+    packets.extend((chan_id, flush) for chan_id in light_ids)
+
+    return packets
+
+
+def take_list(packets, count):
+    selected = packets[:count]
+
+    del packets[:count]
+
+    return selected
+
+
+def take_queue(packets, count):
+    return packets.take(count)
+
+
+def add_list(packets, new_packets):
+    packets.extend(new_packets)
+
+
+def add_queue(packets, new_packets):
+    for chan_id, flush in new_packets:
+        packets.add(chan_id, (chan_id, flush))
+
+
+def light_delays(packets, add, take):
+    delays = []
+
+    for flush in range(flush_count):
+        add(packets, arrivals(flush))
+
+        for chan_id, arrived in take(packets, flush_limit):
+            if chan_id != bulk_id:
+                delays.append(flush - arrived)
+
+    return delays
+
+
+out_format = "{:<12} light packets sent: {:5} waited for flushes: mean {:6.1f} max {:4}"
+
+for name, packets, add, take in [("list", [], add_list, take_list),
+                                 ("ChannelQueue", ChannelQueue(), add_queue, take_queue)]:
+    delays = light_delays(packets, add, take)
+
+    print(out_format.format(name, len(delays), mean(delays), max(delays)))
+
+packet_count = 100000
+
+
+def fill_and_take():
+    queue = ChannelQueue()
+
+    for index in range(packet_count):
+        queue.add(index % 1000, index)
+
+    queue.take(packet_count)
+
+
+seconds = timeit(fill_and_take, number=5) / 5
+
+print("ChannelQueue add and take: {:.2f} µs per packet".format(seconds / packet_count * 10**6))
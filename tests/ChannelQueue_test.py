@@ -0,0 +1,60 @@
+from ChannelQueue import ChannelQueue
+from UDPChannel import create_packet
+from constants import DATA_MSG_FLAG
+from util import i2b
+
+bulk_id = 100
+game_id = 200
+
+
+def fill(queue, chan_id, count):
+    for counter in range(count):
+        queue.add(chan_id, (chan_id, counter))
+
+
+def test_channels_take_turns():
+    queue = ChannelQueue()
+
+    fill(queue, bulk_id, 4)
+    fill(queue, game_id, 2)
+
+    assert len(queue) == 6
+
+    assert queue.take(4) == [(bulk_id, 0), (game_id, 0), (bulk_id, 1), (game_id, 1)]
+    assert queue.take(4) == [(bulk_id, 2), (bulk_id, 3)]
+
+    assert not queue
+    assert not queue.queues
+
+
+def test_take_goes_on_with_the_next_turn():
+    queue = ChannelQueue()
+
+    fill(queue, bulk_id, 3)
+    fill(queue, game_id, 1)
+
+    assert queue.take(1) == [(bulk_id, 0)]
+    assert queue.take(2) == [(game_id, 0), (bulk_id, 1)]
+
+    fill(queue, game_id, 1)
+
+    assert queue.take(10) == [(bulk_id, 2), (game_id, 0)]
+
+
+def test_extend_iter_and_clear():
+    packets = [create_packet(chan_id, DATA_MSG_FLAG, i2b(ctr, 8), bytes(10))
+               for ctr in range(2) for chan_id in (bulk_id, game_id)]
+
+    queue = ChannelQueue()
+    queue.extend(packets)
+
+    assert list(queue.queues) == [bulk_id, game_id]
+
+    # channel by channel, the packets are not removed
+    assert list(queue) == [packets[0], packets[2], packets[1], packets[3]]
+    assert len(queue) == 4
+
+    queue.clear()
+
+    assert not queue
+    assert list(queue) == []
@@ -0,0 +1,175 @@
+import pytest
+
+from ChannelQueue import ChannelQueue
+from FlushStrategy import ThresholdFlush, TimedFlush, TimedPoolFlush, flush_strategy, THRESHOLD, TIMED, TIMED_POOL
+from constants import CHAN_ID_SIZE
+from util import i2b
+
+
+def make_packets(count, chan_id=None):
+    """Returns packets of count channels or count packets of one channel."""
+    if chan_id is None:
+        return [i2b(i, CHAN_ID_SIZE) for i in range(count)]
+
+    return [i2b(chan_id, CHAN_ID_SIZE) + i2b(i, 2) for i in range(count)]
+
+
+def store(packets):
+    queue = ChannelQueue()
+    queue.extend(packets)
+
+    return queue
+
+
+def test_threshold_flush():
+    strategy = ThresholdFlush(3)
+
+    packets = store(make_packets(7))
+
+    assert strategy.deadline() is None
+
+    selected = strategy.select(packets, 0)
+
+    assert len(selected) == 6
+    assert list(packets) == [i2b(6, 2)]
+
+    # packets are only shuffled within their group
+    assert set(selected[0:3]) == set(make_packets(3))
+    assert set(selected[3:6]) == set(make_packets(6)[3:])
+
+    assert strategy.select(packets, 0) == []
+
+
+def test_threshold_flush_keeps_order():
+    strategy = ThresholdFlush(1)
+
+    packets = store(make_packets(10))
+
+    assert strategy.select(packets, 0) == make_packets(10)
+    assert not packets
+
+
+def test_threshold_flush_limit():
+    strategy = ThresholdFlush(2, limit=5)
+
+    # a bulk channel with many packets and two channels with one each
+    packets = store(make_packets(10, chan_id=100) + make_packets(2))
+
+    selected = strategy.select(packets, 0)
+
+    # the limit is rounded down to whole groups and the channels take turns
+    assert len(selected) == 4
+    assert set(selected) == set(make_packets(2, chan_id=100) + make_packets(2))
+    assert list(packets) == make_packets(10, chan_id=100)[2:]
+
+    # complete groups were left behind, so the next flush is due right away
+    assert strategy.deadline() == 0
+
+    while packets:
+        strategy.select(packets, 1)
+
+    assert strategy.deadline() is None
+
+    with pytest.raises(ValueError):
+        ThresholdFlush(3, limit=2)
+
+
+def test_timed_flush():
+    strategy = TimedFlush(1)
+
+    start = strategy.deadline() - 1
+
+    packets = store(make_packets(5))
+
+    assert strategy.select(packets, start + 0.5) == []
+    assert len(packets) == 5
+
+    selected = strategy.select(packets, start + 1)
+
+    assert sorted(selected) == make_packets(5)
+    assert not packets
+    assert strategy.deadline() == start + 2
+
+    # after a long pause the next deadline is counted from now
+    strategy.select(packets, start + 10)
+
+    assert strategy.deadline() == start + 11
+
+
+def test_timed_pool_flush():
+    strategy = TimedPoolFlush(1, 3)
+
+    now = strategy.deadline()
+
+    packets = store(make_packets(2))
+
+    assert strategy.select(packets, now) == []
+    assert len(packets) == 2
+
+    packets = store(make_packets(10))
+
+    selected = strategy.select(packets, now + 1)
+
+    assert len(selected) == 7
+    assert len(packets) == 3
+    assert sorted(selected + list(packets)) == make_packets(10)
+
+
+def test_timed_pool_flush_keeps_random_packets():
+    kept_back = set()
+
+    for _ in range(50):
+        strategy = TimedPoolFlush(1, 1)
+
+        packets = store(make_packets(2, chan_id=100) + make_packets(2))
+
+        strategy.select(packets, strategy.deadline())
+
+        kept_back.update(packets)
+
+    # any packet may be kept back, not only the newest of the fullest channel
+    assert kept_back == set(make_packets(2, chan_id=100) + make_packets(2))
+
+    # with a limit the pool is taken from the packets the channels give first
+    strategy = TimedPoolFlush(1, 1, limit=2)
+
+    packets = store(make_packets(10, chan_id=100) + make_packets(2))
+
+    selected = strategy.select(packets, strategy.deadline())
+
+    assert len(selected) == 2
+    assert len(packets) == 10
+    assert set(selected) < set(make_packets(2, chan_id=100)[:1] + make_packets(2))
+
+
+def test_timed_flush_limit():
+    strategy = TimedFlush(1, limit=3)
+
+    now = strategy.deadline()
+
+    packets = store(make_packets(5, chan_id=100) + make_packets(2))
+
+    selected = strategy.select(packets, now)
+
+    assert sorted(selected) == sorted(make_packets(1, chan_id=100) + make_packets(2))
+    assert len(packets) == 4
+
+
+def test_flush_strategy():
+    assert isinstance(flush_strategy(THRESHOLD, 2, 1, 0), ThresholdFlush)
+    assert isinstance(flush_strategy(TIMED, 2, 1, 0), TimedFlush)
+    assert isinstance(flush_strategy(TIMED_POOL, 2, 1, 0), TimedPoolFlush)
+
+    with pytest.raises(ValueError):
+        flush_strategy("unknown", 2, 1, 0)
+
+    with pytest.raises(ValueError):
+        ThresholdFlush(0)
+
+    with pytest.raises(ValueError):
+        TimedFlush(0)
+
+    with pytest.raises(ValueError):
+        TimedFlush(1, limit=0)
+
+    assert flush_strategy(TIMED_POOL, 2, 1, 0, 10).limit == 10
@@ -49,14 +49,14 @@ def test_replay_detection_too_small():
     decryptor = LinkDecryptor(link_key)
 
     first_encrypted = encryptor.encrypt(msg_type + i2b(chan_id, CHAN_ID_SIZE) + msg_ctr + payload)
-    first_link_counter = encryptor.counter
+    first_link_counter = int(encryptor.counter)
 
     for _ in range(REPLAY_WINDOW_SIZE + 1):
         encrypted = encryptor.encrypt(msg_type + i2b(chan_id, CHAN_ID_SIZE) + msg_ctr + payload)
 
         decryptor.decrypt(encrypted)
 
-    assert first_link_counter not in decryptor.replay_detector.replay_window
+    assert first_link_counter in decryptor.replay_detector
 
     try:
         decryptor.decrypt(first_encrypted)
@@ -0,0 +1,68 @@
+import logging
+from io import StringIO
+
+import pytest
+
+from Log import LogWriter, SampleFilter, parse_sample_rates
+
+
+class CountingArg:
+    def __init__(self):
+        self.formatted = 0
+
+    def __str__(self):
+        self.formatted += 1
+
+        return "arg"
+
+
+def make_logger(name, writer, level):
+    logger = logging.getLogger(name)
+    logger.propagate = False
+    logger.setLevel(level)
+    logger.addHandler(writer.handler)
+
+    return logger
+
+
+def test_writer_formats_in_background():
+    stream = StringIO()
+    writer = LogWriter(stream)
+    logger = make_logger("Log_test.writer", writer, logging.INFO)
+
+    arg = CountingArg()
+
+    writer.start()
+
+    try:
+        logger.debug("%s not logged", arg)
+        logger.info("%s logged", arg)
+    finally:
+        writer.stop()
+        logger.removeHandler(writer.handler)
+
+    lines = stream.getvalue().splitlines()
+
+    assert len(lines) == 1
+    assert lines[0].endswith("INFO arg logged")
+
+    # the debug message was never formatted
+    assert arg.formatted == 1
+
+
+def test_sample_filter():
+    sample_filter = SampleFilter({"sampled": 3})
+
+    def passed(name):
+        return sample_filter.filter(logging.LogRecord(name, logging.INFO, "", 0, "message", None, None))
+
+    assert [passed("sampled") for _ in range(7)] == [True, False, False, True, False, False, True]
+    assert all(passed("other") for _ in range(5))
+
+
+def test_parse_sample_rates():
+    assert parse_sample_rates(["UDPChannel=100", "Mix=2"]) == {"UDPChannel": 100, "Mix": 2}
+
+    for value in ["UDPChannel", "=3", "Mix=0", "Mix=x"]:
+        with pytest.raises(ValueError):
+            parse_sample_rates([value])
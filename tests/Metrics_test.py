@@ -0,0 +1,92 @@
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import pytest
+
+from Metrics import MetricsRegistry, MetricsServer
+
+
+def test_exposition():
+    registry = MetricsRegistry()
+
+    requests = registry.counter("packets_total", "Packets.", {"direction": "request"})
+    responses = registry.counter("packets_total", "Packets.", {"direction": "response"})
+
+    assert registry.counter("packets_total", "Packets.", {"direction": "request"}) is requests
+
+    requests.inc()
+    requests.inc(2)
+    responses.inc()
+
+    queue = []
+
+    registry.gauge("queued", "Queued packets.", function=lambda: len(queue))
+
+    queue.extend([b"", b""])
+
+    histogram = registry.histogram("seconds", "Durations.", buckets=[0.1, 1])
+
+    for value in [0.05, 0.5, 0.5, 5]:
+        histogram.observe(value)
+
+    assert registry.exposition().splitlines() == [
+        "# HELP packets_total Packets.",
+        "# TYPE packets_total counter",
+        'packets_total{direction="request"} 3',
+        'packets_total{direction="response"} 1',
+        "# HELP queued Queued packets.",
+        "# TYPE queued gauge",
+        "queued 2",
+        "# HELP seconds Durations.",
+        "# TYPE seconds histogram",
+        'seconds_bucket{le="0.1"} 1',
+        'seconds_bucket{le="1"} 3',
+        'seconds_bucket{le="+Inf"} 4',
+        "seconds_sum 6.05",
+        "seconds_count 4",
+    ]
+
+
+def test_types_can_not_be_mixed():
+    registry = MetricsRegistry()
+
+    registry.counter("packets", "Packets.")
+
+    with pytest.raises(ValueError):
+        registry.gauge("packets", "Packets.", {"direction": "request"})
+
+
+def test_drain_and_merge():
+    worker = MetricsRegistry().histogram("seconds", "Durations.", buckets=[0.1, 1])
+    histogram = MetricsRegistry().histogram("seconds", "Durations.", buckets=[0.1, 1])
+
+    worker.observe(0.05)
+    worker.observe(2)
+
+    histogram.observe(0.5)
+    histogram.merge(*worker.drain())
+
+    assert (histogram.counts, histogram.sum, histogram.count) == ([1, 1, 1], 2.55, 3)
+    assert (worker.counts, worker.sum, worker.count) == ([0, 0, 0], 0, 0)
+
+
+def test_server():
+    registry = MetricsRegistry()
+    registry.counter("packets_total", "Packets.").inc()
+
+    process_registry = MetricsRegistry()
+    process_registry.histogram("seconds", "Durations.")
+
+    server = MetricsServer([process_registry, registry], ("127.0.0.1", 0))
+    server.start()
+
+    try:
+        url = "http://{}:{}".format(*server.addr)
+
+        with urlopen(url + "/metrics", timeout=5) as response:
+            assert response.read().decode() == process_registry.exposition() + registry.exposition()
+
+        with pytest.raises(HTTPError):
+            urlopen(url + "/other", timeout=5)
+    finally:
+        server.stop()
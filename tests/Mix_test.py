@@ -0,0 +1,175 @@
+from socket import socket, AF_INET, SOCK_DGRAM as UDP
+
+from LinkEncryption import LinkDecryptor, LinkEncryptor
+from Mix import Mix
+from MixMessage import DATA_PACKET_SIZE
+from MsgV3 import gen_priv_key, get_pub_key
+from PacketDrops import REPLAY, AUTH_FAILURE, UNKNOWN_CHANNEL, MALFORMED
+from UDPChannel import EntryChannels, create_packet
+from constants import DATA_MSG_FLAG, SYM_KEY_LEN, UDP_MTU, CHAN_INIT_MSG_FLAG, MIX_COUNT, CHANNEL_TIMEOUT_SEC
+from util import i2b, get_random_bytes
+
+local_addr = ("127.0.0.1", 0)
+
+
+def make_mix(batch_size):
+    next_hop = socket(AF_INET, UDP)
+    next_hop.bind(local_addr)
+    next_hop.settimeout(1)
+
+    mix = Mix(gen_priv_key(), local_addr, next_hop.getsockname(), batch_size=batch_size)
+
+    return mix, next_hop
+
+
+def test_receive_batch():
+    batch_size = 5
+
+    mix, next_hop = make_mix(batch_size)
+    mix_addr = mix.incoming.getsockname()
+
+    assert mix.receive_batch() == []
+
+    sender = socket(AF_INET, UDP)
+    sender.bind(local_addr)
+
+    for i in range(batch_size + 2):
+        sender.sendto(i2b(i, 1), mix_addr)
+
+    mix.sock_sel.select(timeout=1)
+
+    first_batch = mix.receive_batch()
+    second_batch = mix.receive_batch()
+
+    assert len(first_batch) == batch_size
+    assert len(second_batch) == 2
+
+    for packet, addr in first_batch + second_batch:
+        assert addr == sender.getsockname()
+
+
+def test_send_requests():
+    mix, next_hop = make_mix(1)
+
+    packets = [create_packet(i, DATA_MSG_FLAG, bytes(4), get_random_bytes(100)) for i in range(10)]
+
+    mix.channels.requests.extend(packets)
+
+    mix.send_requests()
+
+    assert not mix.channels.requests
+
+    link_decryptor = LinkDecryptor(bytes(SYM_KEY_LEN))
+
+    received = set()
+
+    for _ in packets:
+        chan_id, _, _, _ = link_decryptor.decrypt(next_hop.recv(UDP_MTU))
+
+        received.add(chan_id)
+
+    assert received == set(range(10))
+
+
+def test_bad_packets_are_dropped():
+    mix, next_hop = make_mix(1)
+
+    client_addr = ("127.0.0.1", 12345)
+
+    request_encryptor = LinkEncryptor(bytes(SYM_KEY_LEN))
+    response_encryptor = LinkEncryptor(bytes(SYM_KEY_LEN))
+
+    unknown_data = request_encryptor.encrypt(create_packet(1, DATA_MSG_FLAG, i2b(1, 4), bytes(100)))
+    bad_init = request_encryptor.encrypt(create_packet(2, CHAN_INIT_MSG_FLAG, i2b(1, 4),
+                                                       get_random_bytes(DATA_PACKET_SIZE)))
+    data_after_bad_init = request_encryptor.encrypt(create_packet(2, DATA_MSG_FLAG, i2b(2, 4), bytes(100)))
+    unknown_response = response_encryptor.encrypt(create_packet(3, DATA_MSG_FLAG, i2b(1, 4), bytes(100)))
+
+    mix.handle_batch([(get_random_bytes(100), client_addr), (unknown_data, client_addr),
+                      (unknown_data, client_addr), (bad_init, client_addr), (data_after_bad_init, client_addr),
+                      (unknown_response, next_hop.getsockname())])
+
+    assert mix.drops.counts == {REPLAY: 1, AUTH_FAILURE: 1, UNKNOWN_CHANNEL: 3, MALFORMED: 1}
+    assert not mix.channels.requests
+
+
+def test_mixes_keep_their_own_channels():
+    private_keys = [gen_priv_key() for _ in range(MIX_COUNT)]
+    public_keys = [get_pub_key(private_key) for private_key in private_keys]
+
+    first_mix, _ = make_mix(1)
+    second_mix, _ = make_mix(1)
+
+    # the channel is made with the key of the first mix
+    first_mix.priv_comp = private_keys[0]
+
+    client_addr = ("127.0.0.1", 12345)
+
+    link_encryptor = LinkEncryptor(bytes(SYM_KEY_LEN))
+
+    channel = EntryChannels().create(client_addr, ("127.0.0.2", 23456), public_keys)
+
+    first_mix.handle_batch([(link_encryptor.encrypt(channel.get_message()), client_addr)])
+
+    channel.allowed_to_send = True
+
+    data = link_encryptor.encrypt(channel.get_message())
+
+    first_mix.handle_batch([(data, client_addr)])
+    second_mix.handle_batch([(data, client_addr)])
+
+    assert list(first_mix.channels.table_in) == [channel.chan_id]
+    assert not second_mix.channels.table_in
+
+    assert len(first_mix.channels.requests) == 2
+    assert second_mix.drops[UNKNOWN_CHANNEL] == 1
+
+
+def test_mixes_keep_their_own_metrics():
+    first_mix, _ = make_mix(1)
+    second_mix, _ = make_mix(1)
+
+    second_mix.handle_batch([(get_random_bytes(100), ("127.0.0.1", 12345))])
+
+    first_lines = first_mix.metrics.exposition().splitlines()
+    second_lines = second_mix.metrics.exposition().splitlines()
+
+    assert 'pymix_packets_received_total{direction="request"} 0' in first_lines
+    assert 'pymix_packets_received_total{direction="request"} 1' in second_lines
+
+    assert 'pymix_packets_dropped_total{reason="auth_failure"} 0' in first_lines
+    assert 'pymix_packets_dropped_total{reason="auth_failure"} 1' in second_lines
+
+
+def test_init_replaces_timed_out_channel():
+    private_keys = [gen_priv_key() for _ in range(MIX_COUNT)]
+    public_keys = [get_pub_key(private_key) for private_key in private_keys]
+
+    mix, _ = make_mix(1)
+    mix.priv_comp = private_keys[0]
+
+    client_addr = ("127.0.0.1", 12345)
+
+    link_encryptor = LinkEncryptor(bytes(SYM_KEY_LEN))
+
+    old_channel = EntryChannels().create(client_addr, ("127.0.0.2", 23456), public_keys)
+
+    mix.handle_batch([(link_encryptor.encrypt(old_channel.get_message()), client_addr)])
+
+    stale = mix.channels.table_in[old_channel.chan_id]
+
+    # timed out, but not removed yet
+    stale.last_interaction -= CHANNEL_TIMEOUT_SEC + 1
+
+    # a new channel of the entry point got the same id
+    new_channel = EntryChannels().create(client_addr, ("127.0.0.3", 34567), public_keys)
+    new_channel.chan_id = old_channel.chan_id
+
+    mix.handle_batch([(link_encryptor.encrypt(new_channel.get_message()), client_addr)])
+
+    channel = mix.channels.table_in[old_channel.chan_id]
+
+    assert channel is not stale
+    assert channel.initialized
+    assert stale.out_chan_id not in mix.channels.table_out
+    assert mix.drops[REPLAY] == 0
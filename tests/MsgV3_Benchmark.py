@@ -0,0 +1,122 @@
+#!/usr/bin/python3
+"""Compares the time it takes to create and process channel init messages,
+with the counter blind folded into the secret of every key, against the
+former way of blinding every key in a separate exponentiation. Both ways
+have to produce the same messages."""
+from timeit import timeit
+
+import MsgV3
+from MsgV3 import gen_init_msg, process, params, gen_blind, cut_init_message
+from constants import CTR_PREFIX_LEN, NONCE_LEN, MIX_COUNT, SYM_KEY_LEN
+from util import ctr_cipher, cut, i2b
+
+runs = 200
+
+
+def separate_gen_init_msg(pub_mix_keys, message_counter, request_channel_keys, response_channel_keys, payload,
+                          x_msg_1):
+    ctr_blind = gen_blind(i2b(message_counter, CTR_PREFIX_LEN) + bytes(NONCE_LEN - CTR_PREFIX_LEN))
+
+    y_mix_1, y_mix_2, y_mix_3 = pub_mix_keys
+
+    y_msg_1 = params.group.expon_base([x_msg_1])
+    k_disp_1 = params.group.expon(y_mix_1, [x_msg_1])
+    k_disp_1 = params.group.expon(k_disp_1, [ctr_blind])
+    blind_1 = gen_blind(k_disp_1)
+
+    x_msg_2 = params.group.expon(x_msg_1, [blind_1])
+    k_disp_2 = params.group.expon(y_mix_2, [x_msg_2])
+    k_disp_2 = params.group.expon(k_disp_2, [ctr_blind])
+    blind_2 = gen_blind(k_disp_2)
+
+    x_msg_3 = params.group.expon(x_msg_2, [blind_2])
+    k_disp_3 = params.group.expon(y_mix_3, [x_msg_3])
+    k_disp_3 = params.group.expon(k_disp_3, [ctr_blind])
+
+    chan_key_onion = MsgV3.random_bytes(MIX_COUNT * 2 * SYM_KEY_LEN)
+    payload_onion = payload
+
+    for k_disp, k_chan_req, k_chan_res in zip([k_disp_3, k_disp_2, k_disp_1], reversed(request_channel_keys),
+                                              reversed(response_channel_keys)):
+        cipher = ctr_cipher(params.get_aes_key(k_disp), message_counter)
+
+        chan_key_onion = cipher.encrypt(k_chan_req + k_chan_res + chan_key_onion[0:-2 * SYM_KEY_LEN])
+
+        cipher = ctr_cipher(params.get_aes_key(k_disp), message_counter)
+
+        payload_onion = cipher.encrypt(payload_onion)
+
+    return y_msg_1.export() + chan_key_onion + payload_onion
+
+
+def separate_process(priv_mix_key, message_counter, message):
+    y_msg, chan_key_onion, payload_onion = cut_init_message(message)
+
+    ctr_blind = gen_blind(i2b(message_counter, CTR_PREFIX_LEN) + bytes(NONCE_LEN - CTR_PREFIX_LEN))
+
+    k_disp = params.group.expon(y_msg, [priv_mix_key])
+    k_disp = params.group.expon(k_disp, [ctr_blind])
+
+    cipher = ctr_cipher(params.get_aes_key(k_disp), message_counter)
+
+    k_chan_req, k_chan_res, chan_key_onion = cut(cipher.decrypt(chan_key_onion), SYM_KEY_LEN, SYM_KEY_LEN)
+
+    chan_key_onion += MsgV3.gen_sym_key()
+    chan_key_onion += MsgV3.gen_sym_key()
+
+    cipher = ctr_cipher(params.get_aes_key(k_disp), message_counter)
+
+    payload_onion = cipher.decrypt(payload_onion)
+
+    blind_1 = gen_blind(k_disp)
+    y_msg_2 = params.group.expon(y_msg, [blind_1])
+
+    message = y_msg_2.export() + chan_key_onion + payload_onion
+
+    return k_chan_req, k_chan_res, payload_onion, message
+
+
+# make the random parts of the messages predictable, so they can be compared
+MsgV3.random_bytes = lambda length: bytes(length)
+MsgV3.gen_sym_key = lambda: bytes(SYM_KEY_LEN)
+
+priv_keys = [params.group.gensecret() for _ in range(MIX_COUNT)]
+pub_keys = [params.group.expon_base([priv_key]) for priv_key in priv_keys]
+
+req_keys = [bytes([i]) * SYM_KEY_LEN for i in range(MIX_COUNT)]
+res_keys = [bytes([i + MIX_COUNT]) * SYM_KEY_LEN for i in range(MIX_COUNT)]
+
+payload = bytes(200)
+
+for message_counter in range(1, 21):
+    x_msg_1 = params.group.gensecret()
+
+    folded = gen_init_msg(pub_keys, message_counter, req_keys, res_keys, payload, x_msg_1)
+    separate = separate_gen_init_msg(pub_keys, message_counter, req_keys, res_keys, payload, x_msg_1)
+
+    assert folded == separate, "Created init messages differ."
+
+    for priv_key in priv_keys:
+        folded_result = process(priv_key, message_counter, folded)
+        separate_result = separate_process(priv_key, message_counter, separate)
+
+        assert folded_result == separate_result, "Processed init messages differ."
+
+        folded, separate = folded_result[-1], separate_result[-1]
+
+print("Folded and separate exponentiations produce the same messages.")
+
+x_msg_1 = params.group.gensecret()
+init_msg = gen_init_msg(pub_keys, 1, req_keys, res_keys, payload, x_msg_1)
+
+out_format = "{:<20} separate: {:8.1f}us, folded: {:8.1f}us"
+
+separate_time = timeit(lambda: separate_gen_init_msg(pub_keys, 1, req_keys, res_keys, payload, x_msg_1), number=runs)
+folded_time = timeit(lambda: gen_init_msg(pub_keys, 1, req_keys, res_keys, payload, x_msg_1), number=runs)
+
+print(out_format.format("gen_init_msg", separate_time / runs * 10**6, folded_time / runs * 10**6))
+
+separate_time = timeit(lambda: separate_process(priv_keys[0], 1, init_msg), number=runs)
+folded_time = timeit(lambda: process(priv_keys[0], 1, init_msg), number=runs)
+
+print(out_format.format("process", separate_time / runs * 10**6, folded_time / runs * 10**6))
@@ -1,5 +1,14 @@
 # MsgV3 format
-from MsgV3 import process, gen_init_msg, params
+from hashlib import sha256
+from os.path import dirname, abspath
+from subprocess import run
+from sys import executable
+
+from petlib.bn import Bn
+
+import MsgV3
+from MsgV3 import process, gen_init_msg, params, ElementCache, get_init_payload
+from constants import GROUP_ELEMENT_LEN, SYM_KEY_LEN
 from util import get_random_bytes, gen_sym_key
 
 
@@ -38,3 +47,121 @@ def test_gen_init_msg():
         assert req_chan_keys == proc_req_chan_keys
         assert res_chan_keys == proc_res_chan_keys
         assert payload == proc_payload
+
+
+def test_repeated_init_uses_element_cache():
+    priv_keys = [params.group.gensecret() for _ in range(3)]
+    pub_keys = [params.group.expon_base([priv_key]) for priv_key in priv_keys]
+
+    req_chan_keys = [gen_sym_key(), gen_sym_key(), gen_sym_key()]
+    res_chan_keys = [gen_sym_key(), gen_sym_key(), gen_sym_key()]
+
+    x_msg_1 = params.group.gensecret()
+
+    cache = ElementCache()
+
+    channel_id = 1234
+
+    for msg_ctr in range(1, 6):
+        payload = get_random_bytes(100)
+
+        message = gen_init_msg(pub_keys, msg_ctr, req_chan_keys, res_chan_keys, payload, x_msg_1)
+
+        # cached and uncached processing have the same result
+        cached = process(priv_keys[0], msg_ctr, message, cache, channel_id)
+        uncached = process(priv_keys[0], msg_ctr, message)
+
+        assert cached[:3] == uncached[:3]
+        assert cached[3][:GROUP_ELEMENT_LEN] == uncached[3][:GROUP_ELEMENT_LEN]
+
+        message = cached[3]
+
+        for priv_key in priv_keys[1:]:
+            _, _, proc_payload, message = process(priv_key, msg_ctr, message)
+
+        assert proc_payload == payload
+
+    assert cache.misses == 1
+    assert cache.hits == 4
+
+
+def test_element_cache_is_bounded():
+    cache = ElementCache(size=2)
+
+    elements = [params.group.expon_base([params.group.gensecret()]).export() for _ in range(3)]
+
+    for element in elements:
+        cache.get(1, element)
+
+    assert len(cache.elements) == 2
+    assert (1, elements[0]) not in cache.elements
+
+
+def test_wire_format_is_unchanged(monkeypatch):
+    # hash of an init message and its processed forms at every mix, as made
+    # by the implementation with separate exponentiations for the counter blind
+    expected = "3c12e821be28e26c40f0d28651846634dce6519ba442e8ef70179f86e4d18cbe"
+
+    monkeypatch.setattr(MsgV3, "random_bytes", lambda length: bytes(length))
+    monkeypatch.setattr(MsgV3, "gen_sym_key", lambda: bytes(SYM_KEY_LEN))
+
+    order = params.group.G.order()
+
+    priv_keys = [Bn.from_binary(bytes([i]) * 28) % order for i in range(1, 4)]
+    pub_keys = [params.group.expon_base([priv_key]) for priv_key in priv_keys]
+
+    req_chan_keys = [bytes([i]) * SYM_KEY_LEN for i in range(1, 4)]
+    res_chan_keys = [bytes([i]) * SYM_KEY_LEN for i in range(4, 7)]
+
+    x_msg_1 = Bn.from_binary(bytes([7]) * 28) % order
+
+    message = gen_init_msg(pub_keys, 5, req_chan_keys, res_chan_keys, b"payload", x_msg_1)
+
+    messages = [message]
+
+    for priv_key in priv_keys:
+        _, _, _, message = process(priv_key, 5, message)
+
+        messages.append(message)
+
+    assert sha256(b"".join(messages)).hexdigest() == expected
+
+
+def test_given_group_element_is_used(monkeypatch):
+    monkeypatch.setattr(MsgV3, "random_bytes", lambda length: bytes(length))
+
+    pub_keys = [params.group.expon_base([params.group.gensecret()]) for _ in range(3)]
+    chan_keys = [gen_sym_key(), gen_sym_key(), gen_sym_key()]
+
+    x_msg_1 = params.group.gensecret()
+    group_element = params.group.expon_base([x_msg_1]).export()
+
+    computed = gen_init_msg(pub_keys, 3, chan_keys, chan_keys, b"payload", x_msg_1)
+    given = gen_init_msg(pub_keys, 3, chan_keys, chan_keys, b"payload", x_msg_1, group_element)
+
+    assert computed == given
+    assert given.startswith(group_element)
+
+
+def test_get_init_payload():
+    priv_keys = [params.group.gensecret() for _ in range(3)]
+    pub_keys = [params.group.expon_base([priv_key]) for priv_key in priv_keys]
+
+    chan_keys = [gen_sym_key(), gen_sym_key(), gen_sym_key()]
+
+    payload = get_random_bytes(100)
+
+    message = gen_init_msg(pub_keys, 1, chan_keys, chan_keys, payload)
+
+    for priv_key in priv_keys:
+        _, _, _, message = process(priv_key, 1, message)
+
+    assert get_init_payload(message) == payload
+
+
+def test_exit_point_does_without_petlib():
+    project_dir = dirname(dirname(abspath(__file__)))
+
+    check = "import sys, ExitPoint; assert 'petlib' not in sys.modules and 'sphinxmix' not in sys.modules"
+
+    run([executable, "-c", check], cwd=project_dir, check=True)
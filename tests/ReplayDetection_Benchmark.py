@@ -0,0 +1,89 @@
+#!/usr/bin/python3
+"""Compares the time it takes to check counter values with the bitmap based
+ReplayDetector against the former list based one, for in order and for
+reordered counter values. Both have to detect the same replays, as long as the
+reordering stays within the window."""
+from random import Random
+from timeit import timeit
+
+from ReplayDetection import ReplayDetector, ReplayDetectedError
+from constants import CTR_PREFIX_LEN
+from util import i2b
+
+runs = 5
+counter_count = 10000
+
+
+class ListReplayDetector:
+    def __init__(self, window_size, start=0):
+        self.replay_window = [start] * window_size
+
+    def check_replay_window(self, ctr):
+        if ctr in self:
+            raise ReplayDetectedError(
+                "Counter value {}/{} was too old or already seen.".format(ctr, i2b(ctr, CTR_PREFIX_LEN)))
+
+        self.replay_window.append(ctr)
+
+        # remove the smallest element
+        self.replay_window.sort()
+        self.replay_window.pop(0)
+
+        return True
+
+    def __contains__(self, ctr):
+        return ctr in self.replay_window or ctr < self.replay_window[0]
+
+
+def check_all(detector_class, window_size, counters):
+    detector = detector_class(window_size)
+
+    replays = 0
+
+    for counter in counters:
+        try:
+            detector.check_replay_window(counter)
+        except ReplayDetectedError:
+            replays += 1
+
+    return replays
+
+
+def reordered(counters, distance, seed=0):
+    """Moves every counter value up to distance places from its position."""
+    random = Random(seed)
+
+    return [counter for _, counter in sorted((index + random.randint(0, distance), counter)
+                                             for index, counter in enumerate(counters))]
+
+
+in_order = list(range(1, counter_count + 1))
+
+# every tenth counter value is replayed right after the original
+with_replays = [counter for counter in in_order for _ in range(1 if counter % 10 else 2)]
+
+scenarios = [("in order", in_order), ("replays", with_replays), ("reordered by 8", reordered(in_order, 8)),
+             ("reordered by 64", reordered(in_order, 64))]
+
+# the list forgets values differently, once they leave the window, so only
+# compare windows bigger than the reordering
+for window_size in [100, 1000]:
+    for name, counters in scenarios:
+        list_replays = check_all(ListReplayDetector, window_size, counters)
+        bitmap_replays = check_all(ReplayDetector, window_size, counters)
+
+        assert list_replays == bitmap_replays, "Detectors disagree on {}, window {}.".format(name, window_size)
+
+print("List and bitmap detectors agree on the replays within their windows.")
+
+out_format = "window {:>5}, {:<16} list: {:8.2f}us, bitmap: {:8.2f}us, dropped: {:>5} / {:>5}"
+
+for window_size in [10, 100, 1000, 4096]:
+    for name, counters in scenarios:
+        list_time = timeit(lambda: check_all(ListReplayDetector, window_size, counters), number=runs)
+        bitmap_time = timeit(lambda: check_all(ReplayDetector, window_size, counters), number=runs)
+
+        print(out_format.format(window_size, name, list_time / runs / len(counters) * 10**6,
+                                bitmap_time / runs / len(counters) * 10**6,
+                                check_all(ListReplayDetector, window_size, counters),
+                                check_all(ReplayDetector, window_size, counters)))
@@ -33,3 +33,38 @@ def test_replay_detection():
         assert True
     except ReplayDetectedError:
         assert False
+
+
+def test_out_of_order():
+    detector = ReplayDetector(window_size=1000, start=0)
+
+    # every counter value arrives once, but far from its order
+    counters = [counter for start in range(500, 0, -100) for counter in range(start, start + 100)]
+
+    for counter in counters:
+        detector.check_replay_window(counter)
+
+    for counter in [0] + counters:
+        assert counter in detector
+
+    assert 600 not in detector
+
+    # a jump beyond the window forgets everything before it
+    detector.check_replay_window(5000)
+
+    assert 4000 in detector
+    assert 4001 not in detector
+    assert 599 in detector
+
+
+def test_in_order_sets_no_bits():
+    detector = ReplayDetector(start=5)
+
+    for counter in range(6, 2 * REPLAY_WINDOW_SIZE):
+        detector.check_replay_window(counter)
+
+    assert detector.missing == 0
+
+    # values before the start count as seen
+    assert 3 in detector
+    assert 2 * REPLAY_WINDOW_SIZE not in detector
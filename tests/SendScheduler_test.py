@@ -0,0 +1,121 @@
+import pytest
+
+from MsgV3 import gen_priv_key, get_pub_key
+from SendScheduler import RoundRobinScheduler, DeficitRoundRobinScheduler, send_scheduler, parse_weights, \
+    ROUND_ROBIN, DEFICIT_ROUND_ROBIN
+from UDPChannel import EntryChannels
+from constants import MIX_COUNT, DATA_FRAG_PAYLOAD_SIZE
+
+client_addr = ("127.0.0.1", 12345)
+bulk_addr = ("127.0.0.2", 80)
+game_addr = ("127.0.0.3", 27015)
+
+public_keys = [get_pub_key(gen_priv_key()) for _ in range(MIX_COUNT)]
+
+
+def make_channel(channels, dest_addr, fragment_count):
+    channel = channels.create(client_addr, dest_addr, public_keys)
+    channel.allowed_to_send = True
+
+    channel.request(bytes(DATA_FRAG_PAYLOAD_SIZE * fragment_count))
+
+    return channel
+
+
+def send_order(scheduler, limit=None):
+    order = []
+
+    for channel in scheduler.take(limit):
+        channel.get_message()
+
+        order.append(channel.dest_addr)
+
+    return order
+
+
+def test_round_robin():
+    channels = EntryChannels()
+    scheduler = RoundRobinScheduler()
+
+    scheduler.add(make_channel(channels, bulk_addr, 4))
+
+    game = make_channel(channels, game_addr, 1)
+
+    scheduler.add(game)
+    scheduler.add(game)
+
+    assert send_order(scheduler, 3) == [bulk_addr, game_addr, bulk_addr]
+    assert len(scheduler) == 1
+
+    assert send_order(scheduler) == [bulk_addr] * 2
+    assert not scheduler
+
+
+def test_deficit_round_robin():
+    channels = EntryChannels()
+    scheduler = DeficitRoundRobinScheduler({bulk_addr: 2})
+
+    scheduler.add(make_channel(channels, bulk_addr, 5))
+    scheduler.add(make_channel(channels, game_addr, 2))
+
+    # the limit cuts a turn short, the next call finishes it
+    assert send_order(scheduler, 1) == [bulk_addr]
+    assert send_order(scheduler) == [bulk_addr, game_addr, bulk_addr, bulk_addr, game_addr, bulk_addr]
+
+    assert not scheduler.deficits
+
+
+def test_weights_below_one():
+    channels = EntryChannels()
+    scheduler = DeficitRoundRobinScheduler({bulk_addr: 0.5})
+
+    scheduler.add(make_channel(channels, bulk_addr, 2))
+    scheduler.add(make_channel(channels, game_addr, 3))
+
+    assert send_order(scheduler) == [game_addr, bulk_addr, game_addr, game_addr, bulk_addr]
+
+
+def test_tiny_weights():
+    channels = EntryChannels()
+
+    # without skipping the idle rounds, this takes a billion turns
+    scheduler = DeficitRoundRobinScheduler({bulk_addr: 10**-9, game_addr: 2 * 10**-9})
+
+    scheduler.add(make_channel(channels, bulk_addr, 2))
+    scheduler.add(make_channel(channels, game_addr, 2))
+
+    order = send_order(scheduler)
+
+    assert order[0] == game_addr
+    assert sorted(order) == [bulk_addr, bulk_addr, game_addr, game_addr]
+
+
+def test_timed_out_channels_are_skipped():
+    channels = EntryChannels()
+    scheduler = RoundRobinScheduler()
+
+    bulk = make_channel(channels, bulk_addr, 2)
+
+    scheduler.add(bulk)
+    scheduler.add(make_channel(channels, game_addr, 1))
+
+    del channels.table[bulk.chan_id]
+
+    assert send_order(scheduler) == [game_addr]
+    assert not scheduler.queued
+
+
+def test_send_scheduler():
+    weights = parse_weights(["127.0.0.2:80=2", "127.0.0.3:27015=0.5"])
+
+    assert weights == {bulk_addr: 2, game_addr: 0.5}
+
+    assert isinstance(send_scheduler(ROUND_ROBIN), RoundRobinScheduler)
+    assert send_scheduler(DEFICIT_ROUND_ROBIN, weights).weights == weights
+
+    with pytest.raises(ValueError):
+        send_scheduler("fifo")
+
+    for bad_weight in ["127.0.0.2:80=0", "127.0.0.2=1", "127.0.0.2:80", "127.0.0.2:80=x"]:
+        with pytest.raises(ValueError):
+            parse_weights([bad_weight])
@@ -0,0 +1,74 @@
+from LinkEncryption import LinkEncryptor, LinkDecryptor
+from MsgV3 import gen_priv_key, get_pub_key
+from ShardedMix import ShardedMix
+from UDPChannel import EntryChannels, MidChannels
+from constants import MIX_COUNT, SYM_KEY_LEN, DATA_MSG_FLAG, CHAN_INIT_MSG_FLAG
+
+local_addr = ("127.0.0.1", 0)
+client_addr = ("127.0.0.1", 12345)
+next_addr = ("127.0.0.1", 12346)
+dest_addr = ("127.0.0.2", 23456)
+
+worker_count = 3
+
+
+def test_channels_are_sharded():
+    private_keys = [gen_priv_key() for _ in range(MIX_COUNT)]
+    public_keys = [get_pub_key(private_key) for private_key in private_keys]
+
+    mix = ShardedMix(private_keys[0], local_addr, next_addr, worker_count=worker_count)
+
+    link_encryptor = LinkEncryptor(bytes(SYM_KEY_LEN))
+    link_decryptor = LinkDecryptor(bytes(SYM_KEY_LEN))
+
+    try:
+        channels = [EntryChannels().create(client_addr, dest_addr, public_keys) for _ in range(10)]
+
+        batch = [(link_encryptor.encrypt(channel.get_message()), client_addr) for channel in channels]
+
+        mix.handle_batch(batch)
+
+        assert len(mix.channels.requests) == len(channels)
+
+        out_ids = dict()
+
+        for packet in mix.channels.requests:
+            out_id, _, _, msg_type = link_decryptor.decrypt(link_encryptor.encrypt(packet))
+
+            assert msg_type == CHAN_INIT_MSG_FLAG
+
+            out_ids[out_id % worker_count] = out_ids.get(out_id % worker_count, 0) + 1
+
+        expected = dict()
+
+        for channel in channels:
+            expected[channel.chan_id % worker_count] = expected.get(channel.chan_id % worker_count, 0) + 1
+
+        assert out_ids == expected
+
+        # reported by the workers
+        assert 'pymix_channels {}'.format(len(channels)) in mix.metrics.exposition().splitlines()
+
+        mix.channels.requests.clear()
+
+        layer_timings = MidChannels.layer_time.count
+
+        # data messages reach the worker, that initialized the channel
+        for channel in channels:
+            channel.allowed_to_send = True
+
+        batch = [(link_encryptor.encrypt(channel.get_message()), client_addr) for channel in channels]
+
+        mix.handle_batch(batch)
+
+        assert len(mix.channels.requests) == len(channels)
+
+        # one layer batch per worker, that has channels
+        assert MidChannels.layer_time.count == layer_timings + len(expected)
+
+        for packet in mix.channels.requests:
+            _, _, _, msg_type = link_decryptor.decrypt(link_encryptor.encrypt(packet))
+
+            assert msg_type == DATA_MSG_FLAG
+    finally:
+        mix.stop()
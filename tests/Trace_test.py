@@ -0,0 +1,113 @@
+from Trace import TraceRing, read_trace, RECEIVED, CRYPTED, QUEUED, DEQUEUED, SENT, CHANNEL, REQUEST, RESPONSE
+from TraceAnalyzer import Hop, load_hops, follow, stage_delays, end_to_end_delays
+from UDPChannel import create_packet
+from constants import DATA_MSG_FLAG, CHANNEL_TIMEOUT_SEC
+
+
+def test_ring_wraps_around(tmp_path):
+    path = str(tmp_path / "ring")
+
+    ring = TraceRing(path, capacity=4)
+
+    for counter in range(6):
+        ring.record(RECEIVED, REQUEST, 1, counter)
+
+    ring.record_packet(SENT, RESPONSE, create_packet(2, DATA_MSG_FLAG, bytes([0, 0, 1, 0]), bytes(10)))
+
+    ring.close()
+
+    events = read_trace(path)
+
+    assert [event[1:] for event in events] == [(RECEIVED, REQUEST, 1, 3), (RECEIVED, REQUEST, 1, 4),
+                                               (RECEIVED, REQUEST, 1, 5), (SENT, RESPONSE, 2, 256)]
+
+    assert [event[0] for event in events] == sorted(event[0] for event in events)
+
+
+def test_follow_through_chain(tmp_path):
+    entry_id, mix_id, counter = 7, 9, 1
+
+    paths = [str(tmp_path / name) for name in ["entry", "mix", "exit"]]
+    entry, mix, exit_point = [TraceRing(path, capacity=16) for path in paths]
+
+    mix.record(CHANNEL, REQUEST, entry_id, mix_id)
+
+    entry.record(CRYPTED, REQUEST, entry_id, counter)
+    entry.record(SENT, REQUEST, entry_id, counter)
+
+    mix.record(RECEIVED, REQUEST, entry_id, counter)
+
+    for event in [CRYPTED, QUEUED, DEQUEUED, SENT]:
+        mix.record(event, REQUEST, mix_id, counter)
+
+    exit_point.record(RECEIVED, REQUEST, mix_id, counter)
+
+    exit_point.record(QUEUED, RESPONSE, mix_id, counter)
+    exit_point.record(SENT, RESPONSE, mix_id, counter)
+
+    mix.record(RECEIVED, RESPONSE, mix_id, counter)
+
+    for event in [CRYPTED, QUEUED, DEQUEUED, SENT]:
+        mix.record(event, RESPONSE, entry_id, counter)
+
+    entry.record(RECEIVED, RESPONSE, entry_id, counter)
+
+    # a packet of another channel, that didn't get further than the mix
+    entry.record(SENT, REQUEST, entry_id + 1, counter)
+
+    for ring in [entry, mix, exit_point]:
+        ring.close()
+
+    hops = load_hops(paths)
+
+    requests = follow(hops, REQUEST)
+
+    assert [[(index, event) for index, event, _ in timeline] for timeline in requests] == [
+        [(0, CRYPTED), (0, SENT), (1, RECEIVED), (1, CRYPTED), (1, QUEUED), (1, DEQUEUED), (1, SENT),
+         (2, RECEIVED)],
+        [(0, SENT)]]
+
+    assert list(stage_delays(requests, hops)) == [
+        "entry crypted -> sent", "entry -> mix", "mix received -> crypted", "mix crypted -> queued",
+        "mix queued -> dequeued", "mix dequeued -> sent", "mix -> exit"]
+
+    assert len(end_to_end_delays(requests, len(hops))) == 1
+
+    hops.reverse()
+
+    responses = follow(hops, RESPONSE)
+
+    assert [[(index, event) for index, event, _ in timeline] for timeline in responses] == [
+        [(0, QUEUED), (0, SENT), (1, RECEIVED), (1, CRYPTED), (1, QUEUED), (1, DEQUEUED), (1, SENT),
+         (2, RECEIVED)]]
+
+    assert all(delay >= 0 for delays in stage_delays(responses, hops).values() for delay in delays)
+
+
+def test_reused_channel_ids():
+    entry_id, counter = 7, 1
+
+    # nanoseconds
+    later = (CHANNEL_TIMEOUT_SEC + 10) * 10**9
+
+    entry_events, mix_events, exit_events = [], [], []
+
+    # the entry point reuses its channel id, once the first channel timed out, the mix reuses its out going id
+    # for the third channel
+    for start, channel_id, mix_id in [(0, entry_id, 9), (later, entry_id, 11), (later + 10**9, entry_id + 1, 9)]:
+        entry_events.append((start + 1, SENT, REQUEST, channel_id, counter))
+        mix_events.append((start + 2, RECEIVED, REQUEST, channel_id, counter))
+        mix_events.append((start + 3, CHANNEL, REQUEST, channel_id, mix_id))
+        mix_events.append((start + 4, SENT, REQUEST, mix_id, counter))
+        exit_events.append((start + 5, RECEIVED, REQUEST, mix_id, counter))
+
+    hops = [Hop("entry", entry_events), Hop("mix", mix_events), Hop("exit", exit_events)]
+
+    requests = follow(hops, REQUEST)
+
+    assert sorted(timeline[0][2] for timeline in requests) == [1, later + 1, later + 10**9 + 1]
+
+    assert all(len(timeline) == 4 for timeline in requests)
+
+    # no stage spans the lifetimes of an id
+    assert all(delay < 10**-8 for delays in stage_delays(requests, hops).values() for delay in delays)
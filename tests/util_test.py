@@ -1,6 +1,9 @@
 #!/usr/bin/python3 -u
 """Some small unit tests for the util functions."""
-from util import padded, partitions, partitioned, cut
+from time import time
+
+from util import padded, partitions, partitioned, cut, ctr_cipher, CtrContext, CombinedPads, ctr_crypt_batch, \
+    gen_sym_key, get_random_bytes, RandomPool, seconds_until
 
 
 def test_padded():
@@ -80,3 +83,84 @@ def test_cut():
 
     assert part1 == bytes(50) == part2
     assert not part3
+
+
+def test_seconds_until():
+    assert seconds_until([None, None]) is None
+    assert seconds_until([None, 0]) == 0
+    assert 9 < seconds_until([time() + 10, None, time() + 20]) <= 10
+
+
+def test_ctr_context():
+    key = gen_sym_key()
+    context = CtrContext(key)
+
+    for counter in [0, 1, 2**32 - 1]:
+        for length in [0, 1, 15, 16, 17, 300, 1500]:
+            data = bytes(range(256)) * (length // 256) + bytes(range(length % 256))
+
+            cipher_text = context.encrypt(counter, data)
+
+            assert cipher_text == ctr_cipher(key, counter).encrypt(data)
+            assert context.decrypt(counter, cipher_text) == data
+
+
+def test_combined_pads():
+    keys = [gen_sym_key() for _ in range(3)]
+
+    pads = CombinedPads([CtrContext(key) for key in keys], 300, 4)
+
+    pads.prefetch(10)
+
+    assert sorted(pads.pads) == [10, 11, 12, 13]
+
+    # longer data and counters without a pad work as well
+    for counter, length in [(10, 300), (11, 100), (12, 400), (20, 300)]:
+        data = get_random_bytes(length)
+
+        expected = data
+
+        for key in keys:
+            expected = ctr_cipher(key, counter).encrypt(expected)
+
+        assert pads.apply(counter, data) == expected
+
+    assert sorted(pads.pads) == [13]
+
+    pads.prefetch(14)
+
+    assert sorted(pads.pads) == [14, 15, 16, 17]
+
+
+def test_ctr_crypt_batch():
+    contexts = [CtrContext(gen_sym_key()) for _ in range(3)]
+
+    jobs = [(contexts[index % 3], index * 1000, get_random_bytes(length))
+            for index, length in enumerate([0, 1, 16, 277, 277, 300, 17, 277])]
+
+    results = ctr_crypt_batch(jobs)
+
+    assert results == [ctr_cipher(context.key, counter).encrypt(data) for context, counter, data in jobs]
+
+    assert ctr_crypt_batch([]) == []
+    assert ctr_crypt_batch([(contexts[0], 1, b"")]) == [b""]
+
+
+def test_random_pool():
+    pool = RandomPool(64)
+
+    first = pool.get(40)
+    second = pool.get(20)
+
+    assert len(first) == 40 and len(second) == 20
+    assert first[20:] != second
+
+    # doesn't fit the rest of the buffer anymore, so a new one is made
+    pool.get(10)
+
+    assert pool.offset == 10
+
+    assert len(pool.get(100)) == 100
+    assert pool.offset == 10
+
+    assert pool.get(0) == b""
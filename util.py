@@ -1,15 +1,18 @@
 """This module contains utility functions needed all over the PyMix project.
    They mostly focus on sequence and byte manipulation or mask internal
    builtin functionality, when it was not convenient enough to use."""
+import os
 from math import ceil
+from time import time
 
 from Cryptodome.Cipher import AES
 from Cryptodome.Random import get_random_bytes
-from Cryptodome.Random.random import randint, shuffle as _shuffle
+from Cryptodome.Random.random import shuffle as _shuffle
 from Cryptodome.Util import Counter
+from Cryptodome.Util.strxor import strxor
 
-from constants import MAX_CHAN_ID, MIN_CHAN_ID, SYM_KEY_LEN, CTR_PREFIX_LEN, \
-    GCM_MAC_LEN, NONCE_LEN
+from constants import SYM_KEY_LEN, CTR_PREFIX_LEN, \
+    GCM_MAC_LEN, NONCE_LEN, RANDOM_POOL_SIZE
 
 BYTE_ORDER = "big"
 
@@ -154,10 +157,6 @@ def byte_len(integer):
     return int(ceil(integer.bit_length() / 8.0))
 
 
-def random_channel_id():
-    return randint(MIN_CHAN_ID, MAX_CHAN_ID)
-
-
 def cut(sequence, *cut_points):
     cur_place = 0
 
@@ -168,11 +167,73 @@ def cut(sequence, *cut_points):
     yield sequence[cur_place:]
 
 
+def seconds_until(deadlines):
+    """Returns the seconds until the earliest of the deadlines, that are not
+    None, but at least 0. Returns None, if all of them are None."""
+    deadlines = [deadline for deadline in deadlines if deadline is not None]
+
+    if not deadlines:
+        return None
+
+    return max(0, min(deadlines) - time())
+
+
 # crypto
 def gen_sym_key():
     return get_random_bytes(SYM_KEY_LEN)
 
 
+class RandomPool:
+    """Hands out random bytes, that are cut from a buffer of AES key stream.
+    The buffer is made with a new key and nonce from the OS, whenever it is
+    used up, so only every size bytes the OS is asked. Meant for padding and
+    dummy traffic, keys are still taken from the OS directly. Not thread safe,
+    the nodes only use it from their main thread."""
+
+    def __init__(self, size=RANDOM_POOL_SIZE):
+        self.size = size
+
+        self.buffer = b""
+        self.offset = 0
+
+    def get(self, length):
+        """Returns length random bytes."""
+        start = self.offset
+        end = start + length
+
+        if end > len(self.buffer):
+            if length > self.size:
+                return get_random_bytes(length)
+
+            self.refill()
+
+            start, end = 0, length
+
+        self.offset = end
+
+        return self.buffer[start:end]
+
+    def refill(self):
+        """Throws away the remaining bytes and makes new ones."""
+        cipher = AES.new(get_random_bytes(SYM_KEY_LEN), AES.MODE_CTR, nonce=get_random_bytes(NONCE_LEN // 2))
+
+        self.buffer = cipher.encrypt(bytes(self.size))
+        self.offset = 0
+
+
+_random_pool = RandomPool()
+
+# forked processes must not hand out the same bytes as their parent
+os.register_at_fork(after_in_child=_random_pool.refill)
+
+
+def random_bytes(length):
+    """Returns length random bytes from the shared RandomPool. Cheaper than
+    get_random_bytes for the many short requests of padding and dummy
+    traffic."""
+    return _random_pool.get(length)
+
+
 # todo better return bytes?
 def gen_ctr_prefix():
     return b2i(get_random_bytes(CTR_PREFIX_LEN))
@@ -184,6 +245,162 @@ def ctr_cipher(key, counter):
     return AES.new(key, AES.MODE_CTR, counter=ctr)
 
 
+# the counter blocks of a CTR mode key stream, without the counter prefix.
+# grown, when a longer key stream is needed
+_counter_blocks = b""
+
+
+def counter_blocks(block_count):
+    """Returns the first block_count counter blocks of a key stream, as used
+    by ctr_cipher, with all 0s in place of the counter prefix."""
+    global _counter_blocks
+
+    length = block_count * AES.block_size
+
+    if len(_counter_blocks) < length:
+        _counter_blocks = b"".join(bytes(CTR_PREFIX_LEN) + i2b(block, NONCE_LEN - CTR_PREFIX_LEN)
+                                   for block in range(block_count))
+
+    return _counter_blocks[:length]
+
+
+class CtrContext:
+    """En- and decrypts with a fixed key, exactly like a cipher from
+    ctr_cipher would. The key schedule is only made once, though, and the
+    counter prefix can be different for every call."""
+
+    __slots__ = ["key", "cipher"]
+
+    def __init__(self, key):
+        self.key = key
+        self.cipher = AES.new(key, AES.MODE_ECB)
+
+    def keystream(self, counter, length):
+        """Returns the first length bytes of the key stream for the given
+        counter prefix."""
+        block_count = ceil(length / AES.block_size)
+
+        prefixes = (i2b(counter, CTR_PREFIX_LEN) + bytes(NONCE_LEN - CTR_PREFIX_LEN)) * block_count
+
+        return self.cipher.encrypt(strxor(counter_blocks(block_count), prefixes))[:length]
+
+    def encrypt(self, counter, data):
+        if not data:
+            return b""
+
+        return strxor(data, self.keystream(counter, len(data)))
+
+    decrypt = encrypt
+
+
+def ctr_crypt_batch(jobs):
+    """En- or decrypts the data of many (CtrContext, counter, data) jobs at
+    once. The key streams of all jobs with the same context are made in a
+    single ECB call and all data is XORed in a single step, so the per call
+    overhead is paid once per key, instead of once per job. Returns the
+    results in the order of the jobs."""
+    lengths = [len(data) for _, _, data in jobs]
+
+    jobs_by_context = dict()
+
+    for index, (context, _, _) in enumerate(jobs):
+        jobs_by_context.setdefault(context, []).append(index)
+
+    keystreams = [b""] * len(jobs)
+
+    for context, indices in jobs_by_context.items():
+        block_counts = [ceil(lengths[index] / AES.block_size) for index in indices]
+
+        prefixes = b"".join((i2b(jobs[index][1], CTR_PREFIX_LEN) + bytes(NONCE_LEN - CTR_PREFIX_LEN)) * block_count
+                            for index, block_count in zip(indices, block_counts))
+        blocks = b"".join(counter_blocks(block_count) for block_count in block_counts)
+
+        if not blocks:
+            continue
+
+        keystream = context.cipher.encrypt(strxor(blocks, prefixes))
+
+        offset = 0
+
+        for index, block_count in zip(indices, block_counts):
+            keystreams[index] = keystream[offset:offset + lengths[index]]
+
+            offset += block_count * AES.block_size
+
+    data = b"".join(data for _, _, data in jobs)
+
+    if not data:
+        return [b""] * len(jobs)
+
+    data = strxor(data, b"".join(keystreams))
+
+    results = []
+    offset = 0
+
+    for length in lengths:
+        results.append(data[offset:offset + length])
+
+        offset += length
+
+    return results
+
+
+class CombinedPads:
+    """Keeps the XOR of the key streams of several CtrContexts ready for the
+    next counter values. En- or decrypting through all of their layers then
+    takes a single XOR with the pad of the counter value."""
+
+    __slots__ = ["contexts", "keys", "length", "depth", "pads"]
+
+    def __init__(self, contexts, length, depth):
+        self.contexts = contexts
+        self.keys = [context.key for context in contexts]
+
+        # length of the pads, data that is longer is handled without them
+        self.length = length
+        self.depth = depth
+
+        # pads by counter value
+        self.pads = dict()
+
+    def prefetch(self, first_counter):
+        """Makes the pads for the depth counter values starting with
+        first_counter, that are not made yet. Pads of earlier counter values
+        will not be used anymore and are dropped."""
+        for counter in [counter for counter in self.pads if counter < first_counter]:
+            del self.pads[counter]
+
+        last_counter = min(first_counter + self.depth, 2 ** (CTR_PREFIX_LEN * 8))
+
+        for counter in range(first_counter, last_counter):
+            if counter not in self.pads:
+                self.pads[counter] = self._make_pad(counter, self.length)
+
+    def apply(self, counter, data):
+        """En- or decrypts the data with all contexts, using the prepared pad
+        of the counter value, if there is one."""
+        if not data:
+            return b""
+
+        pad = self.pads.pop(counter, None)
+
+        if pad is None or len(pad) < len(data):
+            pad = self._make_pad(counter, len(data))
+
+        return strxor(data, pad[:len(data)])
+
+    def _make_pad(self, counter, length):
+        pad = self.contexts[0].keystream(counter, length)
+
+        for context in self.contexts[1:]:
+            pad = strxor(pad, context.keystream(counter, length))
+
+        return pad
+
+    def __len__(self):
+        return len(self.pads)
+
+
 def gcm_cipher(key, counter):
     # nbits = 8 bytes + prefix = 8 bytes
     return AES.new(key, AES.MODE_GCM,